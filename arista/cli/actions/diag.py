@@ -3,6 +3,7 @@ from __future__ import absolute_import, division, print_function
 
 import json
 
+from ...core.arbiter import I2cPriority, i2cPriority
 from ...core.diag import DiagContext
 from ...libs.pyshell import pyshell
 
@@ -14,12 +15,13 @@ def doCommonDiagCli(components, args):
    )
    diagInfo = []
 
-   for component in components:
-      if args.recursive:
-         diagInfo.append(component.genDiag(diagCtx))
-      else:
-         for c in component.iterComponents():
-            diagInfo.append(c.genDiag(diagCtx))
+   with i2cPriority(I2cPriority.DIAG):
+      for component in components:
+         if args.recursive:
+            diagInfo.append(component.genDiag(diagCtx))
+         else:
+            for c in component.iterComponents():
+               diagInfo.append(c.genDiag(diagCtx))
 
    if args.pyshell:
       pyshell()
@@ -13,6 +13,6 @@ def doRebootCause(ctx, args):
       try:
          lock_file = Config().linecard_lock_file_pattern.format(linecard.getSlotId())
          with utils.FileLock(lock_file):
-            getLinecardReloadCauseManager(linecard, read=args.process)
+            getLinecardReloadCauseManager(linecard, read=args.process, count=1)
       except Exception: # pylint: disable=broad-except
          print(f'Failed to read reboot-cause information from linecard {linecard}')
@@ -52,7 +52,7 @@ def setupLinecard(linecard, args, lcpu):
 
          # Pull down the linecard reload causes from hardware DPM
          logging.info('%s: Process reload cause info', linecard)
-         getLinecardReloadCauseManager(linecard, read=True)
+         getLinecardReloadCauseManager(linecard, read=True, count=1)
 
 @registerAction(setupParser)
 def doSetup(ctx, args):
@@ -13,7 +13,8 @@ def doRebootCause(ctx, args):
       return
 
    with utils.FileLock(Config().lock_file):
-      rcm = getReloadCauseManager(ctx.platform, read=args.process)
+      rcm = getReloadCauseManager(ctx.platform, read=args.process,
+                                  count=None if args.history else 1)
 
    if args.history:
       causes = [report.cause for report in rcm.allReports()]
@@ -1,7 +1,10 @@
 
 from __future__ import print_function
 
+from contextlib import ExitStack
+
 from ...core.diag import DiagContext
+from ...core.driver import Driver
 
 from . import Renderer, Table, Col
 
@@ -17,10 +20,18 @@ class ShowEnvironment(Renderer):
          'psuSlots': [],
       }
       for inventory, _ in show.inventories:
-         for temp in inventory.getTemps():
-            data['temps'].append(temp.__diag__(ctx))
-         for fan in inventory.getFans():
-            data['fans'].append(fan.__diag__(ctx))
+         temps = inventory.getTemps()
+         fans = inventory.getFans()
+         with ExitStack() as stack:
+            # read each hwmon folder once instead of one attribute at a time
+            drivers = {getattr(obj, 'driver', None) : None for obj in temps + fans}
+            for driver in drivers:
+               if isinstance(driver, Driver):
+                  stack.enter_context(driver.snapshot())
+            for temp in temps:
+               data['temps'].append(temp.__diag__(ctx))
+            for fan in fans:
+               data['fans'].append(fan.__diag__(ctx))
          for slot in inventory.getPsuSlots():
             data['psuSlots'].append(slot.__diag__(ctx))
       return data
@@ -12,6 +12,9 @@ class ShowRebootCause(Renderer):
 
    NAME = 'reboot-cause'
 
+   def _getCount(self, show):
+      return None if show.args.history else 1
+
    def _getData(self, show, rcm):
       if show.args.history:
          return [rp.toDict() for rp in rcm.allReports()]
@@ -42,7 +45,7 @@ class ShowRebootCause(Renderer):
 
 class ShowPlatformRebootCause(ShowRebootCause):
    def getData(self, show):
-      rcm = getReloadCauseManager(show.platforms[0])
+      rcm = getReloadCauseManager(show.platforms[0], count=self._getCount(show))
       return self._getData(show, rcm)
 
 class ShowPlatformRebootCauseList(Renderer):
@@ -75,7 +78,8 @@ class ShowLinecardRebootCause(ShowRebootCause):
    def getData(self, show):
       lcdata = {}
       for linecard, _ in show.inventories:
-         rcm = getLinecardReloadCauseManager(linecard)
+         rcm = getLinecardReloadCauseManager(linecard,
+                                             count=self._getCount(show))
          lcdata[str(linecard)] = self._getData(show, rcm)
       return lcdata
 
@@ -5,6 +5,7 @@ from ..core.cause import (
    ReloadCauseEntry,
    HardwareReloadCauseProvider,
    ReloadCauseScore,
+   componentBus,
 )
 from ..core.component import Priority
 from ..core.component.i2c import I2cComponent
@@ -305,6 +306,9 @@ class SysCpldReloadCauseProvider(HardwareReloadCauseProvider):
          self.regs_ = self.regmap(self.cpld.driver)
       return self.regs_
 
+   def getBus(self):
+      return componentBus(self.cpld)
+
    def process(self):
       cause = self.getReloadCause()
       self.causes = [cause] if cause is not None else []
@@ -48,6 +48,7 @@ class DenaliLinecard(DenaliLinecardBase):
          Scd,
          addr=upstream.addr,
          registerCls=ScdRegisterMap,
+         removable=True,
       )
 
    def createAsics(self):
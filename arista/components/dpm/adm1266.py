@@ -2,12 +2,12 @@ from enum import Enum
 from functools import cached_property
 
 from ...descs.cause import ReloadCauseDesc
-from ...libs.integer import isBitSet
 
 from ...core.cause import (
    ReloadCauseEntry,
    HardwareReloadCauseProvider,
    ReloadCauseScore,
+   componentBus,
 )
 from ...core.component import Priority
 from ...core.driver.user.rtc import RealTimeClockImpl
@@ -16,7 +16,7 @@ from ...core.utils import inSimulation
 
 from ...descs.cause import ReloadCausePriority
 
-from ...drivers.dpm.adm1266 import Adm1266UserDriver
+from ...drivers.dpm.adm1266 import Adm1266UserDriver, cyclicRange, gpioPins
 
 from ...inventory.programmable import Programmable
 
@@ -55,6 +55,24 @@ class AdmPdio(AdmPin):
    def fromPins(*pins):
       return [AdmPdio(pin) for pin in pins]
 
+GPIO_PIN_MASK = 0x1ff
+PDIO_PIN_MASK = 0xffff
+
+def pinMask(pins):
+   mask = 0
+   for pin in pins:
+      mask |= 1 << (pin.pin - 1)
+   return mask
+
+class AdmFaultState():
+   '''Pin state of a blackbox fault, with bit n - 1 set for gpio/pdio n'''
+   def __init__(self, fault):
+      self.fault = fault
+      self.gpioIn = gpioPins(fault.gpio_in)
+      self.gpioOut = gpioPins(fault.gpio_out)
+      self.pdioIn = fault.pdio_in
+      self.pdioOut = fault.pdio_out
+
 class AdmCauseBase(ReloadCauseDesc):
    def __init__(self, current=None, action=None, pins=None,
                 name=ReloadCauseDesc.UNKNOWN,
@@ -83,12 +101,26 @@ class AdmCauseBase(ReloadCauseDesc):
    def name(self):
       return self.typ
 
+   @cached_property
+   def gpioMask(self):
+      return pinMask(self.gpios)
+
+   @cached_property
+   def pdioMask(self):
+      return pinMask(self.pdios)
+
    def matchesCurrentAndAction(self, fault):
       if (self.code[0] is not None and self.code[0] != fault.current) or \
          (self.code[1] is not None and self.code[1] != fault.action):
          return False
       return True
 
+   def matchesState(self, state):
+      raise NotImplementedError
+
+   def matchesFault(self, fault):
+      return self.matchesState(AdmFaultState(fault))
+
 class AdmCauseOneHot(AdmCauseBase):
    class Direction(Enum):
       IN = 'input'
@@ -102,29 +134,26 @@ class AdmCauseOneHot(AdmCauseBase):
       self.activeLow = activeLow
       super().__init__(current, action, pin, name, description, priority, **kwargs)
 
-   def _isPinActive(self, bit, inBits, outBits):
-      isActiveIn = isBitSet(bit, inBits) != self.activeLow
-      isActiveOut = isBitSet(bit, outBits) != self.activeLow
-
+   def _activePins(self, inBits, outBits):
+      invert = 0xffff if self.activeLow else 0
       if self.direction == self.Direction.INOUT:
-         return isActiveIn or isActiveOut
+         return (inBits ^ invert) | (outBits ^ invert)
       if self.direction == self.Direction.IN:
-         return isActiveIn
+         return inBits ^ invert
       if self.direction == self.Direction.OUT:
-         return isActiveOut
+         return outBits ^ invert
       # Disabled pin
-      return False
+      return 0
 
-   def matchesFault(self, fault):
-      for pin in self.gpios:
-         bit = fault.GPIO_MAP.index(pin.pin)
-         if not self._isPinActive(bit, fault.gpio_in, fault.gpio_out):
-            return False
-      for pin in self.pdios:
-         bit = pin.pin - 1
-         if not self._isPinActive(bit, fault.pdio_in, fault.pdio_out):
-            return False
-      return super().matchesCurrentAndAction(fault)
+   def matchesState(self, state):
+      # all the pins of the cause must be active
+      gpioMask = self.gpioMask
+      if self._activePins(state.gpioIn, state.gpioOut) & gpioMask != gpioMask:
+         return False
+      pdioMask = self.pdioMask
+      if self._activePins(state.pdioIn, state.pdioOut) & pdioMask != pdioMask:
+         return False
+      return super().matchesCurrentAndAction(state.fault)
 
 class AdmCauseUnique(AdmCauseBase):
    def __init__(self, name, pins,
@@ -142,64 +171,24 @@ class AdmCauseUnique(AdmCauseBase):
       self.pdioActiveLowMask = pdioActiveLowMask
       super().__init__(current, action, pins, name, description, priority, **kwargs)
 
-   @cached_property
-   def gpioPinSet(self):
-      return {gpio.pin for gpio in self.gpios}
-
-   @cached_property
-   def pdioPinSet(self):
-      return {pdio.pin for pdio in self.pdios}
-
-   def _isPinActive(self, pin, bit, inBits, outBits, inMask, outMask, activeLowMask):
-      pinIndex = pin - 1
-
-      isActiveLow = isBitSet(pinIndex, activeLowMask)
-      isActiveIn = isBitSet(bit, inBits) != isActiveLow
-      isActiveOut = isBitSet(bit, outBits) != isActiveLow
-      isInput = isBitSet(pinIndex, inMask)
-      isOutput = isBitSet(pinIndex, outMask)
-
-      if isInput and isOutput:
-         return isActiveIn or isActiveOut
-      if isInput:
-         return isActiveIn
-      if isOutput:
-         return isActiveOut
-      # Disabled pin
-      return False
-
-   def matchesFault(self, fault):
-      inBits = fault.gpio_in
-      outBits = fault.gpio_out
-      pinSet = self.gpioPinSet
-      pinBitMap = fault.GPIO_MAP
-      for pinNum in range(1, 10):
-         bit = pinBitMap.index(pinNum)
-
-         isFaultPin = pinNum in pinSet
-         isPinActive = self._isPinActive(pinNum, bit, inBits, outBits,
-                                         self.gpioInMask, self.gpioOutMask,
-                                         self.gpioActiveLowMask)
-         # only fault pins should be active.
-         if isPinActive != isFaultPin:
-            return False
-
-      inBits = fault.pdio_in
-      outBits = fault.pdio_out
-      pinSet = self.pdioPinSet
-      pinBitMap = range(1, 17)
-      for pinNum in range(1, 17):
-         bit = pinBitMap.index(pinNum)
-
-         isFaultPin = pinNum in pinSet
-         isPinActive = self._isPinActive(pinNum, bit, inBits, outBits,
-                                         self.pdioInMask, self.pdioOutMask,
-                                         self.pdioActiveLowMask)
-         # only fault pins should be active.
-         if isPinActive != isFaultPin:
-            return False
-
-      return super().matchesCurrentAndAction(fault)
+   @staticmethod
+   def _activePins(inBits, outBits, inMask, outMask, activeLowMask):
+      # pins both input and output are active from either direction, disabled
+      # pins are never active
+      return ((inBits ^ activeLowMask) & inMask) | \
+             ((outBits ^ activeLowMask) & outMask)
+
+   def matchesState(self, state):
+      # only fault pins should be active.
+      active = self._activePins(state.gpioIn, state.gpioOut, self.gpioInMask,
+                                self.gpioOutMask, self.gpioActiveLowMask)
+      if (active ^ self.gpioMask) & GPIO_PIN_MASK:
+         return False
+      active = self._activePins(state.pdioIn, state.pdioOut, self.pdioInMask,
+                                self.pdioOutMask, self.pdioActiveLowMask)
+      if (active ^ self.pdioMask) & PDIO_PIN_MASK:
+         return False
+      return super().matchesCurrentAndAction(state.fault)
 
 class AdmReloadCauseEntry(ReloadCauseEntry):
    pass
@@ -209,6 +198,9 @@ class AdmReloadCauseProvider(HardwareReloadCauseProvider):
       super().__init__(name=str(adm), **kwargs)
       self.adm = adm
 
+   def getBus(self):
+      return componentBus(self.adm)
+
    def process(self):
       self.causes = self.adm.getReloadCauses()
       self.extra = {
@@ -279,8 +271,10 @@ class Adm1266(PmbusDpm):
       causes = []
       for fault in self.driver.getBlackboxFaults():
          logging.debug('fault: %s', fault.summary())
+         # the pin state is decoded once and matched against every cause
+         state = AdmFaultState(fault)
          for cause in self.causes:
-            if cause.matchesFault(fault):
+            if cause.matchesState(state):
                logging.debug('found: %s', cause.name)
                causes.append(AdmReloadCauseEntry(
                   cause=cause.name,
@@ -1,5 +1,7 @@
-import pytest
+import struct
+from unittest.mock import patch
 
+import pytest
 
 from ..adm1266 import (
    Adm1266,
@@ -10,10 +12,13 @@ from ..adm1266 import (
 )
 
 from ....core.fabric import Fabric
+from ....core.inventory import Inventory
 from ....core.linecard import Linecard
 from ....core.modular import Modular
 from ....core.platform import loadPlatforms, getPlatforms
 from ....descs.cause import ReloadCauseDesc
+from ....drivers.dpm.adm1266 import BLACKBOX_RECORD, Adm1266UserDriver
+from ....libs.benchmark import timeit
 from ....libs.integer import isBitSet
 from ....tests.logging import getLogger
 
@@ -818,3 +823,60 @@ class TestAdmCauseCurrentAction:
          gpio_in=0b1
       )
       assert not cause.matchesFault(fault)
+
+
+def encodeRecord(uid, current=0, action=0, gpioIn=0, gpioOut=0, pdioIn=0,
+                 pdioOut=0, powerup=1, secs=1700000000):
+   timestamp = struct.pack('<HI', 0, secs) + b'\x00\x00'
+   return list(BLACKBOX_RECORD.pack(uid, 0, action, 0, 0, current, 0, 0, 0,
+                                    gpioIn, gpioOut, pdioIn, pdioOut, powerup,
+                                    timestamp, 0))
+
+
+@pytest.mark.usefixtures("logger")
+class TestAdm1266BlackboxDump:
+   COUNT = 32
+   # blackbox of a device that went through 40 power cycles, alternating
+   # between an overtemp on gpio1 and a powerloss seen on pdio3
+   DUMP = [
+      encodeRecord(uid, current=3, action=1, gpioIn=0x1, powerup=uid,
+                   secs=1700000000 + uid) if uid % 2 else
+      encodeRecord(uid, current=5, action=2, pdioIn=0x4, powerup=uid,
+                   secs=1700000000 + uid)
+      for uid in range(8, 40)
+   ]
+   CAUSES = [
+      AdmCauseOneHot('overtemp', AdmGpio(1), current=3),
+      AdmCauseUnique('powerloss', AdmPdio(3), pdioInMask=0b111),
+      AdmCauseUnique('watchdog', AdmGpio(2), gpioInMask=0b11),
+   ]
+
+   def setup_method(self):
+      self.adm = Adm1266(inventory=Inventory(), causes=self.CAUSES)
+
+   def testRecordedDump(self):
+      transfers = []
+      def readBytesMany(requests):
+         requests = list(requests)
+         transfers.append(len(requests))
+         return [[64] + self.DUMP[cmd[2]] for cmd, _ in requests]
+
+      drv = self.adm.driver
+      with patch.object(drv, 'getBlackboxInfo', return_value=(0, 31, self.COUNT)), \
+           patch.object(drv, 'readBytesMany', readBytesMany):
+         with timeit('reload causes of a full blackbox dump'):
+            causes = self.adm._getReloadCauses()
+         faults = drv.getBlackboxFaults()
+      assert transfers == [self.COUNT, self.COUNT]
+      assert len(causes) == self.COUNT
+      assert causes[0].cause == 'overtemp'
+      assert causes[0].description.endswith('(powerup=39)')
+      assert causes[1].cause == 'powerloss'
+
+      # the decoding matches the record by record one
+      assert len(faults) == self.COUNT
+      for fault in faults:
+         expected = Adm1266UserDriver.parseBlackboxRecord(fault.raw)
+         assert fault.summary() == expected.summary()
+         assert [c.matchesFault(expected) for c in self.CAUSES] == \
+                [c.matchesFault(fault) for c in self.CAUSES]
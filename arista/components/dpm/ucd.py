@@ -6,6 +6,7 @@ from ...core.cause import (
    ReloadCauseEntry,
    HardwareReloadCauseProvider,
    ReloadCauseScore,
+   componentBus,
 )
 from ...core.component import Priority
 from ...core.driver.user.rtc import RealTimeClockImpl
@@ -60,6 +61,9 @@ class UcdReloadCauseProvider(HardwareReloadCauseProvider):
       super().__init__(name=str(ucd), **kwargs)
       self.ucd = ucd
 
+   def getBus(self):
+      return componentBus(self.ucd)
+
    def process(self):
       self.causes = self.ucd.getReloadCauses()
 
@@ -147,5 +147,5 @@ def createPmbusECB(cls, senseRes, slotId=1, addr=0x10, **kwargs):
       'SENSE_RESISTANCE': senseRes,
       'DESCRIPTION': cls.makeDescription(senseRes, **kwargs),
    })
-   getPsuManager().psus_.append(PmbusECB)
+   getPsuManager().addPsuModel(PmbusECB)
    return PmbusECB
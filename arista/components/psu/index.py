@@ -0,0 +1,135 @@
+# Generated by scripts/psu-index, do not edit.
+# Maps the PSU models to their module and their PMBus identifiers to the model
+# so that PsuManager only imports the modules of the PSUs it detects.
+
+PSU_INDEX = {
+   'models': {
+      'AdEcb': 'ecb',
+      'AristaPsu': 'arista',
+      'Art700': 'artesyn',
+      'ArtesynPsu': 'artesyn',
+      'CSU500DP': 'artesyn',
+      'DPS1500AB': 'delta',
+      'DPS1600AB': 'delta',
+      'DPS1600CB': 'delta',
+      'DPS1900AB': 'delta',
+      'DPS495CB': 'delta',
+      'DPS500AB': 'delta',
+      'DPS750AB': 'delta',
+      'DS460': 'artesyn',
+      'DS495SPE': 'artesyn',
+      'DS750PED': 'emerson',
+      'DeltaPsu': 'delta',
+      'ECD1502005': 'delta',
+      'ECD1502008': 'delta',
+      'ECD16020102': 'delta',
+      'ECD26020037': 'delta',
+      'ECD3000M': 'delta',
+      'EmersonPsu': 'emerson',
+      'Fixed100AC': 'fixed',
+      'Fixed150AC': 'fixed',
+      'Fixed240DC': 'fixed',
+      'FixedPsuModel': 'fixed',
+      'LiteOn2400HV': 'liteon',
+      'LiteonPsu': 'liteon',
+      'Ltc4287': 'ecb',
+      'PS2102': 'liteon',
+      'PS2242': 'liteon',
+      'Pwr568': 'arista',
+      'Pwr581': 'arista',
+      'Pwr585': 'arista',
+      'Pwr591': 'arista',
+      'Pwr603': 'arista',
+      'Pwr634': 'arista',
+      'Pwr663': 'arista',
+      'Pwr689': 'dcdc',
+      'TiEcb': 'ecb',
+      'Tps16890': 'ecb',
+   },
+   'identifiers': {
+      ('arista', 'PWR-00568'): 'Pwr568',
+      ('arista', 'PWR-00581'): 'Pwr581',
+      ('arista', 'PWR-00582'): 'Pwr581',
+      ('arista', 'PWR-00585'): 'Pwr585',
+      ('arista', 'PWR-00586'): 'Pwr585',
+      ('arista', 'PWR-00591'): 'Pwr591',
+      ('arista', 'PWR-00603'): 'Pwr603',
+      ('arista', 'PWR-00634'): 'Pwr634',
+      ('arista', 'PWR-00663'): 'Pwr663',
+      ('artesyn', '700-015522-0000'): 'Art700',
+      ('artesyn', 'CSU500DP-3'): 'CSU500DP',
+      ('artesyn', 'CSU500DP-3-001'): 'CSU500DP',
+      ('artesyn', 'DS460'): 'DS460',
+      ('artesyn', 'DS460S-3'): 'DS460',
+      ('artesyn', 'DS460S-3-001'): 'DS460',
+      ('artesyn', 'DS460S-3-002'): 'DS460',
+      ('artesyn', 'DS460S-3-003'): 'DS460',
+      ('artesyn', 'DS495SPE-3-401'): 'DS495SPE',
+      ('artesyn', 'DS495SPE-3-402'): 'DS495SPE',
+      ('artesyn', 'DS495SPE-3-404'): 'DS495SPE',
+      ('artesyn', 'DS495SPE-3-405'): 'DS495SPE',
+      ('delta', 'DPS-1500AB-10 A'): 'DPS1500AB',
+      ('delta', 'DPS-1500AB-7 A'): 'DPS1500AB',
+      ('delta', 'DPS-1500AB-7 B'): 'DPS1500AB',
+      ('delta', 'DPS-1500AB-8 A'): 'DPS1500AB',
+      ('delta', 'DPS-1500AB-8 B'): 'DPS1500AB',
+      ('delta', 'DPS-1500AB-9 A'): 'DPS1500AB',
+      ('delta', 'DPS-1600AB-14 A'): 'DPS1600AB',
+      ('delta', 'DPS-1600CB N'): 'DPS1600CB',
+      ('delta', 'DPS-1600CB P'): 'DPS1600CB',
+      ('delta', 'DPS-1900AB A'): 'DPS1900AB',
+      ('delta', 'DPS-1900AB-1 A'): 'DPS1900AB',
+      ('delta', 'DPS-495CB A'): 'DPS495CB',
+      ('delta', 'DPS-495CB C'): 'DPS495CB',
+      ('delta', 'DPS-495CB-1 A'): 'DPS495CB',
+      ('delta', 'DPS-495CB-1 C'): 'DPS495CB',
+      ('delta', 'DPS-500AB-40 A'): 'DPS500AB',
+      ('delta', 'DPS-500AB-41 A'): 'DPS500AB',
+      ('delta', 'DPS-500AB-42 A'): 'DPS500AB',
+      ('delta', 'DPS-500AB-43 A'): 'DPS500AB',
+      ('delta', 'DPS-750AB-24 A'): 'DPS750AB',
+      ('delta', 'DPS-750AB-24 B'): 'DPS750AB',
+      ('delta', 'DPS-750AB-24 C'): 'DPS750AB',
+      ('delta', 'DPS-750AB-25 A'): 'DPS750AB',
+      ('delta', 'DPS-750AB-25 B'): 'DPS750AB',
+      ('delta', 'DPS-750AB-25 C'): 'DPS750AB',
+      ('delta', 'ECD15020056'): 'ECD1502005',
+      ('delta', 'ECD15020057'): 'ECD1502005',
+      ('delta', 'ECD15020083'): 'ECD1502008',
+      ('delta', 'ECD16020035'): 'ECD3000M',
+      ('delta', 'ECD16020097'): 'ECD3000M',
+      ('delta', 'ECD16020102'): 'ECD16020102',
+      ('delta', 'ECD26020037'): 'ECD26020037',
+      ('delta', 'ECD56020024'): 'ECD3000M',
+      ('delta', 'ECD56020026'): 'ECD3000M',
+      ('emerson', '700-015522-0000'): 'Art700',
+      ('emerson', 'CSU500DP-3'): 'CSU500DP',
+      ('emerson', 'CSU500DP-3-001'): 'CSU500DP',
+      ('emerson', 'DS460'): 'DS460',
+      ('emerson', 'DS460S-3'): 'DS460',
+      ('emerson', 'DS460S-3-001'): 'DS460',
+      ('emerson', 'DS460S-3-002'): 'DS460',
+      ('emerson', 'DS460S-3-003'): 'DS460',
+      ('emerson', 'DS495SPE-3-401'): 'DS495SPE',
+      ('emerson', 'DS495SPE-3-402'): 'DS495SPE',
+      ('emerson', 'DS495SPE-3-404'): 'DS495SPE',
+      ('emerson', 'DS495SPE-3-405'): 'DS495SPE',
+      ('emerson', 'DS750PED-3'): 'DS750PED',
+      ('emerson', 'DS750PED-3-001'): 'DS750PED',
+      ('emerson', 'DS750PED-3-402'): 'DS750PED',
+      ('emerson', 'DS750PED-3-403'): 'DS750PED',
+      ('liteon power', 'DD-2102-1A'): 'PS2102',
+      ('liteon power', 'DD-2102-1AR'): 'PS2102',
+      ('liteon power', 'DD-2242-3A'): 'PS2242',
+      ('liteon power', 'DD-2242-3AR'): 'PS2242',
+      ('liteon power', 'PS-2102-1A'): 'PS2102',
+      ('liteon power', 'PS-2102-1AR'): 'PS2102',
+      ('liteon power', 'PS-2242-3A'): 'PS2242',
+      ('liteon power', 'PS-2242-3AR'): 'PS2242',
+      ('liteon power', 'PS-2242-9A'): 'LiteOn2400HV',
+   },
+   'pmbus': {
+      0x40: True,
+      0x58: False,
+   },
+}
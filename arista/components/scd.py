@@ -17,6 +17,7 @@ from ..core.fan import FanSlot
 from ..core.types import I2cAddr, MdioClause, MdioSpeed
 from ..core.utils import (
    FileWaiter,
+   getMmapPool,
    incrange,
    inSimulation,
    MmapResource,
@@ -334,14 +335,20 @@ class Scd(PciComponent):
    INTERRUPTS = []
    XCVR_GROUPS = []
    FAULT_TIME_BASE = datetime.datetime(2000, 1, 1)
-   def __init__(self, addr, registerCls=None, ports=None, **kwargs):
+   def __init__(self, addr, registerCls=None, ports=None, removable=False,
+                **kwargs):
+      # the mappings of a removable scd must not outlive the card, they are
+      # only pooled for the scds that are always there
+      self.pooledMmap = not removable
       drivers = [
          KernelDriver(module='scd'),
-         ScdKernelDriver(scd=self, addr=addr, registerCls=registerCls),
+         ScdKernelDriver(scd=self, addr=addr, registerCls=registerCls,
+                         pooledMmap=self.pooledMmap),
       ]
       self.driver = drivers[1]
       self.smbusMasters = OrderedDict()
       self.mmapReady = False
+      self.mmap_ = None
       self.interrupts = []
       self.fanGroups = []
       self.ledFlashCtrlAddr = None
@@ -425,7 +432,17 @@ class Scd(PciComponent):
             drv.setup()
             FileWaiter(path, 5).waitFileReady()
          self.mmapReady = True
-      return MmapResource(path)
+      if not self.pooledMmap:
+         return MmapResource(path)
+      if self.mmap_ is None:
+         self.mmap_ = getMmapPool().acquire(path)
+      return self.mmap_
+
+   def clean(self):
+      if self.mmap_ is not None:
+         getMmapPool().release(self.mmap_.path_)
+         self.mmap_ = None
+      super().clean()
 
    def getVersion(self):
       if inSimulation():
@@ -0,0 +1,195 @@
+import fcntl
+import os
+import threading
+import time
+
+from collections import defaultdict
+from contextlib import contextmanager
+
+from . import utils
+from .config import Config, tmpfsPath
+from .log import getLogger
+
+from ..libs.python import monotonicRaw
+
+logging = getLogger(__name__)
+
+class I2cPriority(object):
+   # transactions of the user space drivers and sysfs accesses through the i2c
+   # kernel drivers are arbitrated, the latter cannot hold the bus across
+   # several accesses though
+   COOLING = 0
+   PRESENCE = 1
+   TELEMETRY = 2
+   DIAG = 3
+
+   DEFAULT = TELEMETRY
+   NAMES = ['cooling', 'presence', 'telemetry', 'diag']
+
+_context = threading.local()
+
+@contextmanager
+def i2cPriority(priority):
+   '''Set the priority of the I2C transactions issued by the current thread'''
+   previous = getattr(_context, 'priority', None)
+   _context.priority = priority
+   try:
+      yield
+   finally:
+      _context.priority = previous
+
+def currentI2cPriority(default=I2cPriority.DEFAULT):
+   priority = getattr(_context, 'priority', None)
+   return default if priority is None else priority
+
+class I2cBusStats(object):
+   def __init__(self):
+      self.transactions = defaultdict(int)
+      self.waitTotal = defaultdict(float)
+      self.waitMax = defaultdict(float)
+      self.starved = defaultdict(int)
+
+   def record(self, priority, wait, starved):
+      self.transactions[priority] += 1
+      self.waitTotal[priority] += wait
+      self.waitMax[priority] = max(self.waitMax[priority], wait)
+      if starved:
+         self.starved[priority] += 1
+
+   def __diag__(self, ctx): # pylint: disable=unused-argument
+      return {
+         I2cPriority.NAMES[priority]: {
+            'transactions': count,
+            'waitTotal': self.waitTotal[priority],
+            'waitMax': self.waitMax[priority],
+            'starved': self.starved[priority],
+         } for priority, count in sorted(self.transactions.items())
+      }
+
+class I2cBusArbiter(object):
+   '''Serialize the accesses to an I2C bus across processes
+
+   Owning the bus means holding an exclusive flock on a per bus file in tmpfs.
+   Waiters advertise themselves with a shared flock on a per priority file and
+   do not take the bus while a waiter of a higher priority is advertised.
+   Waiters of the highest priority block on the bus lock, the others poll it
+   with an exponential backoff.
+   Each thread uses its own file descriptors since flocks are tied to them,
+   they are only kept open for the duration of the transaction.
+   '''
+
+   POLL_INTERVAL = 0.0005
+   POLL_INTERVAL_MAX = 0.01
+
+   def __init__(self, bus, path=None):
+      self.bus = bus
+      self.path = path or tmpfsPath('i2c-arbiter')
+      self.local_ = threading.local()
+      self.stats = I2cBusStats()
+
+   def __str__(self):
+      return '%s(bus=%s)' % (self.__class__.__name__, self.bus)
+
+   def _lockPath(self, name):
+      return os.path.join(self.path, 'i2c-%s.%s' % (self.bus, name))
+
+   def _files(self):
+      files = getattr(self.local_, 'files', None)
+      if files is None:
+         os.makedirs(self.path, exist_ok=True)
+         files = {
+            # pylint: disable=consider-using-with
+            name: open(self._lockPath(name), 'a')
+            for name in ['lock'] + I2cPriority.NAMES
+         }
+         self.local_.files = files
+         self.local_.depth = 0
+      return files
+
+   def _closeFiles(self):
+      # closing the descriptors also drops their flocks
+      for f in self.local_.files.values():
+         f.close()
+      self.local_.files = None
+
+   @staticmethod
+   def _tryLock(f, op):
+      try:
+         fcntl.flock(f, op | fcntl.LOCK_NB)
+      except BlockingIOError:
+         return False
+      return True
+
+   def _higherWaiting(self, files, priority):
+      for name in I2cPriority.NAMES[:priority]:
+         if not self._tryLock(files[name], fcntl.LOCK_EX):
+            return True
+         fcntl.flock(files[name], fcntl.LOCK_UN)
+      return False
+
+   def acquire(self, priority=I2cPriority.DEFAULT):
+      files = self._files()
+      if self.local_.depth:
+         self.local_.depth += 1
+         return
+
+      start = monotonicRaw()
+      waiter = files[I2cPriority.NAMES[priority]]
+      fcntl.flock(waiter, fcntl.LOCK_SH)
+      try:
+         delay = self.POLL_INTERVAL
+         while True:
+            if not priority:
+               fcntl.flock(files['lock'], fcntl.LOCK_EX)
+               break
+            if not self._higherWaiting(files, priority) and \
+               self._tryLock(files['lock'], fcntl.LOCK_EX):
+               break
+            time.sleep(delay)
+            delay = min(delay * 2, self.POLL_INTERVAL_MAX)
+      finally:
+         fcntl.flock(waiter, fcntl.LOCK_UN)
+      self.local_.depth = 1
+
+      wait = monotonicRaw() - start
+      starved = wait > Config().i2c_arbitration_starvation
+      if starved:
+         logging.debug('%s: %s transaction waited %.4fs for the bus', self,
+                       I2cPriority.NAMES[priority], wait)
+      self.stats.record(priority, wait, starved)
+
+   def release(self):
+      self.local_.depth -= 1
+      if not self.local_.depth:
+         fcntl.flock(self.local_.files['lock'], fcntl.LOCK_UN)
+         self._closeFiles()
+
+   def __diag__(self, ctx):
+      return self.stats.__diag__(ctx)
+
+_arbiters = {}
+_arbitersLock = threading.Lock()
+def getI2cBusArbiter(bus):
+   with _arbitersLock:
+      arbiter = _arbiters.get(bus)
+      if arbiter is None:
+         arbiter = I2cBusArbiter(bus)
+         _arbiters[bus] = arbiter
+      return arbiter
+
+def i2cArbitrationEnabled():
+   return Config().i2c_arbitration and not utils.inSimulation()
+
+@contextmanager
+def i2cTransaction(bus, priority=None):
+   '''Own the bus for the duration of the block when arbitration is enabled'''
+   if not i2cArbitrationEnabled():
+      yield
+      return
+
+   arbiter = getI2cBusArbiter(bus)
+   arbiter.acquire(currentI2cPriority() if priority is None else priority)
+   try:
+      yield
+   finally:
+      arbiter.release()
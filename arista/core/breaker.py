@@ -0,0 +1,135 @@
+import errno
+import threading
+
+from .config import Config
+from .log import getLogger
+
+from ..libs.python import monotonicRaw
+
+logging = getLogger(__name__)
+
+# errors hinting at a stuck device or bus, a NACK from an absent device is not
+# and some adapters (e.g. scd) report it as EIO, so EIO cannot be counted
+STALL_ERRNOS = (errno.ETIMEDOUT, errno.EAGAIN)
+
+class DeviceUnavailableError(IOError):
+   def __init__(self, breaker):
+      super().__init__(errno.EHOSTDOWN,
+                       '%s is unavailable for %.1fs' % (breaker.name,
+                                                        breaker.remaining()))
+
+class CircuitBreaker(object):
+   '''Short circuit accesses to a device that keeps timing out
+
+   After threshold consecutive stalls the device is not accessed for a cooldown
+   window. Once elapsed, a single probe is let through: success closes the
+   breaker while a failure opens it again for twice as long, up to a maximum.
+   Breakers are disabled unless i2c_breaker_threshold is set.
+
+   A stall is a timeout error or any error that took at least
+   i2c_breaker_stall_time to come back. Adapters like the scd report a device
+   timeout as EIO just like a NACK, only the time it took tells them apart.
+   '''
+
+   CLOSED = 'closed'
+   OPEN = 'open'
+   HALF_OPEN = 'half-open'
+
+   def __init__(self, name, threshold=None, backoff=None, backoffMax=None,
+                stallTime=None):
+      config = Config()
+      self.name = name
+      self.threshold = config.i2c_breaker_threshold \
+                       if threshold is None else threshold
+      self.backoff = config.i2c_breaker_backoff if backoff is None else backoff
+      self.backoffMax = config.i2c_breaker_backoff_max \
+                        if backoffMax is None else backoffMax
+      self.stallTime = config.i2c_breaker_stall_time \
+                       if stallTime is None else stallTime
+      self.lock_ = threading.Lock()
+      self.state = self.CLOSED
+      self.failures = 0
+      self.trips = 0
+      self.cooldown = self.backoff
+      self.openedAt = None
+
+   def __str__(self):
+      return '%s(%s, %s)' % (self.__class__.__name__, self.name, self.state)
+
+   @property
+   def enabled(self):
+      return self.threshold > 0
+
+   def remaining(self):
+      if self.openedAt is None:
+         return 0.
+      return max(0., self.cooldown - (monotonicRaw() - self.openedAt))
+
+   def allow(self):
+      with self.lock_:
+         if self.state == self.CLOSED:
+            return True
+         if self.state == self.OPEN and not self.remaining():
+            logging.debug('%s: probing device after %.1fs', self.name,
+                          self.cooldown)
+            self.state = self.HALF_OPEN
+            return True
+         return False
+
+   def _open(self, cooldown):
+      self.state = self.OPEN
+      self.cooldown = cooldown
+      self.openedAt = monotonicRaw()
+
+   def success(self):
+      with self.lock_:
+         if self.state != self.CLOSED:
+            logging.info('%s: device is responsive again', self.name)
+         self.state = self.CLOSED
+         self.failures = 0
+         self.cooldown = self.backoff
+         self.openedAt = None
+
+   def failure(self):
+      with self.lock_:
+         self.failures += 1
+         if self.state == self.HALF_OPEN:
+            self._open(min(self.cooldown * 2, self.backoffMax))
+            logging.debug('%s: probe failed, backing off for %.1fs', self.name,
+                          self.cooldown)
+         elif self.state == self.CLOSED and self.failures >= self.threshold:
+            self.trips += 1
+            self._open(self.backoff)
+            logging.warning('%s: device unresponsive after %d errors, '
+                            'backing off', self.name, self.failures)
+
+   def isStall(self, error, elapsed=None):
+      if error is None:
+         return False
+      if getattr(error, 'errno', None) in STALL_ERRNOS:
+         return True
+      return elapsed is not None and elapsed >= self.stallTime
+
+   def record(self, error=None, elapsed=None):
+      if self.isStall(error, elapsed):
+         self.failure()
+      else:
+         self.success()
+
+   def __diag__(self, ctx): # pylint: disable=unused-argument
+      return {
+         'state': self.state,
+         'failures': self.failures,
+         'trips': self.trips,
+         'cooldown': self.cooldown,
+      }
+
+_breakers = {}
+_breakersLock = threading.Lock()
+def getCircuitBreaker(key, name=None):
+   with _breakersLock:
+      breaker = _breakers.get(key)
+      if breaker is None:
+         breaker = CircuitBreaker(name or str(key))
+         _breakers[key] = breaker
+      return breaker
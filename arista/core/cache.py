@@ -0,0 +1,169 @@
+from collections import defaultdict
+
+from .config import Config
+from .log import getLogger
+
+from ..libs.python import monotonicRaw
+
+logging = getLogger(__name__)
+
+DEFAULT_POLICY = 'default'
+
+def parseFreshness(value):
+   '''Convert a freshness like 2, 0.5, '1s' or '500ms' into seconds'''
+   if isinstance(value, (int, float)):
+      return float(value)
+   value = str(value).strip().lower()
+   if value.endswith('ms'):
+      return float(value[:-2]) / 1000.
+   if value.endswith('s'):
+      return float(value[:-1])
+   return float(value)
+
+def getFreshness(policy):
+   policies = Config().read_cache_freshness or {}
+   value = policies.get(policy, policies.get(DEFAULT_POLICY, 0))
+   try:
+      return parseFreshness(value)
+   except ValueError:
+      logging.warning('invalid read cache freshness %r for %s', value, policy)
+      return 0.
+
+class ReadCacheStats(object):
+   def __init__(self):
+      self.hits = defaultdict(int)
+      self.misses = defaultdict(int)
+      self.invalidations = defaultdict(int)
+
+   def __str__(self):
+      return '%s(hits=%d, misses=%d)' % (self.__class__.__name__,
+                                         sum(self.hits.values()),
+                                         sum(self.misses.values()))
+
+   def __diag__(self, ctx): # pylint: disable=unused-argument
+      policies = set(self.hits) | set(self.misses) | set(self.invalidations)
+      return {
+         policy: {
+            'hits': self.hits[policy],
+            'misses': self.misses[policy],
+            'invalidations': self.invalidations[policy],
+         } for policy in sorted(policies)
+      }
+
+# values read through shared caches, keyed by path, for the whole process
+_sharedReadCacheEntries = {}
+
+class ReadCache(object):
+   '''Keep the last value read from the hardware for a freshness period
+
+   The freshness is looked up in the read_cache_freshness configuration using
+   the policy name (e.g. temp, fan_rpm, presence). A freshness of 0, the
+   default, disables caching entirely.
+
+   Shared caches keep their values per key in a table of the process so that
+   all the objects accessing the same path see each other's invalidations.
+   The cache is never shared between processes.
+   '''
+   def __init__(self, policy=None, stats=None, shared=False):
+      self.policy = policy or DEFAULT_POLICY
+      self.freshness = getFreshness(self.policy)
+      self.stats = stats
+      self.entries = _sharedReadCacheEntries if shared else {}
+
+   def __str__(self):
+      return '%s(policy=%s, freshness=%s)' % (self.__class__.__name__,
+                                              self.policy, self.freshness)
+
+   @property
+   def enabled(self):
+      return self.freshness > 0
+
+   def get(self, func, key=None):
+      if not self.enabled:
+         return func()
+
+      now = monotonicRaw()
+      entry = self.entries.get(key)
+      if entry is not None and now - entry[1] < self.freshness:
+         if self.stats is not None:
+            self.stats.hits[self.policy] += 1
+         return entry[0]
+
+      if self.stats is not None:
+         self.stats.misses[self.policy] += 1
+      value = func()
+      if value is not None:
+         self.entries[key] = (value, now)
+      return value
+
+   def invalidate(self, key=None):
+      if self.entries.pop(key, None) is not None and self.stats is not None:
+         self.stats.invalidations[self.policy] += 1
+
+class WriteShadowStats(object):
+   def __init__(self):
+      self.writes = defaultdict(int)
+      self.suppressed = defaultdict(int)
+
+   def __str__(self):
+      return '%s(writes=%d, suppressed=%d)' % (self.__class__.__name__,
+                                               sum(self.writes.values()),
+                                               sum(self.suppressed.values()))
+
+   def __diag__(self, ctx): # pylint: disable=unused-argument
+      policies = set(self.writes) | set(self.suppressed)
+      return {
+         policy: {
+            'writes': self.writes[policy],
+            'suppressed': self.suppressed[policy],
+         } for policy in sorted(policies)
+      }
+
+class WriteShadow(object):
+   '''Remember the last value written to skip identical writes
+
+   Writes of the same value are suppressed until the write_shadow_refresh
+   interval elapses, at which point the value is written again to recover from
+   a hardware reset. Suppression is disabled when no interval is configured.
+
+   Suppressed writes do no I/O at all. The shadow is private to the process, so
+   a value changed behind its back is only restored once the interval elapses.
+   '''
+   def __init__(self, policy=None, stats=None):
+      self.policy = policy or DEFAULT_POLICY
+      self.refresh = Config().write_shadow_refresh
+      self.stats = stats
+      self.value = None
+      self.timestamp = None
+
+   def __str__(self):
+      return '%s(policy=%s, refresh=%s)' % (self.__class__.__name__,
+                                            self.policy, self.refresh)
+
+   @property
+   def enabled(self):
+      return self.refresh is not None
+
+   def write(self, value, func):
+      if not self.enabled:
+         return func(value)
+
+      now = monotonicRaw()
+      if value == self.value and now - self.timestamp < self.refresh:
+         if self.stats is not None:
+            self.stats.suppressed[self.policy] += 1
+         return True
+
+      if self.stats is not None:
+         self.stats.writes[self.policy] += 1
+      res = func(value)
+      if res:
+         self.value = value
+         self.timestamp = now
+      else:
+         self.invalidate()
+      return res
+
+   def invalidate(self):
+      self.value = None
+      self.timestamp = None
@@ -1,19 +1,22 @@
 
-from collections import defaultdict
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, Future, wait
 from datetime import datetime
 import json
 import os
+import re
+import threading
 
 from .config import Config, flashPath
 from .inventory import ReloadCause, ReloadCauseProvider
 from .log import getLogger
-from .utils import JsonStoredData
+from .utils import JsonStoredData, StoredData
 
 from ..descs.cause import ReloadCausePriority, ReloadCauseScore, ReloadCauseAltSource
 
 from ..libs.date import datetimeToStr, strToDatetime, epochToDatetime
 from ..libs.procfs import bootDatetime
-from ..libs.python import makedirs
+from ..libs.python import makedirs, monotonicRaw
 
 logging = getLogger(__name__)
 
@@ -151,6 +154,10 @@ class ReloadCauseProviderHelper(ReloadCauseProvider):
    def poll(self):
       return []
 
+   def getBus(self):
+      '''Physical bus used by process, None if it does not share one'''
+      return None
+
    def toDict(self):
       return {
          'name': self.getSourceName(),
@@ -181,6 +188,21 @@ class ReloadCauseProviderHelper(ReloadCauseProvider):
       res.altSource=res.altSourceFromDict(data)
       return res
 
+def i2cRootAdapter(bus):
+   '''Name of the adapter at the root of an I2C bus
+
+   The channels of a mux are adapters of their own in sysfs, nested under the
+   adapter of the master they are behind.
+   '''
+   path = os.path.realpath('/sys/bus/i2c/devices/i2c-%d' % bus)
+   adapters = [p for p in path.split(os.sep) if re.match(r'^i2c-\d+$', p)]
+   return adapters[0] if adapters else 'i2c-%d' % bus
+
+def componentBus(component):
+   '''Name of the physical I2C bus of a component, if any'''
+   bus = getattr(getattr(component, 'addr', None), 'bus', None)
+   return None if bus is None else i2cRootAdapter(bus)
+
 class PreRebootReloadCauseProvider(ReloadCauseProviderHelper):
    def __init__(self, **kwargs):
       super().__init__(priority=ReloadCausePriority.PREREBOOT, **kwargs)
@@ -249,28 +271,377 @@ class ReloadCauseDataStore(JsonStoredData):
          }],
       }
 
+class ReloadCauseHistory(object):
+   '''Append-only log of the reload cause reports
+
+   Every report is stored as one compact JSON line and a small index keeps the
+   offset of each line so that the latest reports are read without parsing the
+   whole log. Once the log holds twice the retention, it is compacted down to
+   the latest reports through an atomic replace of the file.
+   '''
+
+   def __init__(self, path, size=None):
+      prefix, _ = os.path.splitext(path)
+      self.logPath = prefix + '.log'
+      self.indexPath = prefix + '.index.json'
+      self.size = size or Config().reboot_cause_history or \
+                  RELOAD_CAUSE_HISTORY_SIZE
+      self.log_ = None
+      self.index_ = None
+      self.name = None
+      self.version = None
+      self.offsets = None
+      self.end = 0
+
+   @property
+   def log(self):
+      if self.log_ is None:
+         self.log_ = StoredData(os.path.basename(self.logPath),
+                                lifespan='persistent', path=self.logPath)
+      return self.log_
+
+   @property
+   def index(self):
+      if self.index_ is None:
+         self.index_ = JsonStoredData(os.path.basename(self.indexPath),
+                                      lifespan='persistent', path=self.indexPath)
+      return self.index_
+
+   def exist(self):
+      return self.log.exist()
+
+   def _logSize(self):
+      return os.path.getsize(self.logPath) if self.log.exist() else 0
+
+   def _rebuildIndex(self):
+      logging.debug('rebuilding reload cause index of %s', self.logPath)
+      self.offsets = []
+      offset = 0
+      with open(self.logPath, 'rb') as f:
+         for line in f:
+            # a line without its newline is what an interrupted append left
+            if not line.endswith(b'\n'):
+               break
+            try:
+               data = json.loads(line)
+               self.name, self.version = data['name'], data['version']
+            except (ValueError, KeyError):
+               break
+            self.offsets.append(offset)
+            offset += len(line)
+      self.end = offset
+
+   def load(self):
+      if self.offsets is not None:
+         return
+      self.offsets = []
+      self.end = 0
+      if not self.log.exist():
+         return
+      index = None
+      try:
+         index = self.index.readOrClear()
+      except Exception as e: # pylint: disable=broad-except
+         logging.debug('failed to load reload cause index: %s', e)
+      if index:
+         self.name = index['name']
+         self.version = index['version']
+         self.offsets = index['offsets']
+         self.end = index['end']
+      # a log shorter than indexed got compacted without its index, a longer
+      # one got appended to without its index or holds a partial record
+      if not index or self._logSize() != self.end:
+         self._rebuildIndex()
+
+   def _writeIndex(self):
+      self.index.write({
+         'name': self.name,
+         'version': self.version,
+         'offsets': self.offsets,
+         'end': self.end,
+      }, mode='w+')
+
+   def _encode(self, report):
+      data = {'name': self.name, 'version': self.version, 'report': report}
+      return json.dumps(data, separators=(',', ':')) + '\n'
+
+   def _readAt(self, f, offset):
+      f.seek(offset)
+      return json.loads(f.readline())['report']
+
+   def latest(self, count=None):
+      '''Return the latest count reports, newest first'''
+      self.load()
+      count = min(count or self.size, self.size)
+      offsets = self.offsets[-count:]
+      if not offsets:
+         return []
+      try:
+         with open(self.logPath, 'rb') as f:
+            return [self._readAt(f, offset) for offset in reversed(offsets)]
+      except (ValueError, KeyError):
+         logging.warning('reload cause index of %s is stale', self.logPath)
+         self._rebuildIndex()
+         with open(self.logPath, 'rb') as f:
+            return [self._readAt(f, o) for o in reversed(self.offsets[-count:])]
+
+   def append(self, name, version, reports):
+      '''Append the reports, oldest first, to the log
+
+      Return whether the log got compacted along the way.
+      '''
+      self.load()
+      if not reports:
+         return False
+      if self.offsets and (name, version) != (self.name, self.version):
+         raise ValueError('reload cause history belongs to %s' % self.name)
+      self.name = name
+      self.version = version
+
+      if len(self.offsets) + len(reports) > 2 * self.size:
+         self.rewrite(name, version, self.latest()[::-1] + reports)
+         return True
+
+      # drop the partial record a previous interrupted append left
+      if self._logSize() > self.end:
+         os.truncate(self.logPath, self.end)
+
+      lines = []
+      for report in reports:
+         line = self._encode(report)
+         self.offsets.append(self.end)
+         self.end += len(line)
+         lines.append(line)
+      self.log.write(''.join(lines), mode='a')
+      self._writeIndex()
+      return False
+
+   def rewrite(self, name, version, reports):
+      '''Replace the log with the latest of the reports, oldest first'''
+      self.name = name
+      self.version = version
+      self.offsets = []
+      self.end = 0
+      lines = []
+      for report in reports[-self.size:]:
+         line = self._encode(report)
+         self.offsets.append(self.end)
+         self.end += len(line)
+         lines.append(line)
+      self.log.write(''.join(lines), mode='w+')
+      self._writeIndex()
+
+   def toDict(self):
+      return {
+         'version': self.version,
+         'name': self.name,
+         'reports': self.latest(),
+      }
+
+class ReloadCauseProviderRun(object):
+   '''Processing of a provider along with its timing'''
+
+   PENDING = 'pending'
+   RUNNING = 'running'
+   DONE = 'done'
+   FAILED = 'failed'
+   TIMEOUT = 'timeout'
+   SKIPPED = 'skipped'
+
+   def __init__(self, provider):
+      self.provider = provider
+      self.bus = None
+      self.name = 'unknown'
+      try:
+         self.name = provider.getSourceName()
+         self.bus = provider.getBus()
+      except Exception: # pylint: disable=broad-except
+         logging.exception("Failed to describe reload cause provider %s",
+                           self.name)
+      self.status = self.PENDING
+      self.start = None
+      self.end = None
+
+   def duration(self):
+      if self.start is None:
+         return None
+      end = self.end if self.end is not None else monotonicRaw()
+      return end - self.start
+
+   def toDict(self):
+      duration = self.duration()
+      return {
+         'name': self.name,
+         'bus': self.bus,
+         'status': self.status,
+         'duration': round(duration, 6) if duration is not None else None,
+      }
+
+class ReloadCauseProviderGroup(object):
+   '''Providers sharing a bus, processed one after the other'''
+   def __init__(self, runs):
+      self.runs = runs
+      self.lock = threading.Lock()
+      self.abandoned = False
+
+   def current(self):
+      for run in self.runs:
+         if run.status in (run.PENDING, run.RUNNING):
+            return run
+      return None
+
+   def _setStatus(self, run, status, expected):
+      with self.lock:
+         if run.status == expected:
+            run.status = status
+            return True
+         return False
+
+   def process(self):
+      for run in self.runs:
+         with self.lock:
+            if self.abandoned:
+               run.status = run.SKIPPED
+               continue
+            run.status = run.RUNNING
+            run.start = monotonicRaw()
+         status = run.FAILED
+         try:
+            run.provider.process()
+            status = run.DONE
+         except Exception:  # pylint: disable=broad-except
+            logging.exception(
+               "Failed to get reload cause from provider %s", run.name)
+         finally:
+            run.end = monotonicRaw()
+            self._setStatus(run, status, run.RUNNING)
+
+   def abandon(self, run):
+      '''Give up on a provider that timed out and the ones queued behind it'''
+      with self.lock:
+         self.abandoned = True
+         for other in self.runs:
+            if other.status == other.PENDING:
+               other.status = other.SKIPPED
+      if self._setStatus(run, run.TIMEOUT, run.RUNNING):
+         logging.error("Reload cause provider %s timed out after %.1fs",
+                       run.name, run.duration())
+
 class ReloadCauseReport(object):
    def __init__(self, date=None, cause=None, providers=None):
       self.date = date
       self.cause = cause
       self.providers = providers or []
-
-   def processProviders(self, providers):
-      for provider in sorted(providers, key=lambda p: p.getPriority()):
+      # timing breakdown of the processing, not persisted
+      self.timings = []
+
+   @staticmethod
+   def _groupRuns(runs):
+      groups = {}
+      independent = []
+      for run in runs:
+         if run.bus is None:
+            independent.append(ReloadCauseProviderGroup([run]))
+         else:
+            groups.setdefault(run.bus, []).append(run)
+      return [ReloadCauseProviderGroup(g) for g in groups.values()] + independent
+
+   @staticmethod
+   def _startGroups(groups, workers):
+      '''Process the groups in daemon threads, returning a future for each
+
+      The threads are not joined when the process exits, which would wait for
+      the providers that timed out.
+      '''
+      futures = {Future(): group for group in groups}
+      queue = deque(futures.items())
+      def worker():
+         while True:
+            try:
+               future, group = queue.popleft()
+            except IndexError:
+               return
+            if not future.set_running_or_notify_cancel():
+               continue
+            try:
+               group.process()
+            except Exception as e: # pylint: disable=broad-except
+               future.set_exception(e)
+            else:
+               future.set_result(None)
+      for i in range(min(workers, len(groups))):
+         threading.Thread(target=worker, name='reload-cause-%d' % i,
+                          daemon=True).start()
+      return futures
+
+   @staticmethod
+   def _waitGroups(futures, timeout):
+      '''Wait for the groups, abandoning the providers exceeding the timeout
+
+      Python threads cannot be interrupted, a provider that times out keeps its
+      worker busy until it returns and its result is ignored.
+      '''
+      pending = dict(futures)
+      # bound the total time in case every worker got stuck
+      count = sum(len(group.runs) for group in pending.values())
+      deadline = monotonicRaw() + timeout * count
+      while pending:
+         now = monotonicRaw()
+         wakeup = deadline
+         for future, group in list(pending.items()):
+            run = group.current()
+            if run is None:
+               continue
+            start = run.start if run.start is not None else now
+            if now - start >= timeout or now >= deadline:
+               group.abandon(run)
+               del pending[future]
+            else:
+               wakeup = min(wakeup, start + timeout)
+         if not pending:
+            break
+         done, _ = wait(pending, timeout=max(0., wakeup - now),
+                        return_when=FIRST_COMPLETED)
+         for future in done:
+            del pending[future]
+
+   def processProviders(self, providers, workers=None, timeout=None):
+      '''Process the providers concurrently, one worker per physical bus'''
+      config = Config()
+      workers = config.reboot_cause_workers if workers is None else workers
+      timeout = config.reboot_cause_timeout if timeout is None else timeout
+
+      start = monotonicRaw()
+      runs = [ReloadCauseProviderRun(p)
+              for p in sorted(providers, key=lambda p: p.getPriority())]
+      groups = self._groupRuns(runs)
+      if workers <= 1 or not groups:
+         for group in groups:
+            group.process()
+      else:
+         futures = self._startGroups(groups, workers)
+         self._waitGroups(futures, timeout)
+         for future in futures:
+            future.cancel()
+      logging.info("Processed %d reload cause providers in %.3fs: %s",
+                   len(runs), monotonicRaw() - start,
+                   ', '.join('%s %s %.3fs' % (r.name, r.status, r.duration() or 0.)
+                             for r in runs))
+
+      # keep the ordering of a sequential processing
+      for run in runs:
+         self.timings.append(run.toDict())
+         if run.status != run.DONE:
+            continue
          try:
-            provider.process()
-            remotes = provider.getRemoteProviders()
+            remotes = run.provider.getRemoteProviders()
             if remotes:
                self.providers.extend(remotes)
             else:
-               self.providers.append(provider)
+               self.providers.append(run.provider)
          except Exception:  # pylint: disable=broad-except
-            sourceName = 'unknown'
-            try:
-               sourceName = provider.getSourceName()
-            finally:
-               logging.exception(
-                  "Failed to get reload cause from provider %s", sourceName)
+            logging.exception(
+               "Failed to get reload cause from provider %s", run.name)
 
    def analyzeCauseFromProviders(self, providers, orderByScore):
       causes = defaultdict(list)
@@ -410,6 +781,7 @@ class ReloadCauseReport(object):
 class ReloadCauseManager(object):
 
    VERSION = 3
+   CAUSE_FILE_MARKER = '{"history":'
 
    NEW_VERSION_PRIORITIES = [ReloadCausePriority.PREREBOOT,
                              ReloadCausePriority.HARDWARE_MAIN,
@@ -419,8 +791,11 @@ class ReloadCauseManager(object):
    def __init__(self, name=None, path=None):
       self.name = name
       self.path = path or flashPath('reboot-cause/platform/causes.json')
+      self.history = ReloadCauseHistory(self.path)
       self.loaded = False
+      self.rewrite = False
       self.reports = []
+      self.unsaved = []
 
    @classmethod
    def processReportCause(cls, report):
@@ -455,10 +830,10 @@ class ReloadCauseManager(object):
          except Exception: # pylint: disable=broad-except
             logging.exception('failed to sync rtc %s', rtc.getName())
 
-   def readCauses(self, inventory, date=None):
+   def readCauses(self, inventory, date=None, count=None):
       '''Read reload causes from hardware'''
       try:
-         self.loadCauses()
+         self.loadCauses(count=count)
       except Exception: # pylint: disable=broad-except
          logging.exception("Failed to read previous reboot causes")
       self.syncRtcs(inventory)
@@ -472,6 +847,7 @@ class ReloadCauseManager(object):
       # TODO: only add report if there is none for current boot
       #       probably a tempfile under /run/platform_cache/
       self.reports.insert(0, report)
+      self.unsaved.insert(0, report)
 
    def _getArchivePath(self, existingName):
       oldName = existingName.replace('/', '-')
@@ -521,16 +897,58 @@ class ReloadCauseManager(object):
 
       return None
 
-   def loadCauses(self):
-      '''Load reload causes from file'''
+   def loadHistory(self, count=None):
+      self.history.load()
+      if self.history.name is not None and self.history.name != self.name:
+         # archived or loaded as a whole to be rewritten under the new name
+         self.fromDict(self.history.toDict())
+         self.rewrite = True
+         return
+      self.reports.extend(ReloadCauseReport.fromDict(d)
+                          for d in self.history.latest(count))
+
+   def isCauseFileLegacy(self):
+      '''Whether the cause file got written by a release predating the history
+
+      Those releases drop the marker the cause file is written with, which is
+      the first key so that only the head of the file needs to be read.
+      '''
+      if not os.path.exists(self.path):
+         return False
+      if not self.history.exist():
+         return True
+      with open(self.path) as f:
+         return f.read(len(self.CAUSE_FILE_MARKER)) != self.CAUSE_FILE_MARKER
+
+   def mergeReports(self):
+      '''Order the reports newest first, dropping the ones loaded twice'''
+      reports = {}
+      for report in self.reports:
+         reports.setdefault(report.date, report)
+      self.reports = sorted(reports.values(), key=lambda r: r.date, reverse=True)
+
+   def loadCauses(self, count=None):
+      '''Load the latest count reload causes from file, all of them by default'''
       assert not self.loaded
+      # reports stored before the history, or by a release predating it after
+      # a downgrade, are migrated into it as a whole
+      fromCauseFile = self.isCauseFileLegacy()
+      migrate = fromCauseFile or \
+                ReloadCauseDataStore(lifespan='persistent').exist()
+      try:
+         self.loadHistory(count=None if migrate else count)
+      except Exception: # pylint: disable=broad-except
+         logging.exception("Failed to load reload cause history")
       try:
          self.loadLegacyCauseFile()
       except Exception: # pylint: disable=broad-except
          logging.exception("Failed to load legacy reload causes")
-      data = self.loadCauseFile(self.path)
-      if data:
-         self.fromDict(data)
+      if fromCauseFile:
+         data = self.loadCauseFile(self.path)
+         if data:
+            self.fromDict(data)
+         self.mergeReports()
+      self.rewrite |= migrate
       self.loaded = True
 
    def lastReport(self):
@@ -553,7 +971,7 @@ class ReloadCauseManager(object):
       }
 
    def storeCauses(self):
-      '''Store reload causes into a file'''
+      '''Append the new reload causes to the history'''
       if not self.loaded:
          raise RuntimeError("Storing reboot cause without loading them first")
 
@@ -561,27 +979,54 @@ class ReloadCauseManager(object):
       if not os.path.isdir(folder):
          makedirs(folder, mode=0o755, exist_ok=True)
 
-      with open(self.path, 'w') as f:
-         json.dump(self.toDict(), f, indent=3, separators=(',', ': '))
-
-def getReloadCauseManager(platform, read=False):
+      if self.rewrite or not self.history.exist():
+         reports = [r.toDict() for r in reversed(self.reports)]
+         self.history.rewrite(self.name, self.VERSION, reports)
+         rewritten = True
+      else:
+         reports = [r.toDict() for r in reversed(self.unsaved)]
+         rewritten = self.history.append(self.name, self.VERSION, reports)
+      self.rewrite = False
+      self.unsaved = []
+      if rewritten:
+         try:
+            self.storeCauseFile()
+         except Exception: # pylint: disable=broad-except
+            logging.exception("Failed to store the reload cause file")
+
+   def storeCauseFile(self):
+      '''Write the retained history to the cause file, along with a marker
+
+      Releases predating the history only read and write the cause file. It is
+      only written when the history gets rewritten or compacted, so a downgrade
+      finds the reports as of then. Whatever such a release stores there lacks
+      the marker and is migrated back into the history once upgraded again.
+      '''
+      data = {'history': os.path.basename(self.history.logPath)}
+      data.update(self.history.toDict())
+      tmpPath = self.path + '.tmp'
+      with open(tmpPath, 'w') as f:
+         json.dump(data, f, separators=(',', ':'))
+      os.replace(tmpPath, self.path)
+
+def getReloadCauseManager(platform, read=False, count=None):
    rcm = ReloadCauseManager(name=platform.getEeprom().get('SerialNumber'))
    if read:
-      rcm.readCauses(platform.getInventory())
+      rcm.readCauses(platform.getInventory(), count=count)
       rcm.storeCauses()
       platform.handleUngracefulReboot(reloadCauseReport=rcm.lastReport())
    else:
-      rcm.loadCauses()
+      rcm.loadCauses(count=count)
    return rcm
 
-def getLinecardReloadCauseManager(linecard, read=False):
+def getLinecardReloadCauseManager(linecard, read=False, count=None):
    slotId = linecard.getSlotId()
    rcm = ReloadCauseManager(
       name=linecard.getEeprom().get('SerialNumber'),
       path=flashPath(f'reboot-cause/platform/card{slotId}.json'))
    if read:
-      rcm.readCauses(linecard.getInventory())
+      rcm.readCauses(linecard.getInventory(), count=count)
       rcm.storeCauses()
    else:
-      rcm.loadCauses()
+      rcm.loadCauses(count=count)
    return rcm
@@ -1,4 +1,5 @@
 from collections import OrderedDict
+from contextlib import ExitStack
 from datetime import datetime
 from typing import List
 
@@ -182,25 +183,36 @@ class Component(object):
             raise
          return {}
 
-   def genDiag(self, ctx):
-      output = {
-         "version": 2,
-         "classes": [c.__name__ for c in self.__class__.__mro__[:-1]],
-         "name": str(self),
-         "data": self.__try_diag__(ctx),
-         "drivers": [d.genDiag(ctx) for d in self.drivers.values()],
-         "components": [],
-         "inventory": None,
-      }
-
-      if isinstance(self.inventory, Inventory) and \
-         self.inventory not in ctx.inventories:
+   def snapshotDrivers(self, stack):
+      for driver in self.drivers.values():
          try:
-            output["inventory"] = self.inventory.__diag__(ctx)
+            stack.enter_context(driver.snapshot())
          except Exception: # pylint: disable=broad-except
-            if not ctx.safe:
-               raise
-         ctx.inventories.add(self.inventory)
+            logging.debug('%s: failed to snapshot %s', self, driver)
+
+   def genDiag(self, ctx):
+      with ExitStack() as stack:
+         if ctx.performIo:
+            # serve the inventory getters from a coherent view of the hardware
+            self.snapshotDrivers(stack)
+         output = {
+            "version": 2,
+            "classes": [c.__name__ for c in self.__class__.__mro__[:-1]],
+            "name": str(self),
+            "data": self.__try_diag__(ctx),
+            "drivers": [d.genDiag(ctx) for d in self.drivers.values()],
+            "components": [],
+            "inventory": None,
+         }
+
+         if isinstance(self.inventory, Inventory) and \
+            self.inventory not in ctx.inventories:
+            try:
+               output["inventory"] = self.inventory.__diag__(ctx)
+            except Exception: # pylint: disable=broad-except
+               if not ctx.safe:
+                  raise
+            ctx.inventories.add(self.inventory)
 
       if ctx.recursive:
          output["components"] = [c.genDiag(ctx) for c in
@@ -20,6 +20,9 @@ class DefaultConfig:
    lock_scd_conf: bool = True
    init_irq: bool = True
    reboot_cause_file: str = 'last_reboot_cause'
+   reboot_cause_workers: int = 4
+   reboot_cause_timeout: float = 30.
+   reboot_cause_history: Optional[int] = None
    persistent_presence_check: bool = True
    lock_file: str = '/var/lock/arista.lock'
    linecard_lock_file_pattern: str = \
@@ -31,6 +34,18 @@ class DefaultConfig:
    power_off_linecard_wait_pci_timeout: int = 20
    write_hw_thresholds: bool = True
    report_hw_thresholds: bool = False
+   sysfs_persistent_fds: bool = False
+   read_cache_freshness: Optional[dict] = None
+   write_shadow_refresh: Optional[float] = None
+   i2c_arbitration: bool = False
+   i2c_arbitration_starvation: float = 0.1
+   i2c_breaker_threshold: int = 0
+   i2c_breaker_backoff: float = 1.
+   i2c_breaker_backoff_max: float = 60.
+   i2c_breaker_stall_time: float = 0.02
+   i2c_stats: bool = True
+   power_telemetry_interval: Optional[float] = None
+   power_telemetry_samples: int = 60
    watchdog_state_file: str = 'watchdog.json'
    xcvr_lpmode_out: bool = False
    api_use_sfpoptoe: bool = True
@@ -47,6 +62,7 @@ class DefaultConfig:
    api_linecard_reboot_graceful: bool = False
    cooling_asic_via_db: bool = False
    cooling_data_points: int = 3
+   cooling_history_hours: Optional[float] = None
    cooling_export_path: Optional[str] = None
    cooling_max_decrease: float = 10.
    cooling_max_increase: float = 25.
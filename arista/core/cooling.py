@@ -1,3 +1,4 @@
+from array import array
 import copy
 import csv
 import datetime
@@ -8,6 +9,7 @@ from dataclasses import dataclass
 
 from ..libs.python import monotonicRaw
 
+from .arbiter import I2cPriority, i2cPriority
 from .config import Config
 from .log import getLogger
 from .thermal_policy_config import ThermalPolicyConfig
@@ -20,50 +22,155 @@ class Airflow(object):
    EXHAUST = 'exhaust'
    INTAKE = 'intake'
 
+class HistoricalSeries(object):
+   '''Fixed size ring buffer of (timestamp, value) samples
+
+   Missing values are stored as NaN and read back as None.
+   '''
+
+   def __init__(self, size, samples=None):
+      self.timestamps = array('d', [0.] * size)
+      self.values = array('d', [0.] * size)
+      self.index = 0
+      self.count = 0
+      for sample in samples or []:
+         self.append(sample)
+
+   def __len__(self):
+      return self.count
+
+   def __getitem__(self, key):
+      if key < 0:
+         key += self.count
+      if not 0 <= key < self.count:
+         raise IndexError(key)
+      i = (self.index - self.count + key) % len(self.values)
+      value = self.values[i]
+      return (self.timestamps[i], None if math.isnan(value) else value)
+
+   def __iter__(self):
+      for i in range(self.count):
+         yield self[i]
+
+   def add(self, now, value):
+      self.timestamps[self.index] = now
+      self.values[self.index] = math.nan if value is None else value
+      self.index = (self.index + 1) % len(self.values)
+      self.count = min(self.count + 1, len(self.values))
+
+   def append(self, sample):
+      self.add(*sample)
+
+class HistoricalSummary(object):
+   '''Ring buffer of the min/max/avg of the samples over each period'''
+   def __init__(self, size, period=60.):
+      self.period = period
+      self.starts = array('d', [0.] * size)
+      self.mins = array('d', [0.] * size)
+      self.maxs = array('d', [0.] * size)
+      self.sums = array('d', [0.] * size)
+      self.counts = array('L', [0] * size)
+      self.index = -1
+      self.count = 0
+
+   def __len__(self):
+      return self.count
+
+   def __getitem__(self, key):
+      if key < 0:
+         key += self.count
+      if not 0 <= key < self.count:
+         raise IndexError(key)
+      i = (self.index - self.count + 1 + key) % len(self.starts)
+      return (self.starts[i], self.mins[i], self.maxs[i],
+              self.sums[i] / self.counts[i])
+
+   def __iter__(self):
+      for i in range(self.count):
+         yield self[i]
+
+   def add(self, now, value):
+      if value is None:
+         return
+      start = now - now % self.period
+      i = self.index
+      if not self.count or start > self.starts[i]:
+         i = self.index = (i + 1) % len(self.starts)
+         self.count = min(self.count + 1, len(self.starts))
+         self.starts[i] = start
+         self.mins[i] = self.maxs[i] = self.sums[i] = value
+         self.counts[i] = 1
+         return
+      self.mins[i] = min(self.mins[i], value)
+      self.maxs[i] = max(self.maxs[i], value)
+      self.sums[i] += value
+      self.counts[i] += 1
+
 class HistoricalData(object):
-   def __init__(self, name):
+   def __init__(self, name, history=False):
       self.name = name
       self.maxlen = max(3, Config().cooling_data_points)
-      self.set = []
-      self.get = []
+      self.set_ = HistoricalSeries(self.maxlen)
+      self.get_ = HistoricalSeries(self.maxlen)
+      self.history = None
+      hours = Config().cooling_history_hours
+      if history and hours:
+         self.history = HistoricalSummary(int(hours * 60), period=60.)
+
+   @property
+   def get(self):
+      return self.get_
+
+   @get.setter
+   def get(self, samples):
+      self.get_ = HistoricalSeries(self.maxlen, samples)
+
+   @property
+   def set(self):
+      return self.set_
+
+   @set.setter
+   def set(self, samples):
+      self.set_ = HistoricalSeries(self.maxlen, samples)
 
    def getValue(self, now, value):
-      self.get.append((now, value))
-      if len(self.get) > self.maxlen:
-         self.get = self.get[1:]
+      self.get_.add(now, value)
+      if self.history is not None:
+         self.history.add(now, value)
       return value
 
    def setValue(self, now, value):
-      self.set.append((now, value))
-      if len(self.set) > self.maxlen:
-         self.set = self.set[1:]
+      self.set_.add(now, value)
       return value
 
    @property
    def lastSet(self):
-      if not self.set:
+      if not self.set_:
          return None
-      return self.set[-1][1]
+      return self.set_[-1][1]
 
    @property
    def lastGet(self):
-      if not self.get:
+      if not self.get_:
          return None
-      return self.get[-1][1]
+      return self.get_[-1][1]
 
    def getLast(self, num):
       try:
-         return self.get[-num][1]
+         return self.get_[-num][1]
       except IndexError:
          return None
 
    @property
    def data(self):
-      return {
+      data = {
          'name': self.name,
-         'get': self.get,
-         'set': self.set,
+         'get': list(self.get_),
+         'set': list(self.set_),
       }
+      if self.history is not None:
+         data['history'] = list(self.history)
+      return data
 
 class CoolingObject(object):
    def __init__(self, name, inv=None):
@@ -71,7 +178,7 @@ class CoolingObject(object):
       self.config = None
       self.configInitialized = False
       self.name = name
-      self.data = HistoricalData(name)
+      self.data = HistoricalData(name, history=True)
       self.inv = inv
       self.zone = None
 
@@ -643,6 +750,9 @@ class ThermalExporter:
 
       self.thermalCsv = ThermalExportCsv(path, 'thermals.csv')
       self.fanCsv = ThermalExportCsv(path, 'fans.csv')
+      self.thermalSummaryCsv = ThermalExportCsv(path, 'thermals-summary.csv')
+      self.fanSummaryCsv = ThermalExportCsv(path, 'fans-summary.csv')
+      self.summaryStarts = {}
 
       self.startMono = None
 
@@ -691,6 +801,24 @@ class ThermalExporter:
 
       self.thermalCsv.open()
       self.fanCsv.open()
+      self.thermalSummaryCsv.open()
+      self.fanSummaryCsv.open()
+
+   def newPeriods(self, key, history):
+      '''Periods of the history completed since the last export'''
+      if history is None:
+         return []
+      nextStart = self.summaryStarts.get(key, self.startMono)
+      periods = []
+      # the newest period is still being filled
+      for i in range(len(history) - 2, -1, -1):
+         period = history[i]
+         if period[0] < nextStart:
+            break
+         periods.append(period)
+      if periods:
+         self.summaryStarts[key] = periods[0][0] + history.period
+      return reversed(periods)
 
    def exportZone(self, zone, now):
       for key, thermal in zone.thermals.items():
@@ -715,6 +843,17 @@ class ThermalExporter:
 
          self.thermalCsv.writerow(row)
 
+         for start, low, high, avg in self.newPeriods(('thermal', key),
+                                                      thermal.data.history):
+            self.thermalSummaryCsv.writerow([
+               # start of the period (relative to start of export)
+               int(start - self.startMono),
+               # sensor ID
+               self.thermalIdMap[key],
+               # min, max and average temperature over the period
+               low, high, avg,
+            ])
+
       ts = zone.speed.set[-1][0]
       configured = zone.logic.exportCooling()
 
@@ -736,6 +875,19 @@ class ThermalExporter:
             actual
          ])
 
+         for start, low, high, avg in self.newPeriods(('fan', key),
+                                                      fan.data.history):
+            self.fanSummaryCsv.writerow([
+               # start of the period (relative to start of export)
+               int(start - self.startMono),
+               # fan zone
+               zone.name,
+               # fan name
+               key,
+               # min, max and average speed over the period
+               low, high, avg,
+            ])
+
    def run(self, zones, now):
       self.load(zones, now)
 
@@ -744,10 +896,14 @@ class ThermalExporter:
 
       self.thermalCsv.flush()
       self.fanCsv.flush()
+      self.thermalSummaryCsv.flush()
+      self.fanSummaryCsv.flush()
 
    def close(self):
       self.thermalCsv.close()
       self.fanCsv.close()
+      self.thermalSummaryCsv.close()
+      self.fanSummaryCsv.close()
 
 class CoolingAlgorithm(object):
 
@@ -817,14 +973,15 @@ class CoolingAlgorithm(object):
       for fan in fans.values():
          fan.loadConfig(self.config)
 
-      for zoneName, zone in self.zones.items():
-         zoneFans = {n: f for n, f in fans.items() if f.zone == zoneName}
-         zoneThermals = {n: t for n, t in thermals.items()
-                        if t.zone == zoneName}
-         zone.run(fans=zoneFans,
-                  thermals=zoneThermals,
-                  update=update,
-                  extraPwms=extraPwms)
+      with i2cPriority(I2cPriority.COOLING):
+         for zoneName, zone in self.zones.items():
+            zoneFans = {n: f for n, f in fans.items() if f.zone == zoneName}
+            zoneThermals = {n: t for n, t in thermals.items()
+                           if t.zone == zoneName}
+            zone.run(fans=zoneFans,
+                     thermals=zoneThermals,
+                     update=update,
+                     extraPwms=extraPwms)
       logging.debug('%s: algorithm took %.4fs to run', self,
                     monotonicRaw() - self.now)
 
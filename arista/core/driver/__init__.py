@@ -1,8 +1,10 @@
 
 import os
 import subprocess
+from contextlib import nullcontext
 
 from .. import utils
+from ..cache import ReadCacheStats, WriteShadowStats
 from ..utils import FileWaiter, inDebug, inSimulation
 from ..log import getLogger
 
@@ -63,6 +65,8 @@ def isModuleLoaded(name):
 
 class Driver(object):
    def __init__(self, **kwargs):
+      self.readCacheStats = ReadCacheStats()
+      self.writeShadowStats = WriteShadowStats()
       self.__dict__.update(kwargs)
 
    def setup(self):
@@ -83,6 +87,13 @@ class Driver(object):
    def resetOut(self):
       pass
 
+   def snapshot(self):
+      return nullcontext()
+
+   def transaction(self):
+      '''Own the bus the device sits on for the duration of the block'''
+      return nullcontext()
+
    def __diag__(self, ctx): # pylint: disable=unused-argument
       return {}
 
@@ -99,6 +110,8 @@ class Driver(object):
          "version": 1,
          "name": self.__class__.__name__,
          "data": self.__try_diag__(ctx),
+         "readCache": self.readCacheStats.__diag__(ctx),
+         "writeShadow": self.writeShadowStats.__diag__(ctx),
       }
 
    def __str__(self):
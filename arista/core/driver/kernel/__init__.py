@@ -17,6 +17,7 @@ from ....libs.retry import tryGet
 from .sysfs import (
    FanSysfsImpl,
    GpioSysfsImpl,
+   HwmonSnapshot,
    LedLegacySysfsImpl,
    RailSysfsImpl,
    ResetSysfsImpl,
@@ -37,17 +38,23 @@ class KernelDriver(Driver):
       self.margs = margs if margs is not None else self.ARGS
       self.module = module or self.MODULE
       self.hwmonPath = None
+      self.sysfsEntries = set()
+      self.snapshot_ = None
 
    def __str__(self):
       return '%s(module=%s)' % (self.__class__.__name__, self.module)
 
    def setup(self):
+      # the hwmon folder may be recreated, resolve it again on next access
+      self.invalidateHwmonPath()
       if self.PASSIVE:
          return
       if not self.loaded():
          modprobe(self.module, self.margs)
 
    def clean(self):
+      self.closeSysfsEntries()
+
       if self.PASSIVE:
          return
 
@@ -79,9 +86,26 @@ class KernelDriver(Driver):
          self.hwmonPath = utils.locateHwmonFolder(self.getSysfsPath())
       return self.hwmonPath
 
+   def invalidateHwmonPath(self):
+      self.hwmonPath = None
+
    def getHwmonEntry(self, entry):
       return os.path.join(self.getHwmonPath(), entry)
 
+   def snapshot(self):
+      path = None
+      if not utils.inSimulation():
+         path = tryGet(self.getHwmonPath, default=None)
+      return HwmonSnapshot(self, path)
+
+   def trackSysfsEntry(self, entry):
+      self.sysfsEntries.add(entry)
+
+   def closeSysfsEntries(self):
+      for entry in self.sysfsEntries:
+         entry.close()
+      self.sysfsEntries.clear()
+
    def __diag__(self, ctx):
       return {
          "module": self.module,
@@ -1,6 +1,7 @@
 
 import os
 
+from ...arbiter import I2cPriority, currentI2cPriority, i2cTransaction
 from ...log import getLogger
 from ...utils import inSimulation
 
@@ -11,12 +12,17 @@ logging = getLogger(__name__)
 class I2cKernelDriver(KernelDriver):
 
    NAME = None
+   I2C_PRIORITY = I2cPriority.DEFAULT
 
    def __init__(self, addr=None, name=None, **kwargs):
       super(I2cKernelDriver, self).__init__(**kwargs)
       self.addr = addr
       self.name = name or self.NAME
 
+   def transaction(self):
+      '''Serialize the sysfs accesses with the user space drivers on the bus'''
+      return i2cTransaction(self.addr.bus, currentI2cPriority(self.I2C_PRIORITY))
+
    def setup(self):
       # Load module
       super(I2cKernelDriver, self).setup()
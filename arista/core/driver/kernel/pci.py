@@ -1,15 +1,20 @@
 
 import os
 
-from ...utils import FileWaiter, MmapResource
+from ...utils import FileWaiter, getMmapPool, MmapResource
 
 from . import KernelDriver
 
 class PciKernelDriver(KernelDriver):
-   def __init__(self, addr=None, registerCls=None, **kwargs):
+
+   REGISTER_STRIDE = 4
+   SUPPORTS_BLOCK_READ = True
+
+   def __init__(self, addr=None, registerCls=None, pooledMmap=True, **kwargs):
       super(PciKernelDriver, self).__init__(**kwargs)
       self.addr = addr
       self.regs = registerCls(self) if registerCls is not None else None
+      self.pooledMmap = pooledMmap
       self.mmap_ = None
 
    @property
@@ -18,16 +23,36 @@ class PciKernelDriver(KernelDriver):
          path = os.path.join(self.addr.getSysfsPath(), "resource0")
          if not FileWaiter(path, 5).waitFileReady():
             raise IOError('Mmap failed because file %s doesn\'t exist' % path)
-         self.mmap_ = MmapResource(path)
-         if not self.mmap_.map():
+         if not self.pooledMmap:
+            mmap = MmapResource(path)
+            if not mmap.map():
+               raise IOError('Failed to mmap file %s' % path)
+            self.mmap_ = mmap
+            return self.mmap_
+         mmap = getMmapPool().acquire(path)
+         if not mmap.openResource():
+            getMmapPool().release(path)
             raise IOError('Failed to mmap file %s' % path)
+         self.mmap_ = mmap
       return self.mmap_
 
+   def clean(self):
+      if self.mmap_ is not None:
+         if self.pooledMmap:
+            getMmapPool().release(self.mmap_.path_)
+         else:
+            self.mmap_.closeResource()
+         self.mmap_ = None
+      super(PciKernelDriver, self).clean()
+
    def write(self, addr, value):
       self.mmap.write32(addr, value)
 
    def read(self, addr):
       return self.mmap.read32(addr)
 
+   def readRange(self, addr, count):
+      return self.mmap.read32Range(addr, count)
+
    def getSysfsPath(self):
       return self.addr.getSysfsPath()
@@ -1,7 +1,9 @@
 
+import errno
 import os
 
 from ... import utils
+from ...cache import ReadCache, WriteShadow
 from ...config import Config
 from ...log import getLogger
 
@@ -24,15 +26,99 @@ from ....inventory.temp import Temp
 
 logging = getLogger(__name__)
 
+class HwmonSnapshot(dict):
+   """Point in time view of all the attributes of a hwmon folder.
+
+   Values are converted to int when possible and left as str otherwise.
+   While used as a context manager, SysfsEntry objects of the driver living
+   under the snapshotted folder are served from it instead of sysfs.
+   """
+   def __init__(self, driver, path=None):
+      super().__init__()
+      self.driver = driver
+      self.path = path
+      self.raw = {}
+      self.previous_ = None
+      if path is not None:
+         self._load()
+
+   def __str__(self):
+      return '%s(path=%s)' % (self.__class__.__name__, self.path)
+
+   def _load(self):
+      try:
+         entries = list(os.scandir(self.path))
+      except OSError:
+         logging.debug('%s: failed to list hwmon entries', self)
+         self.path = None
+         return
+
+      for entry in entries:
+         if not entry.is_file(follow_symlinks=False):
+            continue
+         # write only attributes are still recorded so that exists() holds
+         self.raw[entry.name] = None
+         try:
+            with open(entry.path, 'r') as f:
+               value = f.read().rstrip()
+         except OSError:
+            continue
+         self.raw[entry.name] = value
+         try:
+            self[entry.name] = int(value)
+         except ValueError:
+            self[entry.name] = value
+
+   def covers(self, path):
+      return self.path is not None and os.path.dirname(path) == self.path
+
+   def exists(self, path):
+      return os.path.basename(path) in self.raw
+
+   def read(self, path):
+      return self.raw.get(os.path.basename(path))
+
+   def invalidate(self, path):
+      name = os.path.basename(path)
+      if name in self.raw:
+         self.raw[name] = None
+         self.pop(name, None)
+
+   def __enter__(self):
+      self.previous_ = self.driver.snapshot_
+      self.driver.snapshot_ = self
+      return self
+
+   def __exit__(self, *args):
+      self.driver.snapshot_ = self.previous_
+      self.previous_ = None
+
 class SysfsEntry(object):
-   def __init__(self, parent, name, prefix=None, pathCallback=None):
+
+   # errors returned on a stale descriptor after a driver rebind or when the
+   # hwmon device got renumbered, the entry has to be looked up again
+   STALE_ERRNOS = (errno.ENODEV, errno.ESTALE, errno.ENOENT)
+
+   def __init__(self, parent, name, prefix=None, pathCallback=None,
+                persistent=None, policy=None, shadow=None):
       self.parent = parent
       self.driver = parent.driver
+      self.cache = ReadCache(policy or 'sysfs',
+                             stats=getattr(self.driver, 'readCacheStats', None),
+                             shared=True)
+      self.shadow = None
+      if shadow is not None:
+         self.shadow = WriteShadow(shadow,
+                                   stats=getattr(self.driver, 'writeShadowStats',
+                                                 None))
       self.baseName = name
       self.name_ = None
       self.prefix_ = prefix
       self.pathCallback = pathCallback or self.driver.getHwmonEntry
       self.entryPath_ = None
+      self.persistent = persistent if persistent is not None else \
+                        Config().sysfs_persistent_fds
+      self.fd_ = None
 
    def __str__(self):
       return '%s(path=%s)' % (self.__class__.__name__, self.entryPath)
@@ -57,8 +143,17 @@ class SysfsEntry(object):
          self.entryPath_ = self.pathCallback(self.name)
       return self.entryPath_
 
+   def _activeSnapshot(self):
+      snapshot = self.driver.snapshot_
+      if snapshot is not None and snapshot.covers(self.entryPath):
+         return snapshot
+      return None
+
    def exists(self):
       try:
+         snapshot = self._activeSnapshot()
+         if snapshot is not None:
+            return snapshot.exists(self.entryPath)
          return os.path.exists(self.entryPath)
       except FileNotFoundError:
          return False
@@ -69,12 +164,58 @@ class SysfsEntry(object):
    def _writeConversion(self, value):
       return str(value)
 
+   def _open(self):
+      if self.fd_ is None:
+         try:
+            self.fd_ = os.open(self.entryPath, os.O_RDWR)
+         except PermissionError:
+            # read only attributes cannot be opened for writing
+            self.fd_ = os.open(self.entryPath, os.O_RDONLY)
+         self.driver.trackSysfsEntry(self)
+      return self.fd_
+
+   def close(self):
+      if self.fd_ is not None:
+         try:
+            os.close(self.fd_)
+         except OSError:
+            pass
+         self.fd_ = None
+
+   def invalidate(self):
+      self.close()
+      self.entryPath_ = None
+      if self.shadow is not None:
+         self.shadow.invalidate()
+
+   def _persistentIo(self, func):
+      try:
+         return func(self._open())
+      except OSError as e:
+         if e.errno not in self.STALE_ERRNOS:
+            raise
+      logging.debug('%s: stale sysfs entry, reopening', self)
+      self.invalidate()
+      self.driver.invalidateHwmonPath()
+      return func(self._open())
+
+   def _readPersistent(self):
+      return self._persistentIo(
+         lambda fd: os.pread(fd, 4096, 0).decode('utf-8', errors='replace'))
+
+   def _writePersistent(self, value):
+      data = value.encode('utf-8')
+      return self._persistentIo(lambda fd: os.pwrite(fd, data, 0))
+
    def _read(self):
       if utils.inSimulation():
          return '1'
       try:
-         with open(self.entryPath, 'r') as f:
-            return f.read()
+         with self.driver.transaction():
+            if self.persistent:
+               return self._readPersistent()
+            with open(self.entryPath, 'r') as f:
+               return f.read()
       except IOError:
          logging.error("read sysfs failed on %s", self.entryPath)
          return None
@@ -83,23 +224,42 @@ class SysfsEntry(object):
       if utils.inSimulation():
          return True
       try:
-         with open(self.entryPath, 'w') as f:
-            f.write(value)
+         with self.driver.transaction():
+            if self.persistent:
+               self._writePersistent(value)
+               return True
+            with open(self.entryPath, 'w') as f:
+               f.write(value)
       except Exception: # pylint: disable=broad-except
          return False
       return True
 
-   def read(self):
+   def _readRaw(self):
       raw = self._read()
-      raw = raw.rstrip() if raw else raw
+      return raw.rstrip() if raw else raw
+
+   def read(self):
+      snapshot = self._activeSnapshot()
+      raw = snapshot.read(self.entryPath) if snapshot is not None else None
+      if raw is None:
+         raw = self.cache.get(self._readRaw, key=self.entryPath)
       value = self._readConversion(raw)
       logging.io('%s.read(): %s -> %s', self, raw, value)
       return value
 
+   def _writeRaw(self, raw):
+      snapshot = self._activeSnapshot()
+      if snapshot is not None:
+         snapshot.invalidate(self.entryPath)
+      self.cache.invalidate(key=self.entryPath)
+      return self._write(raw)
+
    def write(self, value):
       raw = self._writeConversion(value)
       logging.io('%s.write(%s) -> %s', self, value, raw)
-      return self._write(raw)
+      if self.shadow is not None:
+         return self.shadow.write(raw, self._writeRaw)
+      return self._writeRaw(raw)
 
 class SysfsEntryInt(SysfsEntry):
    def _readConversion(self, value):
@@ -146,11 +306,12 @@ class SysfsEntryIntLed(SysfsEntryInt):
       def getLedPath(n):
          ledsPath = os.path.join(parent.driver.getSysfsPath(), 'leds')
          return os.path.join(ledsPath, n, 'brightness')
+      kwargs.setdefault('policy', 'led')
       super(SysfsEntryIntLed, self).__init__(parent, name, pathCallback=getLedPath,
                                              **kwargs)
 
 class SysfsEntryCustomLed(SysfsEntryIntLed):
-   def __init__(self, parent, name, value2color=None):
+   def __init__(self, parent, name, value2color=None, **kwargs):
       self.value2color = value2color or {
          0 : LedColor.OFF,
          1 : LedColor.GREEN,
@@ -159,7 +320,7 @@ class SysfsEntryCustomLed(SysfsEntryIntLed):
          4 : LedColor.BLUE,
       }
       self.color2value = { v : k for k, v in self.value2color.items() }
-      super(SysfsEntryCustomLed, self).__init__(parent, name)
+      super(SysfsEntryCustomLed, self).__init__(parent, name, **kwargs)
 
    def _readConversion(self, value):
       return self.value2color[int(value)]
@@ -172,6 +333,7 @@ class SysfsEntryLedMaxBrightness(SysfsEntryInt):
       def getPath(n):
          ledsPath = os.path.join(parent.driver.getSysfsPath(), 'leds')
          return os.path.join(ledsPath, n, 'max_brightness')
+      kwargs.setdefault('policy', 'led')
       super().__init__(parent, name, pathCallback=getPath, **kwargs)
 
 class SysfsEntryLedMultiIndex(SysfsEntry):
@@ -179,6 +341,7 @@ class SysfsEntryLedMultiIndex(SysfsEntry):
       def getPath(n):
          ledsPath = os.path.join(parent.driver.getSysfsPath(), 'leds')
          return os.path.join(ledsPath, n, 'multi_index')
+      kwargs.setdefault('policy', 'led')
       super().__init__(parent, name, pathCallback=getPath, **kwargs)
 
    def _readConversion(self, value: str) -> list[str]:
@@ -192,6 +355,7 @@ class SysfsEntryLedMultiIntensity(SysfsEntry):
       def getPath(n):
          ledsPath = os.path.join(parent.driver.getSysfsPath(), 'leds')
          return os.path.join(ledsPath, n, 'multi_intensity')
+      kwargs.setdefault('policy', 'led')
       super().__init__(parent, name, pathCallback=getPath, **kwargs)
 
    def _readConversion(self, value: str) -> list[int]:
@@ -229,6 +393,7 @@ class GenericSysfsImpl(GenericSysfs):
 
    SCALE_FACTOR = 0.001
    RATED = False
+   CACHE_POLICY = 'sysfs'
 
    def __init__(self, driver, desc, prefix=None, **kwargs):
       self.prefix = prefix or '%s%s' % (self.SYSFS_PREFIX, desc.__getoid__())
@@ -237,12 +402,14 @@ class GenericSysfsImpl(GenericSysfs):
       s = self.SCALE_FACTOR * desc.scale
       r = 'rated_' if self.RATED else ''
       p = self.prefix
-      self.label = SysfsEntry(self, 'label', prefix=p)
-      self.input = SysfsEntryFloat(self, 'input', prefix=p, scale=s)
-      self.max = SysfsEntryFloat(self, '%smax' % r, prefix=p, scale=s)
-      self.min = SysfsEntryFloat(self, '%smin' % r, prefix=p, scale=s)
-      self.crit = SysfsEntryFloat(self, 'crit', prefix=p, scale=s)
-      self.lcrit = SysfsEntryFloat(self, 'lcrit', prefix=p, scale=s)
+      t = 'threshold'
+      self.label = SysfsEntry(self, 'label', prefix=p, policy='info')
+      self.input = SysfsEntryFloat(self, 'input', prefix=p, scale=s,
+                                   policy=self.CACHE_POLICY)
+      self.max = SysfsEntryFloat(self, '%smax' % r, prefix=p, scale=s, policy=t)
+      self.min = SysfsEntryFloat(self, '%smin' % r, prefix=p, scale=s, policy=t)
+      self.crit = SysfsEntryFloat(self, 'crit', prefix=p, scale=s, policy=t)
+      self.lcrit = SysfsEntryFloat(self, 'lcrit', prefix=p, scale=s, policy=t)
       self.__dict__.update(**kwargs)
 
    def _getOr(self, entry, *defaults):
@@ -298,12 +465,15 @@ class FanSysfsImpl(Fan, GenericSysfs):
       self.led = led
       self.lastSpeed = None
       self.pwm = SysfsEntryIntLinear(self, 'pwm%d' % self.fanId,
-                                     fromRange=(0, maxPwm), toRange=(0, 100))
-      self.input = SysfsEntryInt(self, 'fan%d_input' % self.fanId)
-      self.airflow = SysfsEntry(self, 'fan%d_airflow' % self.fanId)
-      self.fault = SysfsEntryBool(self, 'fan%d_fault' % self.fanId)
-      self.present = SysfsEntryBool(self, 'fan%d_present' % self.fanId)
-      self.model = SysfsEntry(self, 'fan%d_model' % self.fanId)
+                                     fromRange=(0, maxPwm), toRange=(0, 100),
+                                     policy='fan_pwm', shadow='fan_pwm')
+      self.input = SysfsEntryInt(self, 'fan%d_input' % self.fanId,
+                                 policy='fan_rpm')
+      self.airflow = SysfsEntry(self, 'fan%d_airflow' % self.fanId, policy='info')
+      self.fault = SysfsEntryBool(self, 'fan%d_fault' % self.fanId, policy='fault')
+      self.present = SysfsEntryBool(self, 'fan%d_present' % self.fanId,
+                                    policy='presence')
+      self.model = SysfsEntry(self, 'fan%d_model' % self.fanId, policy='info')
       self.faultGpio = faultGpio
       self.__dict__.update(kwargs)
 
@@ -379,7 +549,7 @@ class LedLegacySysfsImpl(Led):
    def __init__(self, driver, desc, **kwargs):
       self.driver = driver
       self.desc = desc
-      self.brightness = SysfsEntryCustomLed(self, desc.name)
+      self.brightness = SysfsEntryCustomLed(self, desc.name, shadow='led')
       self.__dict__.update(kwargs)
 
    def getName(self):
@@ -434,10 +604,11 @@ class LedMultiColorSysfsImpl(Led):
    def __init__(self, driver, desc, **kwargs):
       self.driver = driver
       self.desc = desc
-      self.brightness = SysfsEntryIntLed(self, desc.name)
+      self.brightness = SysfsEntryIntLed(self, desc.name, shadow='led')
       self.maxBrightness = SysfsEntryLedMaxBrightness(self, desc.name)
       self.multiIndex = SysfsEntryLedMultiIndex(self, desc.name)
-      self.multiIntensity = SysfsEntryLedMultiIntensity(self, desc.name)
+      self.multiIntensity = SysfsEntryLedMultiIntensity(self, desc.name,
+                                                        shadow='led')
       self.index_ = None
       self.__dict__.update(kwargs)
 
@@ -567,14 +738,17 @@ class TempSysfsImpl(Temp, GenericSysfs):
       self.desc = desc
       self.reportHwThresh = Config().report_hw_thresholds
       self.__dict__.update(**kwargs)
-      self.label = SysfsEntry(self, 'temp%d_label' % self.tempId)
+      t = 'threshold'
+      self.label = SysfsEntry(self, 'temp%d_label' % self.tempId, policy='info')
       self.input = SysfsEntryFloat(self, 'temp%d_input' % self.tempId,
-                                   scale=self.SCALE_FACTOR * desc.scale)
-      self.max = SysfsEntryFloat(self, 'temp%d_max' % self.tempId)
-      self.crit = SysfsEntryFloat(self, 'temp%d_crit' % self.tempId)
-      self.min = SysfsEntryFloat(self, 'temp%d_min' % self.tempId)
-      self.lcrit = SysfsEntryFloat(self, 'temp%d_lcrit' % self.tempId)
-      self.fault = SysfsEntryBool(self, 'temp%d_fault' % self.tempId)
+                                   scale=self.SCALE_FACTOR * desc.scale,
+                                   policy='temp')
+      self.max = SysfsEntryFloat(self, 'temp%d_max' % self.tempId, policy=t)
+      self.crit = SysfsEntryFloat(self, 'temp%d_crit' % self.tempId, policy=t)
+      self.min = SysfsEntryFloat(self, 'temp%d_min' % self.tempId, policy=t)
+      self.lcrit = SysfsEntryFloat(self, 'temp%d_lcrit' % self.tempId, policy=t)
+      self.fault = SysfsEntryBool(self, 'temp%d_fault' % self.tempId,
+                                  policy='fault')
 
    def __str__(self):
       return f'{self.__class__.__name__}({self.getName()})'
@@ -669,7 +843,8 @@ class ResetSysfsImpl(Reset):
       self.name = desc.name
       def getResetPath(name):
          return os.path.join(driver.getSysfsPath(), name)
-      self.reset = SysfsEntryBool(self, desc.name, pathCallback=getResetPath)
+      self.reset = SysfsEntryBool(self, desc.name, pathCallback=getResetPath,
+                                  policy='gpio')
       self.__dict__.update(**kwargs)
 
    def getName(self):
@@ -696,7 +871,10 @@ class GpioSysfsImpl(Gpio):
       self.hwActiveLow = hwActiveLow
       def getGpioPath(name):
          return os.path.join(self.driver.getSysfsPath(), name)
-      self.gpio = SysfsEntryBool(self, self.name, pathCallback=getGpioPath)
+      # writable gpios (resets, power enables) are driven by several daemons
+      # so their writes are never shadowed
+      self.gpio = SysfsEntryBool(self, self.name, pathCallback=getGpioPath,
+                                 policy='presence' if self.ro else 'gpio')
       self.__dict__.update(**kwargs)
 
    def getName(self):
@@ -735,6 +913,9 @@ class GpioSysfsImpl(Gpio):
       self.setRawValue(not value if self.isActiveLow() else value)
 
 class LabelSysfsImpl(GenericSysfsImpl):
+
+   CACHE_POLICY = 'rail'
+
    def getExpectedLabel(self):
       if self.desc.direction == RailDirection.INPUT:
          return '%s%s' % (self.LABEL_PREFIX, 'in')
@@ -791,10 +972,12 @@ class RailSysfsRawImpl(Rail):
       self.driver = driver
       self.desc = desc
       self.__dict__.update(**kwargs)
-      self.voltage = SysfsEntryFloat(self, 'in%d_input' % self.railId)
-      self.current = SysfsEntryFloat(self, 'curr%d_input' % self.railId)
+      self.voltage = SysfsEntryFloat(self, 'in%d_input' % self.railId,
+                                     policy='rail')
+      self.current = SysfsEntryFloat(self, 'curr%d_input' % self.railId,
+                                     policy='rail')
       self.power = SysfsEntryFloat(self, 'power%d_input' % self.railId,
-                                   scale=0.000001)
+                                   scale=0.000001, policy='rail')
 
    def _tryComputeDiv(self, dividend, divisor):
       if not dividend.exists() or not divisor.exists():
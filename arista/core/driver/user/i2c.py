@@ -1,23 +1,94 @@
 
-from contextlib import closing
+import errno
+import functools
+
+from contextlib import contextmanager
 
 from .gpio import GpioFuncImpl
 
 from ... import utils
+from ...arbiter import (
+   I2cPriority,
+   currentI2cPriority,
+   getI2cBusArbiter,
+   i2cArbitrationEnabled,
+   i2cTransaction,
+)
+from ...breaker import DeviceUnavailableError, getCircuitBreaker
+from ...metrics import getI2cStats
+from ...log import getLogger
 from ...log_helper import logIoRead, logIoWrite
 from ...i2c_utils import I2cMsg
-from ...utils import SMBus
+
+from ....libs.python import monotonicRaw
 
 from . import UserDriver
 
+logging = getLogger(__name__)
+
+def transferSize(op, args, res):
+   if isinstance(res, (list, bytes, str)):
+      return len(res)
+   if args and isinstance(args[-1], (list, bytes)):
+      return len(args[-1])
+   return 2 if 'word' in op else 1
+
+def i2cTransfer(func):
+   '''Arbitrate the bus, track device failures and time an I2C access
+
+   Nested accesses, including the I2cMsg transfers, are accounted for by the
+   outermost one only. Accesses made within presenceProbe() are accounted to a
+   breaker of their own so that probing an absent device does not short circuit
+   its regular accesses, while a stalled one still gets probed less often.
+   '''
+   op = func.__name__
+   @functools.wraps(func)
+   def wrapped(self, *args, **kwargs):
+      with self.transaction():
+         if self.transferDepth_:
+            return func(self, *args, **kwargs)
+         breaker = self.probeBreaker if self.probing_ else self.breaker
+         if not breaker.enabled:
+            breaker = None
+         elif not breaker.allow():
+            raise DeviceUnavailableError(breaker)
+         stats = getI2cStats()
+         start = monotonicRaw() if stats.enabled or breaker else None
+         self.transferDepth_ += 1
+         stats.begin()
+         try:
+            res = func(self, *args, **kwargs)
+         except Exception as e:
+            # every outcome is recorded, a half-open breaker waits for it
+            self.accountTransfer(op, start, args, None, e, breaker=breaker)
+            raise
+         finally:
+            stats.end()
+            self.transferDepth_ -= 1
+         self.accountTransfer(op, start, args, res, breaker=breaker)
+         return res
+   return wrapped
+
 class I2cDevDriver(UserDriver):
 
+   I2C_PRIORITY = I2cPriority.DEFAULT
    REGISTER_CLS = None
+   REGISTER_STRIDE = 1
+   # devices must auto-increment the register address on block reads to
+   # serve register snapshots, which not all of them do (e.g. SB-TSI)
+   SUPPORTS_BLOCK_READ = False
+   I2C_BLOCK_MAX = 32
 
    def __init__(self, name=None, addr=None, registerCls=None, **kwargs):
       super(I2cDevDriver, self).__init__(**kwargs)
       self.bus_ = None
+      self.busId_ = None
       self.msg_ = None
+      self.rdwrSupported = True
+      self.transferDepth_ = 0
+      self.probing_ = False
+      self.breaker_ = None
+      self.probeBreaker_ = None
       self.name = name
       self.addr = addr
       registerCls = registerCls or self.REGISTER_CLS
@@ -34,13 +105,29 @@ class I2cDevDriver(UserDriver):
    @property
    def bus(self):
       if self.bus_ is None:
-         self.bus_ = utils.SMBus(self.addr.bus)
+         self.busId_ = self.addr.bus
+         self.bus_ = utils.getSMBusPool().acquire(self.busId_)
       return self.bus_
 
+   @property
+   def breaker(self):
+      if self.breaker_ is None:
+         self.breaker_ = getCircuitBreaker((self.addr.bus, self.addr.address),
+                                           name=str(self.addr))
+      return self.breaker_
+
+   @property
+   def probeBreaker(self):
+      if self.probeBreaker_ is None:
+         self.probeBreaker_ = getCircuitBreaker(
+            (self.addr.bus, self.addr.address, 'probe'),
+            name='%s probe' % self.addr)
+      return self.probeBreaker_
+
    @property
    def msg(self):
       if self.msg_ is None:
-         self.msg_ = I2cMsg(self.addr)
+         self.msg_ = I2cMsg(self.addr, pooled=self.bus)
          self.msg_.open()
       return self.msg_
 
@@ -51,49 +138,86 @@ class I2cDevDriver(UserDriver):
       self.close()
 
    def close(self):
-      if self.bus_ is not None:
-         self.bus_.close()
-         self.bus_ = None
       if self.msg_ is not None:
          self.msg_.close()
          self.msg_ = None
+      if self.bus_ is not None:
+         if self.busId_ is not None:
+            utils.getSMBusPool().release(self.busId_)
+         self.bus_ = None
+         self.busId_ = None
+
+   def accountTransfer(self, op, start, args, res, error=None, breaker=None):
+      elapsed = monotonicRaw() - start if start is not None else None
+      if breaker is not None:
+         breaker.record(error, elapsed)
+      stats = getI2cStats()
+      if elapsed is not None and stats.enabled:
+         stats.record(self.addr.bus, self.addr.address, op,
+                      transferSize(op, args, res), elapsed, error is not None)
+
+   def transaction(self):
+      '''Own the bus across several accesses when arbitration is enabled'''
+      return i2cTransaction(self.addr.bus, currentI2cPriority(self.I2C_PRIORITY))
+
+   def clean(self):
+      self.close()
+      super().clean()
+
+   @contextmanager
+   def presenceProbe(self):
+      '''Access the device through its presence probe circuit breaker'''
+      previous = self.probing_
+      self.probing_ = True
+      try:
+         yield
+      finally:
+         self.probing_ = previous
 
    def smbusPing(self):
       try:
-         with closing(SMBus(self.addr.bus)) as bus:
-            bus.read_byte(self.addr.address)
+         with self.presenceProbe():
+            self.recv_byte()
       except IOError:
          return False
       return True
 
+   @i2cTransfer
    @logIoWrite
    def send_byte(self, data):
       return self.bus.write_byte(self.addr.address, data)
 
+   @i2cTransfer
    @logIoRead
    def recv_byte(self):
       return self.bus.read_byte(self.addr.address)
 
+   @i2cTransfer
    @logIoRead
    def read_byte_data(self, reg):
       return self.bus.read_byte_data(self.addr.address, reg)
 
+   @i2cTransfer
    @logIoWrite
    def write_byte_data(self, reg, data):
       return self.bus.write_byte_data(self.addr.address, reg, data)
 
+   @i2cTransfer
    @logIoRead
    def read_word_data(self, reg):
       return self.bus.read_word_data(self.addr.address, reg)
 
+   @i2cTransfer
    @logIoWrite
    def write_word_data(self, reg, data):
       return self.bus.write_word_data(self.addr.address, reg, data)
 
+   @i2cTransfer
    @logIoWrite
    def write_block_data(self, reg, data):
       return self.bus.write_block_data(self.addr.address, reg, data)
 
+   @i2cTransfer
    @logIoRead
    def read_block_data(self, reg):
       if self.addr.supportSmbusBlock:
@@ -101,6 +225,7 @@ class I2cDevDriver(UserDriver):
       data = self.read_i2c_block_data(reg)
       return data[1:data[0] + 1]
 
+   @i2cTransfer
    @logIoRead
    def read_i2c_block_data(self, reg, length=32):
       return self.bus.read_i2c_block_data(self.addr.address, reg, length)
@@ -117,12 +242,67 @@ class I2cDevDriver(UserDriver):
    def read_bytes_str(self, cmd, datalen):
       return self._bytesToStr(self.read_bytes(cmd, datalen)[1:])
 
+   @i2cTransfer
    def read_bytes(self, cmd, datalen):
       return self.msg.read_bytes(self.addr.address, cmd, datalen)
 
+   @i2cTransfer
    def write_bytes(self, cmd):
       return self.msg.write_bytes(self.addr.address, cmd)
 
+   def _readManyFallback(self, requests):
+      result = []
+      for reg, length in requests:
+         data = []
+         while len(data) < length:
+            size = min(length - len(data), self.I2C_BLOCK_MAX)
+            data += self.read_i2c_block_data(reg + len(data), size)
+         result.append(data)
+      return result
+
+   @i2cTransfer
+   @logIoRead
+   def readMany(self, requests):
+      '''Read several (reg, length) ranges in as few transfers as possible
+
+      All the register reads are batched as write/read message pairs in a
+      single I2C_RDWR transfer. Adapters that cannot do multi-message transfers
+      are remembered and served with individual SMBus block reads instead.
+      '''
+      requests = list(requests)
+      if self.rdwrSupported and not utils.inSimulation():
+         try:
+            return self.msg.read_many(self.addr.address,
+                                      [([reg], length)
+                                       for reg, length in requests])
+         except IOError as e:
+            if e.errno not in (errno.EOPNOTSUPP, errno.EINVAL):
+               raise
+            logging.debug('%s: adapter rejected multi-message transfer, '
+                          'falling back to individual reads', self)
+            self.rdwrSupported = False
+      return self._readManyFallback(requests)
+
+   @i2cTransfer
+   @logIoRead
+   def readBytesMany(self, requests):
+      '''Issue several (cmd, datalen) reads in as few transfers as possible
+
+      Like readMany but for commands longer than a register address, such as
+      PMBus block process calls, which fall back on one transfer each.
+      '''
+      requests = list(requests)
+      if self.rdwrSupported and not utils.inSimulation():
+         try:
+            return self.msg.read_many(self.addr.address, requests)
+         except IOError as e:
+            if e.errno not in (errno.EOPNOTSUPP, errno.EINVAL):
+               raise
+            logging.debug('%s: adapter rejected multi-message transfer, '
+                          'falling back to individual reads', self)
+            self.rdwrSupported = False
+      return [self.read_bytes(cmd, datalen) for cmd, datalen in requests]
+
    def read(self, reg):
       res = self.read_byte_data(reg)
       if res is None:
@@ -132,6 +312,14 @@ class I2cDevDriver(UserDriver):
    def write(self, reg, data):
       return self.write_byte_data(reg, data)
 
+   def readRange(self, reg, count):
+      return self._readManyFallback([(reg, count)])[0]
+
+   def snapshot(self):
+      if self.regs is None:
+         return super().snapshot()
+      return self.regs.snapshot()
+
    def getGpio(self, attr, name=None):
       assert self.regs
       func = getattr(self.regs, attr)
@@ -146,4 +334,10 @@ class I2cDevDriver(UserDriver):
          "addr": str(self.addr),
          "name": self.name,
          "regs": self.regs.__diag__(ctx) if self.regs else None,
+         "breaker": self.breaker.__diag__(ctx),
+         "probeBreaker": self.probeBreaker.__diag__(ctx),
+         "stats": getI2cStats().__diag__(ctx, bus=self.addr.bus,
+                                         addr=self.addr.address),
+         "arbiter": getI2cBusArbiter(self.addr.bus).__diag__(ctx)
+                    if i2cArbitrationEnabled() else None,
       }
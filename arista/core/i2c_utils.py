@@ -9,6 +9,9 @@ from ctypes import \
    pointer
 from fcntl import ioctl
 from .log import getLogger
+from .metrics import getI2cStats
+
+from ..libs.python import monotonicRaw
 
 logging = getLogger(__name__)
 
@@ -16,6 +19,7 @@ I2C_M_RD = 0x0001
 I2C_M_RECV_LEN = 0x0400
 
 I2C_RDWR = 0x0707
+I2C_RDWR_IOCTL_MAX_MSGS = 42
 
 I2C_SMBUS_BLOCK_MAX = 32
 
@@ -66,6 +70,19 @@ class i2c_rdwr_ioctl_data(Structure):
       )
       return cls(msg_data, 2)
 
+   @classmethod
+   def read_many(cls, addr, bufs):
+      msgs = []
+      for wrbuf, rdbuf in bufs:
+         msgs.append(i2c_msg(addr, 0,
+                             sizeof(wrbuf.contents),
+                             cast(wrbuf, POINTER(c_uint8))))
+         msgs.append(i2c_msg(addr, I2C_M_RD,
+                             sizeof(rdbuf.contents),
+                             cast(rdbuf, POINTER(c_uint8))))
+      msg_data = (i2c_msg * len(msgs))(*msgs)
+      return cls(msg_data, len(msgs))
+
    @classmethod
    def read_block(cls, addr, wrbuf, rdbuf):
       msg_data = (i2c_msg * 2)(
@@ -87,8 +104,9 @@ class i2c_rdwr_ioctl_data(Structure):
       return str(self)
 
 class I2cMsg(object):
-   def __init__(self, addr):
+   def __init__(self, addr, pooled=None):
       self.addr = addr
+      self.pooled = pooled
       self.device = None
 
    def __str__(self):
@@ -99,11 +117,16 @@ class I2cMsg(object):
 
    def open(self):
       if self.device is None:
-         self.device = open("/dev/i2c-%d" % self.addr.bus, 'r+b', buffering=0)
+         if self.pooled is not None:
+            self.device = self.pooled.rdwrDevice()
+         else:
+            self.device = open("/dev/i2c-%d" % self.addr.bus, 'r+b', buffering=0)
 
    def close(self):
       if self.device:
-         self.device.close()
+         # a pooled device file is closed along with its SMBus handle
+         if self.pooled is None:
+            self.device.close()
          self.device = None
 
    def __enter__(self):
@@ -113,8 +136,20 @@ class I2cMsg(object):
    def __exit__(self, *args):
       self.close()
 
+   def _record(self, data, start, error):
+      msgs = [data.msgs[i] for i in range(data.nmsgs)]
+      op = 'i2c_rdwr_read' if any(m.flags & I2C_M_RD for m in msgs) \
+           else 'i2c_rdwr_write'
+      getI2cStats().record(self.addr.bus, msgs[0].addr if msgs else 0, op,
+                           sum(m.len for m in msgs), monotonicRaw() - start,
+                           error)
+
    def i2c_rdwr(self, data):
       logging.io('%s.i2c_rdwr(%s) ..', self, data) # user msgs
+      stats = getI2cStats()
+      start = None
+      if stats.enabled and not stats.inTransfer():
+         start = monotonicRaw()
       try:
          ret = ioctl(self.device.fileno(), I2C_RDWR, data)
       except IOError as e:
@@ -126,6 +161,8 @@ class I2cMsg(object):
       finally:
          logging.io('%s.i2c_rdwr(%s): ret=%s',
                        self, data, ret) # kernel msgs
+         if start is not None:
+            self._record(data, start, ret is None or ret < 0)
 
    def write_bytes(self, addr, cmd):
       wrbuf = (c_uint8 * len(cmd))(*cmd)
@@ -142,6 +179,22 @@ class I2cMsg(object):
       self.i2c_rdwr(ioctl_data)
       return [c for c in rdbuf]
 
+   def read_many(self, addr, requests):
+      '''Issue write/read message pairs for each (cmd, datalen) in requests
+
+      Pairs are packed in as few I2C_RDWR transfers as the kernel allows.
+      '''
+      result = []
+      step = I2C_RDWR_IOCTL_MAX_MSGS // 2
+      for i in range(0, len(requests), step):
+         bufs = [((c_uint8 * len(cmd))(*cmd), (c_uint8 * datalen)())
+                 for cmd, datalen in requests[i:i + step]]
+         ioctl_data = i2c_rdwr_ioctl_data.read_many(
+            addr, [(pointer(wrbuf), pointer(rdbuf)) for wrbuf, rdbuf in bufs])
+         self.i2c_rdwr(ioctl_data)
+         result.extend([c for c in rdbuf] for _, rdbuf in bufs)
+      return result
+
    def read_block(self, addr, cmd):
       wrbuf = (c_uint8 * len(cmd))(*cmd)
       rdbuf = (c_uint8 * (1 + I2C_SMBUS_BLOCK_MAX))( 1 )
@@ -0,0 +1,150 @@
+import threading
+
+from collections import defaultdict
+
+from .config import Config
+
+class LatencyHistogram(object):
+   '''Log-linear histogram of latencies in microseconds, HDR style
+
+   Values below 2 << SUB_BITS are exact, larger ones fall in buckets keeping
+   SUB_BITS significant bits, which bounds the error to 1 / (1 << SUB_BITS).
+   '''
+
+   SUB_BITS = 3
+   SUB_COUNT = 1 << SUB_BITS
+
+   def __init__(self):
+      self.buckets = defaultdict(int)
+      self.count = 0
+      self.total = 0
+      self.min = None
+      self.max = None
+
+   @classmethod
+   def bucketIndex(cls, value):
+      shift = max(0, value.bit_length() - cls.SUB_BITS - 1)
+      return shift * cls.SUB_COUNT + (value >> shift)
+
+   @classmethod
+   def bucketValue(cls, index):
+      shift = max(0, index // cls.SUB_COUNT - 1)
+      return (index - shift * cls.SUB_COUNT) << shift
+
+   def record(self, value):
+      value = int(value)
+      self.buckets[self.bucketIndex(value)] += 1
+      self.count += 1
+      self.total += value
+      self.min = value if self.min is None else min(self.min, value)
+      self.max = value if self.max is None else max(self.max, value)
+
+   def percentile(self, percent):
+      if not self.count:
+         return None
+      target = percent / 100. * self.count
+      seen = 0
+      for index in sorted(self.buckets):
+         seen += self.buckets[index]
+         if seen >= target:
+            return min(self.bucketValue(index), self.max)
+      return self.max
+
+   def __diag__(self, ctx): # pylint: disable=unused-argument
+      return {
+         'count': self.count,
+         'min': self.min,
+         'max': self.max,
+         'avg': self.total / self.count if self.count else None,
+         'p50': self.percentile(50),
+         'p90': self.percentile(90),
+         'p99': self.percentile(99),
+         'buckets': {
+            self.bucketValue(index): count
+            for index, count in sorted(self.buckets.items())
+         },
+      }
+
+class I2cOpStats(object):
+   def __init__(self):
+      self.count = 0
+      self.bytes = 0
+      self.errors = 0
+      self.latency = LatencyHistogram()
+
+   def record(self, size, latency, error=False):
+      self.count += 1
+      self.bytes += size
+      if error:
+         self.errors += 1
+      self.latency.record(latency * 1000000)
+
+   def __diag__(self, ctx):
+      return {
+         'count': self.count,
+         'bytes': self.bytes,
+         'errors': self.errors,
+         'latency': self.latency.__diag__(ctx),
+      }
+
+class I2cStats(object):
+   '''Count the I2C transfers of the process per (bus, address, operation)
+
+   Drivers wrap their accesses in begin/end so that the lower level transfers
+   they issue are not accounted for twice.
+   '''
+   def __init__(self):
+      self.lock_ = threading.Lock()
+      self.local_ = threading.local()
+      self.ops = {}
+
+   @property
+   def enabled(self):
+      return Config().i2c_stats
+
+   def begin(self):
+      self.local_.depth = getattr(self.local_, 'depth', 0) + 1
+
+   def end(self):
+      self.local_.depth -= 1
+
+   def inTransfer(self):
+      return getattr(self.local_, 'depth', 0) > 0
+
+   def record(self, bus, addr, op, size, latency, error=False):
+      key = (bus, addr, op)
+      with self.lock_:
+         stats = self.ops.get(key)
+         if stats is None:
+            stats = I2cOpStats()
+            self.ops[key] = stats
+         stats.record(size, latency, error)
+
+   def get(self, bus=None, addr=None):
+      with self.lock_:
+         return {
+            key: stats for key, stats in self.ops.items()
+            if (bus is None or key[0] == bus) and
+               (addr is None or key[1] == addr)
+         }
+
+   def slowest(self, count=5, percent=99):
+      ops = self.get()
+      return sorted(ops.items(),
+                    key=lambda item: item[1].latency.percentile(percent),
+                    reverse=True)[:count]
+
+   def clear(self):
+      with self.lock_:
+         self.ops = {}
+
+   def __diag__(self, ctx, bus=None, addr=None):
+      data = {}
+      for (opBus, opAddr, op), stats in sorted(self.get(bus, addr).items()):
+         device = data.setdefault(str(opBus), {}).setdefault('%#04x' % opAddr, {})
+         device[op] = stats.__diag__(ctx)
+      return data
+
+_i2cStats = I2cStats()
+def getI2cStats():
+   return _i2cStats
@@ -1,11 +1,13 @@
 
 import copy
+import importlib
 
 from .component import Priority
 from .component.slot import SlotComponent
 from .component.unmanaged import UnmanagedComponent
 from .dynload import importSubmodules
 from .log import getLogger
+from .telemetry import getTelemetryRails
 from .utils import JsonStoredData, inSimulation
 
 from ..drivers.pmbus import PsuPmbusDetect
@@ -51,7 +53,7 @@ class PsuImpl(PsuInv):
       return self.psu.getInventory().getTemps()
 
    def getRails(self):
-      return self.psu.getInventory().getRails()
+      return getTelemetryRails(self.getName(), self.psu.getInventory().getRails())
 
 class PsuSlotImpl(PsuSlotInv):
    def __init__(self, slot):
@@ -128,17 +130,37 @@ class PsuModel:
       return False
 
 class PsuManager:
-   def __init__(self):
-      self.psus_ = []
+   '''Registry of the PSU models
+
+   Models are found through a generated index mapping their class name to the
+   module defining them and their PMBus identifiers to their class name. Only
+   the modules of the PSUs actually seen get imported. The index is generated
+   by scripts/psu-index and must be updated when models are added.
+   '''
+   def __init__(self, index=None):
+      self.classes = {}
       self.modules = None
       self.package = 'arista.components.psu'
+      self.index_ = index
+
+   @property
+   def index(self):
+      if self.index_ is None:
+         try:
+            self.index_ = importlib.import_module(self.package + '.index').PSU_INDEX
+         except ImportError as e:
+            logging.debug('psu model index unavailable: %s', e)
+            self.index_ = { 'models': {}, 'identifiers': {}, 'pmbus': {} }
+      return self.index_
+
+   def addPsuModel(self, model):
+      self.classes[model.__name__] = model
 
    def _loadModule(self, module):
       for value in module.__dict__.values():
          if isinstance(value, type) and issubclass(value, PsuModel) and \
             value != PsuModel:
-            self.psus_.append(value)
-      self.psus_ = list(sorted(self.psus_, key=lambda p: not p.SUPPORT_SMBUS_PING))
+            self.classes.setdefault(value.__name__, value)
 
    def loadPsuModels(self):
       if self.modules is not None:
@@ -151,15 +173,65 @@ class PsuManager:
 
    @property
    def psuModels(self):
-      if not self.psus_:
+      self.loadPsuModels()
+      return list(sorted(self.classes.values(),
+                         key=lambda p: not p.SUPPORT_SMBUS_PING))
+
+   def psuModel(self, clsname):
+      model = self.classes.get(clsname)
+      if model is not None:
+         return model
+
+      module = self.index['models'].get(clsname)
+      if module is not None:
+         self._loadModule(importlib.import_module(
+            '%s.%s' % (self.package, module)))
+         model = self.classes.get(clsname)
+      if model is None and self.modules is None:
+         logging.debug('psu model %s is not indexed, loading all models',
+                       clsname)
          self.loadPsuModels()
-      return self.psus_
+         model = self.classes.get(clsname)
+      return model
 
    def psuForIdentifier(self, clsname, identifier):
-      for model in self.psuModels:
-         if model.__name__ == clsname:
-            return model(identifier)
-      return None
+      model = self.psuModel(clsname)
+      if model is None:
+         return None
+      return model(identifier)
+
+   def lookupPmbusPsu(self, manufacturer, partName):
+      key = (manufacturer.lower().rstrip(), partName.rstrip())
+      clsname = self.index['identifiers'].get(key)
+      if clsname is None:
+         return None
+      return self.psuModel(clsname)
+
+   def generateIndex(self):
+      self.loadPsuModels()
+      index = { 'models': {}, 'identifiers': {}, 'pmbus': {} }
+      prefix = self.package + '.'
+      for name, model in sorted(self.classes.items()):
+         if not model.__module__.startswith(prefix) or \
+            getattr(self.modules.get(model.__module__), name, None) is not model:
+            continue
+         index['models'][name] = model.__module__[len(prefix):]
+
+         if not model.PMBUS_ADDR or not model.AUTODETECT_PMBUS:
+            continue
+         addr = model.PMBUS_ADDR
+         index['pmbus'][addr] = index['pmbus'].get(addr, True) and \
+                                model.SUPPORT_SMBUS_PING
+         for manufacturer in [model.MANUFACTURER] + model.MANUFACTURER_ALIASES:
+            for ident in model.IDENTIFIERS:
+               key = (manufacturer.lower(), ident.partName.rstrip())
+               other = index['identifiers'].setdefault(key, name)
+               assert other == name, \
+                  'psu identifier %s used by %s and %s' % (key, other, name)
+
+      index['identifiers'] = dict(sorted(index['identifiers'].items()))
+      index['pmbus'] = dict(sorted(index['pmbus'].items()))
+      return index
 
    def identifyPsuModel(self, model, detector):
       if not model.isManufacturer(detector.id().lower()):
@@ -174,39 +246,45 @@ class PsuManager:
       return None
 
    def autodetectPmbusPsu(self, slot, tryAll=True):
-      psus = []
-      detectors = {}
-      # try expected PSU models first
-      models = slot.psus
+      # try the addresses of the expected PSU models first
+      addrs = {}
+      for model in slot.psus:
+         if model.PMBUS_ADDR and model.AUTODETECT_PMBUS:
+            addrs[model.PMBUS_ADDR] = addrs.get(model.PMBUS_ADDR, True) and \
+                                      model.SUPPORT_SMBUS_PING
       if tryAll:
-         models = slot.psus + [p for p in self.psuModels if p not in slot.psus]
-      for model in models:
-         if not model.PMBUS_ADDR or not model.AUTODETECT_PMBUS:
-            continue
+         for addr, ping in self.index['pmbus'].items():
+            addrs[addr] = addrs.get(addr, True) and ping
 
+      psus = []
+      for addr, ping in addrs.items():
          try:
-            # cache pmbus detector to minimize IO operations
-            detector = detectors.get(model.PMBUS_ADDR)
-            detectorCached = True
-            if detector is None:
-               detector = PsuPmbusDetect(slot.addrFunc(model.PMBUS_ADDR))
-               detectorCached = False
-               detectors[model.PMBUS_ADDR] = detector
-
-            if not detector.exists():
-               # No PMBus device found at the address expected for this model
-               if model.SUPPORT_SMBUS_PING or not detector.checkId():
+            # a single detector per address to minimize IO operations
+            detector = PsuPmbusDetect(slot.addrFunc(addr))
+            exists = detector.exists()
+            if not exists:
+               # No PMBus device found at the address expected for the models
+               if ping or not detector.checkId():
                   continue
 
-            if not detectorCached:
-               logging.debug('searching for psu vendor "%s" model "%s"',
-                             detector.id(), detector.model())
+            logging.debug('searching for psu vendor "%s" model "%s"',
+                          detector.id(), detector.model())
 
-            ident = self.identifyPsuModel(model, detector)
-            if ident is not None:
-               # TODO: add logging
-               logging.debug('found matching psu %s', model.__name__)
-               psus.append(model(ident))
+            models = [m for m in slot.psus
+                      if m.PMBUS_ADDR == addr and m.AUTODETECT_PMBUS]
+            if tryAll:
+               model = self.lookupPmbusPsu(detector.id(), detector.model())
+               if model is not None and model.PMBUS_ADDR == addr and \
+                  model not in models:
+                  models.append(model)
+
+            for model in models:
+               if not exists and model.SUPPORT_SMBUS_PING:
+                  continue
+               ident = self.identifyPsuModel(model, detector)
+               if ident is not None:
+                  logging.debug('found matching psu %s', model.__name__)
+                  psus.append(model(ident))
          except Exception as e: # pylint: disable=broad-except
             logging.error('something happened while trying to detect the psu: %s', e)
 
@@ -279,33 +357,76 @@ class PsuSlot(SlotComponent):
       cache = self.getCacheStore()
       return cache.readOrClear()
 
+   def getFingerprint(self, model):
+      metadata = model.identifier.metadata or {}
+      return {
+         'model': metadata.get('model', 'N/A'),
+         'serial': metadata.get('serial', 'N/A'),
+      }
+
    def setCache(self):
       cache = self.getCacheStore()
       cache.write({
          'cls': self.model.__class__.__name__,
          'identifier': self.model.identifier.__dict__,
+         'fingerprint': self.getFingerprint(self.model),
       }, mode='w+')
 
    def clearCache(self):
       self.getCacheStore().clear()
 
-   def loadModelFromCache(self):
+   def validateModel(self, model, fingerprint):
+      '''Check with a single PMBus read that the cached PSU is still inserted
+
+      The serial number is read when the PSU reported one, its model otherwise.
+      A fixed PSU cannot be swapped and is always valid.
+      '''
+      if not self.addrFunc:
+         return True
+
+      for key in ['serial', 'model']:
+         expected = (fingerprint or {}).get(key, 'N/A')
+         if expected != 'N/A':
+            break
+      else:
+         logging.debug("PSU %d cache has no fingerprint", self.slotId)
+         return False
+
+      detector = PsuPmbusDetect(self.addrFunc(model.PMBUS_ADDR), prepare=False)
+      try:
+         value = getattr(detector, key)()
+      except IOError as e:
+         logging.debug("PSU %d failed to read %s: %s", self.slotId, key, e)
+         return False
+
+      if value.rstrip() != expected.rstrip():
+         logging.info("PSU %d was swapped, %s %s does not match %s",
+                      self.slotId, key, value, expected)
+         return False
+      return True
+
+   def loadModelFromCache(self, validate=False):
       data = self.getCache()
       if data is None:
          return None
 
       clsname = data['cls']
       identifier = PsuIdent(**data['identifier'])
-      return getPsuManager().psuForIdentifier(clsname, identifier)
+      model = getPsuManager().psuForIdentifier(clsname, identifier)
+      if model is not None and validate and \
+         not self.validateModel(model, data.get('fingerprint')):
+         self.clearCache()
+         return None
+      return model
 
    def logPsuInformation(self):
       logging.debug("PSU %d name: %s", self.slotId, self.model.identifier.aristaName)
       for key, value in self.model.identifier.metadata.items():
          logging.debug("PSU %d %s: %s", self.slotId, key, value)
 
-   def loadPsuModel(self, useCache=True, cacheOnly=False):
+   def loadPsuModel(self, useCache=True, cacheOnly=False, validate=False):
       if useCache:
-         self.model = self.loadModelFromCache()
+         self.model = self.loadModelFromCache(validate=validate)
          if self.model is not None:
             logging.debug("PSU %d loaded from cache", self.slotId)
             return self.model
@@ -345,7 +466,7 @@ class PsuSlot(SlotComponent):
       self.components = self.components[:-1]
       return psu
 
-   def load(self, useCache=True, cacheOnly=False):
+   def load(self, useCache=True, cacheOnly=False, validate=False):
       if not useCache:
          self.clearCache()
 
@@ -354,7 +475,8 @@ class PsuSlot(SlotComponent):
          self.clearCache()
          return
 
-      if not self.loadPsuModel(useCache=useCache, cacheOnly=cacheOnly):
+      if not self.loadPsuModel(useCache=useCache, cacheOnly=cacheOnly,
+                               validate=validate):
          return
 
       desc = copy.deepcopy(self.model.DESCRIPTION)
@@ -414,7 +536,8 @@ class PsuSlot(SlotComponent):
       return self.isOutputGood()
 
    def setup(self):
-      self.load(useCache=False)
+      # the model cached by a previous run is reused unless the PSU was swapped
+      self.load(validate=True)
       if self.psu:
          # initialize the PSU, iterComponent will not run on it since the list
          # has already been computed.
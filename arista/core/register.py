@@ -1,11 +1,30 @@
 
 import copy
+from collections import OrderedDict
+from contextlib import nullcontext
 
+from .cache import ReadCache
+from .config import Config
 from .driver.user.gpio import GpioFuncImpl
 from .log import getLogger
+from . import utils
 
 logging = getLogger(__name__)
 
+def registerLock(lock=None):
+   '''Return a context serializing register updates across processes
+
+   lock can be True to use the platform lock file, a path to a lock file or
+   any context manager.
+   '''
+   if lock is None or lock is False:
+      return nullcontext()
+   if lock is True:
+      lock = Config().lock_file
+   if isinstance(lock, str):
+      return utils.FileLock(lock, auto_release=True)
+   return lock
+
 class HardwareHandle(object):
 
    def __str__(self):
@@ -58,6 +77,15 @@ class RegBitField(HardwareHandle):
          value = not value
       return self.parent.writeBit(self.bitpos, value)
 
+   def apply(self, regval, value):
+      assert not self.ro
+      self.log('update(%#x)', value)
+      if self.flip:
+         value = not value
+      if value:
+         return regval | (1 << self.bitpos)
+      return regval & ~(1 << self.bitpos)
+
    def readWrite(self, value=None):
       if value is None:
          return self.read()
@@ -104,6 +132,14 @@ class RegBitRange(HardwareHandle):
          value = ~value & mask
       return self.parent.writeBits(self.bitstart, self.bitend, value)
 
+   def apply(self, regval, value):
+      assert not self.ro
+      self.log('update(%#x)', value)
+      mask = (1 << (self.bitend - self.bitstart + 1)) - 1
+      if self.flip:
+         value = ~value
+      return (regval & ~(mask << self.bitstart)) | ((value & mask) << self.bitstart)
+
    def readWrite(self, value=None):
       if value is None:
          return self.read()
@@ -121,6 +157,9 @@ class Register(HardwareHandle):
       self.name = kwargs.get('name')
       self.ro = kwargs.get('ro')
       self.default = kwargs.get('default')
+      self.policy = kwargs.get('policy', 'register')
+      self.readCache = None
+      self.snapshot_ = None
 
    def __str__(self):
       return self.shortName()
@@ -134,15 +173,33 @@ class Register(HardwareHandle):
    def split(self):
       pass
 
+   def _read(self):
+      return self.parent.read(self.addr)
+
    def read(self):
-      value = self.parent.read(self.addr)
+      if self.snapshot_ is not None:
+         value = self.snapshot_
+      elif self.readCache is not None:
+         value = self.readCache.get(self._read)
+      else:
+         value = self._read()
       if self.name:
           self.log('read(): %#x', value)
       return value
 
+   def invalidate(self):
+      self.snapshot_ = None
+      if self.readCache is not None:
+         self.readCache.invalidate()
+
+   def canSnapshot(self):
+      # registers with a custom read method cannot decode from a snapshot
+      return type(self).read is Register.read
+
    def write(self, value):
       if self.name:
           self.log('write(%#x)', value)
+      self.invalidate()
       return self.parent.write(self.addr, value)
 
    def readWrite(self, value=None):
@@ -153,8 +210,12 @@ class Register(HardwareHandle):
    def readBit(self, bitpos):
       return (self.read() >> bitpos) & 1
 
+   def _readForUpdate(self):
+      # never modify a value coming from a snapshot or the read cache
+      return self._read()
+
    def writeBit(self, bitpos, value):
-      regval = self.read()
+      regval = self._readForUpdate()
       if value:
          regval |= (1 << bitpos)
       else:
@@ -167,17 +228,44 @@ class Register(HardwareHandle):
 
    def writeBits(self, bitstart, bitend, value):
       mask = (1 << (bitend - bitstart + 1)) - 1
-      regval = (self.read() & ~(mask << bitstart)) | (value << bitstart)
+      regval = (self._readForUpdate() & ~(mask << bitstart)) | (value << bitstart)
       return self.write(regval)
 
+   def getField(self, name):
+      for field in self.fields:
+         if getattr(field, 'name', None) == name:
+            return field
+      raise ValueError('%s has no field %s' % (self, name))
+
+   def applyFields(self, regval, fields):
+      for name, value in fields.items():
+         regval = self.getField(name).apply(regval, value)
+      return regval
+
+   def update(self, lock=None, **fields):
+      '''Apply several field changes with a single read-modify-write'''
+      with registerLock(lock):
+         return self.write(self.applyFields(self._readForUpdate(), fields))
+
    def generateFieldAttributes(self, attrs, field):
       attrs[field.name] = field.getAttribute(self)
 
+   def attributeNames(self):
+      names = [self.name] if self.name else []
+      names.extend(field.name for field in self.fields
+                   if hasattr(field, 'getAttribute'))
+      return names
+
    def generateAttributes(self, parent=None):
       if parent is not None:
          self.parent = parent
       assert self.parent is not None
 
+      if self.policy is not None:
+         self.readCache = ReadCache(self.policy,
+                                    stats=getattr(self.parent, 'readCacheStats',
+                                                  None))
+
       attrs = {}
       if self.name:
          attrs[self.name] = self.readWrite
@@ -188,6 +276,8 @@ class Register(HardwareHandle):
 
 class ClearOnReadRegister(Register):
    def __init__(self, addr, *fields, **kwargs):
+      # a cached value would hide the bits cleared by the hardware read
+      kwargs['policy'] = None
       super(ClearOnReadRegister, self).__init__(addr, *fields, **kwargs)
       self.cache = 0
 
@@ -209,8 +299,25 @@ class SetClearRegister(Register):
 
    def writeBit(self, bitpos, value):
       addr = self.addrSet if value else self.addrClear
+      self.invalidate()
       self.parent.write(addr, 1 << bitpos)
 
+   def update(self, lock=None, **fields):
+      setMask = 0
+      clearMask = 0
+      for name, value in fields.items():
+         field = self.getField(name)
+         if field.apply(0, value):
+            setMask |= 1 << field.bitpos
+         else:
+            clearMask |= 1 << field.bitpos
+      self.invalidate()
+      with registerLock(lock):
+         if setMask:
+            self.parent.write(self.addrSet, setMask)
+         if clearMask:
+            self.parent.write(self.addrClear, clearMask)
+
 class Rw1cRegister(Register):
    """Register where writing 1 to a bit clears it (Read-Write-1-to-Clear).
    Optionally takes a base address for memory-mapped register spaces."""
@@ -218,6 +325,9 @@ class Rw1cRegister(Register):
       super().__init__(addr, *fields, **kwargs)
       self.base = base
 
+   def canSnapshot(self):
+      return self.base is None
+
    def read(self):
       if self.base is not None:
          return self.parent.read(self.base, self.addr)
@@ -225,14 +335,21 @@ class Rw1cRegister(Register):
 
    def write(self, value):
       if self.base is not None:
+         self.invalidate()
          return self.parent.write(self.base, self.addr, value)
       return super().write(value)
 
    def writeBit(self, bitpos, value):
       return self.write(1 << bitpos)
 
+   def update(self, lock=None, **fields):
+      # only the bits set in the written value get cleared
+      with registerLock(lock):
+         return self.write(self.applyFields(0, fields))
+
 class RegisterArray(Register):
    def __init__(self, addrBegin, addrEnd, *fields, **kwargs):
+      kwargs['policy'] = None
       super().__init__(addrBegin, *fields, **kwargs)
       self.addrBegin = addrBegin
       self.addrEnd = addrEnd
@@ -266,30 +383,209 @@ class RegisterArray(Register):
    def writeBits(self, bitstart, bitend, value):
       raise NotImplementedError
 
+class RegisterSnapshot(object):
+   '''Read all the registers of a map using as few transfers as possible
+
+   Registers are grouped by contiguous address ranges which are read at once
+   via the readRange method of the parent (e.g. an mmap slice or an i2c block
+   read) when it sets SUPPORTS_BLOCK_READ. Within the context, register and
+   field accessors decode the values from the snapshot instead of issuing a
+   transfer each. Nested snapshots of the same map reuse the outer one.
+   '''
+   def __init__(self, regmap):
+      self.regmap = regmap
+      self.previous_ = {}
+
+   def __str__(self):
+      return '%s(%s)' % (self.__class__.__name__, self.regmap.parent_)
+
+   def groupRanges(self, registers, stride):
+      ranges = []
+      for reg in sorted(registers, key=lambda r: r.addr):
+         if ranges and reg.addr - ranges[-1][-1].addr in (0, stride):
+            ranges[-1].append(reg)
+         else:
+            ranges.append([reg])
+      return ranges
+
+   def _readRange(self, parent, regs):
+      addrs = sorted(set(reg.addr for reg in regs))
+      try:
+         values = parent.readRange(addrs[0], len(addrs))
+      except Exception as e: # pylint: disable=broad-except
+         logging.debug('%s: failed to read range %#x-%#x: %s', self,
+                       addrs[0], addrs[-1], e)
+         return
+      if values is None or len(values) != len(addrs):
+         return
+      values = dict(zip(addrs, values))
+      for reg in regs:
+         self.previous_[reg] = reg.snapshot_
+         reg.snapshot_ = values[reg.addr]
+      logging.io('%s: read %d registers from %#x', self, len(addrs), addrs[0])
+
+   def load(self):
+      parent = self.regmap.parent_
+      if utils.inSimulation() or \
+         not getattr(parent, 'SUPPORTS_BLOCK_READ', False):
+         return
+      stride = getattr(parent, 'REGISTER_STRIDE', 1)
+      registers = [reg for reg in self.regmap.registers_ if reg.canSnapshot()]
+      for regs in self.groupRanges(registers, stride):
+         self._readRange(parent, regs)
+
+   def __enter__(self):
+      if not self.regmap.snapshotDepth_:
+         self.load()
+      self.regmap.snapshotDepth_ += 1
+      return self
+
+   def __exit__(self, *args):
+      self.regmap.snapshotDepth_ -= 1
+      for reg, value in self.previous_.items():
+         reg.snapshot_ = value
+      self.previous_ = {}
+
+class RegisterTransaction(object):
+   '''Group field updates and apply them with one write per register
+
+   Fields are set through the transaction using the accessor names of the
+   register map and are written when the context exits without error.
+   '''
+   def __init__(self, regmap, lock=None):
+      self.regmap = regmap
+      self.lock = lock
+      self.fields = OrderedDict()
+      self.values = {}
+
+   def set(self, name, value):
+      handle = getattr(self.regmap, name).__self__
+      if isinstance(handle, Register):
+         self.values[handle] = value
+         self.fields.setdefault(handle, OrderedDict())
+      else:
+         self.fields.setdefault(handle.parent, OrderedDict())[handle.name] = value
+
+   def __getattr__(self, name):
+      if name not in self.regmap.attributes_:
+         raise AttributeError(name)
+      return lambda value: self.set(name, value)
+
+   def commit(self):
+      with registerLock(self.lock):
+         for reg, fields in self.fields.items():
+            if reg in self.values:
+               reg.write(reg.applyFields(self.values[reg], fields))
+            else:
+               reg.update(**fields)
+      self.fields.clear()
+      self.values.clear()
+
+   def __enter__(self):
+      return self
+
+   def __exit__(self, exc_type, *args):
+      if exc_type is None:
+         self.commit()
+
+class RegisterAttribute(object):
+   '''Class level accessor materializing the register of an instance
+
+   The register is only copied and bound to the parent on first access, after
+   which its accessors are stored on the instance and this is bypassed.
+   The owning register is looked up in the table of the instance class since
+   the accessor can be inherited by a subclass that redefines or drops it.
+   '''
+   def __init__(self, name, shadowed=None):
+      self.name = name
+      self.shadowed = shadowed
+
+   def __get__(self, obj, objtype=None):
+      if obj is None:
+         return self
+      index = type(obj)._table_.owners.get(self.name)
+      if index is None:
+         raise AttributeError("'%s' object has no attribute '%s'" %
+                              (type(obj).__name__, self.name))
+      return obj._materialize(index)[self.name]
+
+class RegisterMapTable(object):
+   '''Register definitions of a RegisterMap class, resolved once per class'''
+   def __init__(self, cls):
+      self.registers = []
+      self.attributes = []
+      self.owners = {}
+      templates = {}
+      # walk from parent to child definition to allow for proper overriding
+      # from child classes
+      for klass in reversed(cls.mro()):
+         for key, value in klass.__dict__.items():
+            if isinstance(value, RegisterAttribute):
+               if value.shadowed is None:
+                  continue
+               value = value.shadowed
+            if isinstance(value, Register):
+               templates[key] = value
+            else:
+               templates.pop(key, None)
+      for index, reg in enumerate(templates.values()):
+         self.registers.append(reg)
+         for name in reg.attributeNames():
+            self.attributes.append(name)
+            self.owners[name] = index
+
+   @classmethod
+   def get(cls, mapCls):
+      table = mapCls.__dict__.get('_table_')
+      if table is None:
+         table = cls(mapCls)
+         mapCls._table_ = table
+         for name in table.owners:
+            shadowed = mapCls.__dict__.get(name)
+            setattr(mapCls, name, RegisterAttribute(name, shadowed))
+      return table
+
 class RegisterMap(object):
    def __init__(self, parent, offset=0):
       self.parent_ = parent
-      self.attributes_ = []
       self.offset = offset
-      # initialize attributes from parent to child definition to allow for
-      # proper overriding from child classes
-      for cls in reversed(self.__class__.mro()):
-         for key in cls.__dict__:
-            attr = getattr(self, key)
-            if isinstance(attr, Register):
-               self._updateAttributes(copy.deepcopy(attr))
-
-   def _updateAttributes(self, reg):
-      reg.addr += self.offset
-      attrs = reg.generateAttributes(self.parent_)
-      for key, value in attrs.items():
-         self.attributes_.append(key)
-         setattr(self, key, value)
+      self.table_ = RegisterMapTable.get(self.__class__)
+      self.attributes_ = self.table_.attributes
+      self.materialized_ = {}
+      self.snapshotDepth_ = 0
+
+   @property
+   def registers_(self):
+      return [self._materialize(i)[None]
+              for i in range(len(self.table_.registers))]
+
+   def _materialize(self, index):
+      attrs = self.materialized_.get(index)
+      if attrs is None:
+         reg = copy.deepcopy(self.table_.registers[index])
+         reg.addr += self.offset
+         attrs = reg.generateAttributes(self.parent_)
+         for key, value in attrs.items():
+            if self.table_.owners.get(key) == index:
+               setattr(self, key, value)
+         attrs[None] = reg
+         self.materialized_[index] = attrs
+      return attrs
 
    def getGpio(self, name):
       return GpioFuncImpl(self, getattr(self, name))
 
+   def snapshot(self):
+      return RegisterSnapshot(self)
+
+   def transaction(self, lock=None):
+      return RegisterTransaction(self, lock=lock)
+
    def __diag__(self, ctx):
+      with self.snapshot() if ctx.performIo else nullcontext():
+         return self._genDiag(ctx)
+
+   def _genDiag(self, ctx):
       res = []
       for attr in self.attributes_:
          func = getattr(self, attr)
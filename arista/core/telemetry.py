@@ -0,0 +1,281 @@
+from array import array
+from contextlib import nullcontext
+
+from .config import Config
+from .log import getLogger
+from .utils import JsonStoredData
+
+from ..inventory.rail import Rail
+from ..libs.python import monotonicRaw
+
+logging = getLogger(__name__)
+
+class TelemetrySeries(object):
+   '''Fixed size ring buffer of samples'''
+   def __init__(self, size):
+      self.values = array('d', [0.] * size)
+      self.index = 0
+      self.count = 0
+
+   def __len__(self):
+      return self.count
+
+   def append(self, value):
+      self.values[self.index] = value
+      self.index = (self.index + 1) % len(self.values)
+      self.count = min(self.count + 1, len(self.values))
+
+   def samples(self):
+      if self.count < len(self.values):
+         return self.values[:self.count]
+      return self.values[self.index:] + self.values[:self.index]
+
+   def last(self):
+      if not self.count:
+         return None
+      return self.values[self.index - 1]
+
+   def summary(self):
+      if not self.count:
+         return None
+      samples = self.samples()
+      return {
+         'last': self.last(),
+         'min': min(samples),
+         'max': max(samples),
+         'avg': sum(samples) / self.count,
+      }
+
+RAIL_METRICS = {
+   'voltage': 'getVoltage',
+   'current': 'getCurrent',
+   'power': 'getPower',
+}
+
+class PowerSource(object):
+   '''PMBus device whose rails, temperatures and fans are sampled together'''
+   def __init__(self, name, driver=None, rails=None, temps=None, fans=None):
+      self.name = name
+      self.driver = driver
+      self.rails = rails or []
+      self.temps = temps or []
+      self.fans = fans or []
+
+   def snapshot(self):
+      snapshot = getattr(self.driver, 'snapshot', None)
+      if snapshot is None:
+         return nullcontext()
+      return snapshot()
+
+   def read(self):
+      values = {}
+      for rail in self.rails:
+         values[rail.getName()] = {
+            metric: getattr(rail, func)()
+            for metric, func in RAIL_METRICS.items()
+         }
+      for temp in self.temps:
+         values[temp.getName()] = {'temperature': temp.getTemperature()}
+      for fan in self.fans:
+         values[fan.getName()] = {'speed': fan.getSpeed()}
+      return values
+
+def getPresentPsus(platform):
+   return tuple((slot.getName(), slot.getPsu())
+                for slot in platform.getInventory().getPsuSlots())
+
+def getPowerSources(platform, psus=None):
+   sources = []
+   if psus is None:
+      psus = getPresentPsus(platform)
+   for name, psu in psus:
+      if psu is None:
+         continue
+      inventory = psu.psu.getInventory()
+      sources.append(PowerSource(name, psu.psu.driver,
+                                 rails=inventory.getRails(),
+                                 temps=inventory.getTemps(),
+                                 fans=inventory.getFans()))
+
+   # rails of the DC-DC converters and VRMs, grouped per device
+   devices = {}
+   for rail in platform.getInventory().getRails():
+      driver = getattr(rail, 'driver', None)
+      name = str(getattr(driver, 'addr', None) or rail.getName())
+      source = devices.get(name)
+      if source is None:
+         source = PowerSource(name, driver)
+         devices[name] = source
+         sources.append(source)
+      source.rails.append(rail)
+   return sources
+
+class PowerSampler(object):
+   '''Periodically sample all the PMBus devices of a platform
+
+   Each device is read in one pass, through a snapshot of its driver when
+   available, and every value is kept in a ring buffer. The summary is shared
+   through tmpfs so that other processes can be served from it.
+
+   The sources are enumerated again when a PSU is inserted or removed and only
+   the sources sampled during the last round are published, each with the
+   time it was sampled at.
+   '''
+
+   NAME = 'power_telemetry.json'
+
+   def __init__(self, platform, size=None, interval=None):
+      self.platform = platform
+      self.size = size or Config().power_telemetry_samples
+      self.interval = interval or Config().power_telemetry_interval
+      self.sources_ = None
+      self.psus_ = None
+      self.series = {}
+      self.timestamps = {}
+      self.timestamp = None
+
+   def sources(self):
+      psus = getPresentPsus(self.platform)
+      if self.sources_ is None or psus != self.psus_:
+         if self.sources_ is not None:
+            logging.debug('psu presence changed, enumerating power sources')
+         self.sources_ = getPowerSources(self.platform, psus)
+         self.psus_ = psus
+      return self.sources_
+
+   def _append(self, key, value):
+      series = self.series.get(key)
+      if series is None:
+         series = TelemetrySeries(self.size)
+         self.series[key] = series
+      series.append(value)
+
+   def sample(self):
+      timestamps = {}
+      for source in self.sources():
+         try:
+            with source.snapshot():
+               values = source.read()
+         except Exception as e: # pylint: disable=broad-except
+            logging.debug('%s: failed to sample: %s', source.name, e)
+            continue
+         timestamps[source.name] = monotonicRaw()
+         for name, metrics in values.items():
+            for metric, value in metrics.items():
+               if value is not None:
+                  self._append((source.name, name, metric), float(value))
+      # values of removed or failing sources must not be served anymore
+      for key in [k for k in self.series if k[0] not in timestamps]:
+         del self.series[key]
+      self.timestamps = timestamps
+      self.timestamp = monotonicRaw()
+
+   def summary(self):
+      data = {}
+      for (source, name, metric), series in self.series.items():
+         data.setdefault(source, {}).setdefault(name, {})[metric] = \
+            series.summary()
+      return data
+
+   def save(self):
+      JsonStoredData(self.NAME).write({
+         'timestamp': self.timestamp,
+         'interval': self.interval,
+         'samples': self.size,
+         'timestamps': self.timestamps,
+         'sources': self.summary(),
+      }, mode='w+')
+
+   def run(self):
+      self.sample()
+      self.save()
+
+class PowerTelemetry(object):
+   '''Sampled values as published by the PowerSampler'''
+   def __init__(self, data, interval=None):
+      self.timestamp = data['timestamp']
+      self.timestamps = data.get('timestamps', {})
+      self.sources = data['sources']
+      self.interval = interval
+
+   @classmethod
+   def load(cls):
+      '''Return the published telemetry unless it is stale'''
+      interval = Config().power_telemetry_interval
+      if not interval:
+         return None
+      data = JsonStoredData(PowerSampler.NAME).readOrClear()
+      if not data or data.get('timestamp') is None:
+         return None
+      if monotonicRaw() - data['timestamp'] > 3 * interval:
+         logging.debug('power telemetry is stale, ignoring')
+         return None
+      return cls(data, interval=interval)
+
+   def fresh(self, source):
+      timestamp = self.timestamps.get(source)
+      if timestamp is None:
+         return False
+      return monotonicRaw() - timestamp <= 3 * self.interval
+
+   def summary(self, source, name):
+      if not self.fresh(source):
+         return None
+      return self.sources.get(source, {}).get(name)
+
+   def get(self, source, name, metric):
+      summary = (self.summary(source, name) or {}).get(metric)
+      return summary['last'] if summary else None
+
+class TelemetryRail(Rail):
+   '''Rail served from the telemetry, falling back to the hardware'''
+   def __init__(self, telemetry, source, rail):
+      self.telemetry = telemetry
+      self.source = source
+      self.rail = rail
+
+   def __getattr__(self, attr):
+      if attr == 'rail':
+         raise AttributeError(attr)
+      return getattr(self.rail, attr)
+
+   def _get(self, metric):
+      value = self.telemetry.get(self.source, self.rail.getName(), metric)
+      if value is None:
+         return getattr(self.rail, RAIL_METRICS[metric])()
+      return value
+
+   def getName(self):
+      return self.rail.getName()
+
+   def getVoltage(self):
+      return self._get('voltage')
+
+   def getCurrent(self):
+      return self._get('current')
+
+   def getPower(self):
+      return self._get('power')
+
+   def __diag_post__(self, ctx, data):
+      data['telemetry'] = self.telemetry.summary(self.source, self.getName())
+      return data
+
+_telemetry = None
+def getPowerTelemetry(maxAge=1.):
+   '''Cached view of the published telemetry, reloaded after maxAge seconds'''
+   global _telemetry # pylint: disable=global-statement
+   now = monotonicRaw()
+   if _telemetry is None or now - _telemetry[0] > maxAge:
+      try:
+         _telemetry = (now, PowerTelemetry.load())
+      except Exception as e: # pylint: disable=broad-except
+         logging.debug('failed to load power telemetry: %s', e)
+         _telemetry = (now, None)
+   return _telemetry[1]
+
+def getTelemetryRails(source, rails):
+   telemetry = getPowerTelemetry()
+   if telemetry is None:
+      return rails
+   return [TelemetryRail(telemetry, source, rail) for rail in rails]
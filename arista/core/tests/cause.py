@@ -4,6 +4,7 @@ import datetime
 import json
 import os
 import tempfile
+import threading
 from unittest.mock import patch
 
 from ...libs.fs import touch, rmfile
@@ -16,13 +17,17 @@ from ...components.cookie import BertReloadCauseProvider
 from ..cause import (
    ReloadCauseDataStore,
    ReloadCauseEntry,
+   ReloadCauseHistory,
    ReloadCauseManager,
    ReloadCauseProviderHelper,
    ReloadCausePriority,
+   ReloadCauseReport,
    ReloadCauseScore,
+   componentBus,
 )
 from ..config import Config
 from ..inventory import Inventory
+from ..types import I2cAddr
 
 class MockReloadCauseProvider(ReloadCauseProviderHelper):
    def __init__(self, name, causes, extra=None, **kwargs):
@@ -153,8 +158,10 @@ class ReloadCauseManagerTest(unittest.TestCase):
       self.rcm = ReloadCauseManager(name='switch reload cause', path=path)
 
    def tearDown(self):
-      if os.path.exists(self.rcm.path):
-         os.remove(self.rcm.path)
+      for path in (self.rcm.path, self.rcm.history.logPath,
+                   self.rcm.history.indexPath):
+         if os.path.exists(path):
+            os.remove(path)
 
    def _getReloadCauseInventory(self, providers=None):
       if providers is None:
@@ -192,8 +199,13 @@ class ReloadCauseManagerTest(unittest.TestCase):
    def assertCauseStoreEqual(self, expected):
       with open(self.rcm.path) as f:
          data = json.load(f)
+      self.assertEqual(data.pop('history'),
+                       os.path.basename(self.rcm.history.logPath))
+      rcm = ReloadCauseManager(name=self.rcm.name, path=self.rcm.path)
+      rcm.loadCauses()
       self.maxDiff = None
       self.assertDictEqual(data, expected)
+      self.assertDictEqual(rcm.toDict(), expected)
 
    def testReloadCauseManager(self):
       inv = self._getReloadCauseInventory()
@@ -244,6 +256,121 @@ class ReloadCauseManagerTest(unittest.TestCase):
       self.rcm.storeCauses()
       self.assertCauseStoreEqual(self.EXPECTED_SIMPLE)
 
+   def _storeReports(self, count, start=0):
+      for i in range(start, start + count):
+         rcm = ReloadCauseManager(name=self.rcm.name, path=self.rcm.path)
+         date = datetime.datetime(2020, 1, 1) + datetime.timedelta(days=i)
+         rcm.readCauses(self._getReloadCauseInventory(), date=date)
+         rcm.storeCauses()
+
+   def _loadDates(self, count=None):
+      rcm = ReloadCauseManager(name=self.rcm.name, path=self.rcm.path)
+      rcm.loadCauses(count=count)
+      return [r.date.day for r in rcm.allReports()]
+
+   def testHistoryAppend(self):
+      self.storeJson(self.EXPECTED_SIMPLE)
+      self._storeReports(3)
+      legacy = strToDatetime(self.EXPECTED_DATE).day
+      self.assertEqual(self._loadDates(), [3, 2, 1, legacy])
+
+      # only the index and the requested reports are parsed
+      with patch('arista.core.cause.json.loads', wraps=json.loads) as loads:
+         self.assertEqual(self._loadDates(count=2), [3, 2])
+      self.assertEqual(loads.call_count, 2 + 1)
+
+   def testHistoryRetention(self):
+      with patch.object(Config(), 'reboot_cause_history', 3):
+         self._storeReports(6)
+         history = ReloadCauseHistory(self.rcm.path)
+         history.load()
+         self.assertEqual(len(history.offsets), 6)
+         self.assertEqual(self._loadDates(), [6, 5, 4])
+
+         # the log is compacted once it doubled the retention
+         self._storeReports(1, start=6)
+         history = ReloadCauseHistory(self.rcm.path)
+         history.load()
+         self.assertEqual(len(history.offsets), 3)
+         self.assertEqual(self._loadDates(), [7, 6, 5])
+
+   def testHistoryRecovery(self):
+      self._storeReports(2)
+      history = self.rcm.history
+
+      # interrupted append, the partial record is dropped
+      with open(history.logPath, 'a') as f:
+         f.write('{"name":')
+      self._storeReports(1, start=2)
+      self.assertEqual(self._loadDates(), [3, 2, 1])
+
+      # compaction without its index
+      with open(history.indexPath) as f:
+         index = json.load(f)
+      with open(history.logPath, 'rb') as f:
+         f.seek(index['offsets'][1])
+         data = f.read()
+      with open(history.logPath, 'wb') as f:
+         f.write(data)
+      self.assertEqual(self._loadDates(), [3, 2])
+
+      os.remove(history.indexPath)
+      self.assertEqual(self._loadDates(), [3, 2])
+
+      # append without its index, the records past the indexed end are kept
+      self._storeReports(1, start=3)
+      with open(history.indexPath) as f:
+         index = f.read()
+      self._storeReports(1, start=4)
+      with open(history.indexPath, 'w') as f:
+         f.write(index)
+      self.assertEqual(self._loadDates(), [5, 4, 3, 2])
+      self._storeReports(1, start=5)
+      self.assertEqual(self._loadDates(), [6, 5, 4, 3, 2])
+
+   def testCauseFileDowngrade(self):
+      # the cause file is only written along with a rewrite of the history
+      self._storeReports(1)
+      with open(self.rcm.path) as f:
+         head = f.read()
+      self._storeReports(1, start=1)
+      with open(self.rcm.path) as f:
+         self.assertEqual(f.read(), head)
+      data = json.loads(head)
+      self.assertEqual(len(data['reports']), 1)
+
+      # a release predating the history stores a report in the cause file
+      rcm = ReloadCauseManager(name=self.rcm.name, path=self.rcm.path)
+      rcm.readCauses(self._getReloadCauseInventory(),
+                     date=datetime.datetime(2020, 1, 3))
+      legacy = {
+         'name': data['name'],
+         'reports': [rcm.lastReport().toDict()] + data['reports'],
+         'version': data['version'],
+      }
+      with open(self.rcm.path, 'w') as f:
+         json.dump(legacy, f, indent=3, separators=(',', ': '))
+      self.assertEqual(self._loadDates(), [3, 2, 1])
+
+      # the report gets migrated into the history on the next store
+      self._storeReports(1, start=3)
+      self.assertEqual(self._loadDates(), [4, 3, 2, 1])
+      with patch('arista.core.cause.json.loads', wraps=json.loads) as loads:
+         self.assertEqual(self._loadDates(count=1), [4])
+      self.assertEqual(loads.call_count, 1 + 1)
+
+   def testHistoryArchive(self):
+      self._storeReports(2)
+      self.rcm = ReloadCauseManager(name='other switch', path=self.rcm.path)
+      self.rcm.readCauses(self._getReloadCauseInventory(),
+                          date=strToDatetime(self.EXPECTED_DATE))
+      self.rcm.storeCauses()
+      self.assertCauseStoreEqual(self.EXPECTED_SIMPLE | {'name': 'other switch'})
+
+      path = self.rcm._getArchivePath('switch reload cause')
+      self.assertTrue(os.path.exists(path))
+      os.remove(path)
+
    BERT_LINES = [
       'Processor Generic error, severity: Fatal',
       'Memory error, severity: Corrected, FRU: DIMM_A1',
@@ -463,6 +590,102 @@ class ReloadCauseManagerTest(unittest.TestCase):
             self.assertEqual(cause['reloadReason'], reportCause.getCause())
             self.assertEqual(cause['time'], reportCause.getTime())
 
+class BusReloadCauseProvider(ReloadCauseProviderHelper):
+   def __init__(self, name, bus, func=None):
+      super().__init__(name=name)
+      self.bus = bus
+      self.func = func
+      self.thread = None
+
+   def getBus(self):
+      return self.bus
+
+   def process(self):
+      self.thread = threading.current_thread()
+      if self.func is not None:
+         self.func()
+      self.causes = [ReloadCauseEntry(cause=self.name)]
+
+class FakeI2cComponent(object):
+   def __init__(self, bus):
+      self.addr = I2cAddr(bus, 0x50)
+
+class ReloadCauseReportTest(unittest.TestCase):
+   def _process(self, providers, **kwargs):
+      report = ReloadCauseReport()
+      report.processProviders(providers, **kwargs)
+      return report, {t['name']: t for t in report.timings}
+
+   def testConcurrentBuses(self):
+      # both providers must run at the same time to get past the barrier
+      barrier = threading.Barrier(2, timeout=5)
+      providers = [
+         BusReloadCauseProvider('ucd', 'i2c-1', barrier.wait),
+         BusReloadCauseProvider('adm', 'i2c-2', barrier.wait),
+      ]
+      report, timings = self._process(providers, workers=4)
+      self.assertEqual(report.providers, providers)
+      self.assertEqual(timings['ucd']['status'], 'done')
+      self.assertEqual(timings['adm']['bus'], 'i2c-2')
+      self.assertIsNotNone(timings['adm']['duration'])
+
+   def testSameBusSerialized(self):
+      providers = [
+         BusReloadCauseProvider('lc1', 'i2c-1'),
+         BusReloadCauseProvider('lc2', 'i2c-1'),
+         BusReloadCauseProvider('cpld', 'i2c-2'),
+      ]
+      report, _ = self._process(providers, workers=4)
+      self.assertEqual(report.providers, providers)
+      self.assertIs(providers[0].thread, providers[1].thread)
+      self.assertIsNot(providers[0].thread, threading.current_thread())
+
+   def testSequential(self):
+      providers = [BusReloadCauseProvider('a', 'i2c-1'),
+                   BusReloadCauseProvider('b', None)]
+      report, _ = self._process(providers, workers=1)
+      self.assertEqual(report.providers, providers)
+      self.assertIs(providers[1].thread, threading.current_thread())
+
+   def testFailure(self):
+      def fail():
+         raise IOError('bus stuck')
+      providers = [BusReloadCauseProvider('a', 'i2c-1', fail),
+                   BusReloadCauseProvider('b', 'i2c-1')]
+      report, timings = self._process(providers, workers=4)
+      self.assertEqual(report.providers, providers[1:])
+      self.assertEqual(timings['a']['status'], 'failed')
+
+   def testTimeout(self):
+      release = threading.Event()
+      providers = [
+         BusReloadCauseProvider('stuck', 'i2c-1', release.wait),
+         BusReloadCauseProvider('queued', 'i2c-1'),
+         BusReloadCauseProvider('other', 'i2c-2'),
+      ]
+      try:
+         report, timings = self._process(providers, workers=4, timeout=0.1)
+      finally:
+         release.set()
+      self.assertEqual(report.providers, providers[2:])
+      self.assertEqual(timings['stuck']['status'], 'timeout')
+      self.assertGreaterEqual(timings['stuck']['duration'], 0.1)
+      self.assertEqual(timings['queued']['status'], 'skipped')
+      self.assertEqual(timings['other']['status'], 'done')
+      # a stuck provider must not hold the process back on exit
+      self.assertTrue(providers[0].thread.daemon)
+
+   def testMuxChannelsShareBus(self):
+      def realpath(path):
+         return {
+            '/sys/bus/i2c/devices/i2c-12':
+               '/sys/devices/pci0000:00/0000:00:1f.4/i2c-5/5-0070/i2c-12',
+         }.get(path, path)
+      with patch('os.path.realpath', realpath):
+         self.assertEqual(componentBus(FakeI2cComponent(12)), 'i2c-5')
+         self.assertEqual(componentBus(FakeI2cComponent(7)), 'i2c-7')
+      self.assertIsNone(componentBus(object()))
+
 class ReloadCauseTest(unittest.TestCase):
    EXPECTED = [
       ReloadCauseEntry(cause='powerloss', rcTime='1970-01-01 00:01:11 UTC'),
@@ -11,8 +11,9 @@ from ...descs.sensor import SensorDesc
 from ...inventory.fan import Fan
 from ...inventory.temp import Temp
 
-from ...tests.testing import unittest
+from ...tests.testing import unittest, patch
 
+from ..config import Config
 from ..cooling import (
     CoolingAlgorithm,
     CoolingConfig,
@@ -21,6 +22,7 @@ from ..cooling import (
     CoolingLogicIncPid,
     CoolingLogicLegacy,
     CoolingThermalBase,
+    HistoricalData,
     ThermalClassicPid,
     ThermalExporter,
 )
@@ -174,6 +176,44 @@ class CoolingConfigTest(unittest.TestCase):
       self.assertEqual(result['psu']['minSpeed'], MIN_SPEED)
       self.assertEqual(result['psu']['maxSpeed'], MAX_SPEED)
 
+class HistoricalDataTest(unittest.TestCase):
+   def testRing(self):
+      with patch.object(Config(), 'cooling_data_points', 4):
+         data = HistoricalData('temp')
+      self.assertIsNone(data.lastGet)
+      for i, value in enumerate([40, 41.5, None, 43, 44.5]):
+         data.getValue(i, value)
+      self.assertEqual(len(data.get), 4)
+      self.assertEqual(list(data.get), [(1, 41.5), (2, None), (3, 43), (4, 44.5)])
+      self.assertEqual(data.get[-2][1], 43)
+      self.assertEqual(data.getLast(3), None)
+      self.assertIsNone(data.getLast(5))
+      self.assertEqual(data.lastGet, 44.5)
+
+      data.set = [(0, 10), (1, 20)]
+      data.set.append((2, 30))
+      self.assertEqual(data.lastSet, 30)
+      self.assertEqual(data.data['set'], [(0, 10), (1, 20), (2, 30)])
+
+   def testHistory(self):
+      with patch.object(Config(), 'cooling_history_hours', 0.05):
+         data = HistoricalData('temp', history=True)
+      for i in range(0, 240, 10):
+         data.getValue(i, 40 + i // 10)
+      data.getValue(240, None)
+
+      # the last 3 minutes are kept
+      self.assertEqual(data.data['history'], [
+         (60., 46, 51, 48.5),
+         (120., 52, 57, 54.5),
+         (180., 58, 63, 60.5),
+      ])
+
+   def testNoHistory(self):
+      data = HistoricalData('temp', history=True)
+      self.assertIsNone(data.history)
+      self.assertNotIn('history', data.data)
+
 class CoolingFanBaseTest(unittest.TestCase):
 
    def _makeConfig(self, fans=None):
@@ -684,7 +724,7 @@ class CoolingLogicExportTest(unittest.TestCase):
 
       thermalRows, fanRows = self._exportRows(algo)
       self.assertEqual(thermalRows[0], ['0', '1', '55.0', '0.0', '0.5'])
-      self.assertEqual(fanRows[0][1:], ['default', '62.5', 'fan1', '50'])
+      self.assertEqual(fanRows[0][1:], ['default', '62.5', 'fan1', '50.0'])
 
    def testIncPid(self):
       algo = self._makeAlgo('incpid', {
@@ -702,7 +742,7 @@ class CoolingLogicExportTest(unittest.TestCase):
       thermalRows, fanRows = self._exportRows(algo)
       self.assertEqual(thermalRows[0],
                        ['0', '1', '55.0', '0.0', '5.0', '10.0', '15.0'])
-      self.assertEqual(fanRows[0][1:], ['default', '80.0', 'fan1', '50'])
+      self.assertEqual(fanRows[0][1:], ['default', '80.0', 'fan1', '50.0'])
 
    def testClassicPid(self):
       algo = self._makeAlgo('classicpid', {
@@ -718,7 +758,40 @@ class CoolingLogicExportTest(unittest.TestCase):
       thermalRows, fanRows = self._exportRows(algo)
       self.assertEqual(thermalRows[0],
                        ['0', '1', '55.0', '0.0', '10.0', '0', '0'])
-      self.assertEqual(fanRows[0][1:], ['default', '100', 'fan1', '50'])
+      self.assertEqual(fanRows[0][1:], ['default', '100.0', 'fan1', '50.0'])
+
+   def testSummary(self):
+      algo = self._makeAlgo('legacy')
+      with patch.object(Config(), 'cooling_history_hours', 1):
+         fans, thermals = self._makeFansAndThermals(
+            tempValues=[55, 56, 57, 58, 59])
+
+      with tempfile.TemporaryDirectory() as tmpdir, \
+           patch('arista.core.cooling.monotonicRaw') as monotonic:
+         exporter = ThermalExporter(tmpdir)
+         for now in [1010., 1030., 1050., 1090., 1150.]:
+            monotonic.return_value = now
+            algo.run(fans=fans, thermals=thermals,
+                     elapsed=algo.INTERVAL, update=True)
+            exporter.run(algo.zones, algo.now)
+         exporter.close()
+
+         with open(os.path.join(tmpdir, 'thermals-summary.csv'),
+                   encoding='utf8', newline='') as f:
+            thermalRows = list(csv.reader(f))
+         with open(os.path.join(tmpdir, 'fans-summary.csv'),
+                   encoding='utf8', newline='') as f:
+            fanRows = list(csv.reader(f))
+
+      # the minute the export started in and the current one are skipped
+      self.assertEqual(thermalRows, [
+         ['10', '1', '56.0', '57.0', '56.5'],
+         ['70', '1', '58.0', '58.0', '58.0'],
+      ])
+      self.assertEqual([row[:3] for row in fanRows], [
+         ['10', 'default', 'fan1'],
+         ['70', 'default', 'fan1'],
+      ])
 
    def testInfoKeepsSeenThermals(self):
       algo = self._makeAlgo('legacy')
@@ -0,0 +1,491 @@
+import errno
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from ...tests.testing import unittest, patch
+
+from ..arbiter import I2cBusArbiter, I2cPriority, i2cPriority
+from ..breaker import CircuitBreaker, DeviceUnavailableError
+from ..config import Config
+from ..driver.kernel.i2c import I2cKernelDriver
+from ..driver.kernel.sysfs import SysfsEntryInt
+from ..driver.user.i2c import I2cDevDriver
+from ..i2c_utils import I2C_M_RD, I2C_RDWR_IOCTL_MAX_MSGS, I2cMsg
+from ..metrics import I2cStats, LatencyHistogram
+from ..types import I2cAddr
+from ...drivers.pmbus import PsuPmbusDetect
+
+def mock_inSimulation():
+   return False
+
+class FakeI2cDevice(object):
+   def __init__(self, size=0x100):
+      self.data = [i & 0xff for i in range(size)]
+      self.transfers = []
+      self.blockReads = []
+
+   def i2c_rdwr(self, ioctl_data):
+      self.transfers.append(ioctl_data.nmsgs)
+      reg = None
+      for i in range(ioctl_data.nmsgs):
+         msg = ioctl_data.msgs[i]
+         if msg.flags & I2C_M_RD:
+            for j in range(msg.len):
+               msg.buf[j] = self.data[reg + j]
+         else:
+            reg = msg.buf[0]
+
+   def read_i2c_block_data(self, _, reg, length=32):
+      self.blockReads.append((reg, length))
+      return self.data[reg:reg + length]
+
+def rejectRdwr(*args):
+   raise IOError(errno.EOPNOTSUPP, 'Operation not supported')
+
+@patch('arista.core.utils.inSimulation', mock_inSimulation)
+class I2cReadManyTest(unittest.TestCase):
+   def setUp(self):
+      self.device = FakeI2cDevice()
+      self.driver = I2cDevDriver(addr=I2cAddr(1, 0x50))
+      self.driver.msg_ = I2cMsg(self.driver.addr)
+      self.driver.bus_ = self.device
+
+   def testSingleTransfer(self):
+      with patch.object(self.driver.msg_, 'i2c_rdwr', self.device.i2c_rdwr):
+         data = self.driver.readMany([(0x10, 2), (0x20, 4), (0x88, 1)])
+      self.assertEqual(data, [[0x10, 0x11], [0x20, 0x21, 0x22, 0x23], [0x88]])
+      self.assertEqual(self.device.transfers, [6])
+      self.assertFalse(self.device.blockReads)
+
+   def testSplitTransfers(self):
+      requests = [(i, 1) for i in range(I2C_RDWR_IOCTL_MAX_MSGS)]
+      with patch.object(self.driver.msg_, 'i2c_rdwr', self.device.i2c_rdwr):
+         data = self.driver.readMany(requests)
+      self.assertEqual(data, [[i] for i in range(I2C_RDWR_IOCTL_MAX_MSGS)])
+      self.assertEqual(self.device.transfers, [I2C_RDWR_IOCTL_MAX_MSGS] * 2)
+
+   def testFallback(self):
+      with patch.object(self.driver.msg_, 'i2c_rdwr', rejectRdwr):
+         data = self.driver.readMany([(0x10, 2), (0x40, 40)])
+         self.assertEqual(data, [[0x10, 0x11], list(range(0x40, 0x68))])
+         self.assertFalse(self.driver.rdwrSupported)
+         self.assertEqual(self.device.blockReads,
+                          [(0x10, 2), (0x40, 32), (0x60, 8)])
+         self.driver.readMany([(0x10, 1)])
+      self.assertEqual(len(self.device.blockReads), 4)
+
+   def testTransferError(self):
+      def failRdwr(*args):
+         raise IOError(errno.ENXIO, 'No such device or address')
+      with patch.object(self.driver.msg_, 'i2c_rdwr', failRdwr):
+         with self.assertRaises(IOError):
+            self.driver.readMany([(0x10, 2)])
+      self.assertTrue(self.driver.rdwrSupported)
+
+   def testBytesSingleTransfer(self):
+      with patch.object(self.driver.msg_, 'i2c_rdwr', self.device.i2c_rdwr):
+         data = self.driver.readBytesMany([([0x10, 1, 0], 2), ([0x20, 1, 1], 3)])
+      self.assertEqual(data, [[0x10, 0x11], [0x20, 0x21, 0x22]])
+      self.assertEqual(self.device.transfers, [4])
+
+   def testBytesFallback(self):
+      reads = []
+      def readBytes(cmd, datalen):
+         reads.append(cmd)
+         return [cmd[0]] * datalen
+      with patch.object(self.driver.msg_, 'i2c_rdwr', rejectRdwr), \
+           patch.object(self.driver, 'read_bytes', readBytes):
+         data = self.driver.readBytesMany([([0x10, 1, 0], 2), ([0x20, 1, 1], 1)])
+      self.assertEqual(data, [[0x10, 0x10], [0x20]])
+      self.assertEqual(reads, [[0x10, 1, 0], [0x20, 1, 1]])
+      self.assertFalse(self.driver.rdwrSupported)
+
+@patch('arista.core.utils.inSimulation', mock_inSimulation)
+class PsuPmbusDetectTest(unittest.TestCase):
+   def setUp(self):
+      self.device = FakeI2cDevice()
+      self.device.data += [0] * 0x20
+      self.driver = PsuPmbusDetect(I2cAddr(1, 0x58), prepare=False)
+      self.driver.msg_ = I2cMsg(self.driver.addr)
+      self.driver.bus_ = self.device
+
+   def writeBlock(self, reg, value):
+      self.device.data[reg] = len(value)
+      self.device.data[reg + 1:reg + 1 + len(value)] = [ord(c) for c in value]
+
+   def testMetadataSingleTransfer(self):
+      self.driver.id_ = 'Arista'
+      self.driver.model_ = 'PWR-1'
+      for reg in (PsuPmbusDetect.MFR_REVISION, PsuPmbusDetect.MFR_LOCATION,
+                  PsuPmbusDetect.MFR_DATE):
+         self.writeBlock(reg, '')
+      self.writeBlock(PsuPmbusDetect.MFR_SERIAL, 'ABC123')
+      with patch.object(self.driver.msg_, 'i2c_rdwr', self.device.i2c_rdwr):
+         metadata = self.driver.getMfrMetadata()
+      self.assertEqual(self.device.transfers, [8])
+      self.assertEqual(metadata['serial'], 'ABC123')
+      self.assertEqual(metadata['date'], '')
+      self.assertEqual(metadata['model'], 'PWR-1')
+
+class I2cBusArbiterTest(unittest.TestCase):
+   def setUp(self):
+      self.tmpdir = tempfile.mkdtemp()
+      self.arbiter = I2cBusArbiter(1, path=self.tmpdir)
+
+   def tearDown(self):
+      shutil.rmtree(self.tmpdir)
+
+   def testReentrant(self):
+      self.arbiter.acquire(I2cPriority.COOLING)
+      files = list(self.arbiter.local_.files.values())
+      self.arbiter.acquire(I2cPriority.COOLING)
+      self.arbiter.release()
+      self.assertFalse(any(f.closed for f in files))
+      self.arbiter.release()
+      # the lock files are closed once the transaction is over
+      self.assertTrue(all(f.closed for f in files))
+      self.assertEqual(self.arbiter.stats.transactions[I2cPriority.COOLING], 1)
+      diag = self.arbiter.__diag__(None)
+      self.assertEqual(diag['cooling']['transactions'], 1)
+
+   def testPriorityOrder(self):
+      order = []
+      def waiter(priority):
+         self.arbiter.acquire(priority)
+         order.append(priority)
+         self.arbiter.release()
+
+      self.arbiter.acquire(I2cPriority.TELEMETRY)
+      threads = []
+      for priority in (I2cPriority.DIAG, I2cPriority.COOLING):
+         thread = threading.Thread(target=waiter, args=(priority,))
+         thread.start()
+         threads.append(thread)
+         time.sleep(0.05)
+      self.arbiter.release()
+      for thread in threads:
+         thread.join()
+
+      self.assertEqual(order, [I2cPriority.COOLING, I2cPriority.DIAG])
+      stats = self.arbiter.stats
+      self.assertGreater(stats.waitMax[I2cPriority.DIAG],
+                         stats.waitMax[I2cPriority.COOLING])
+
+   def testBackoff(self):
+      owner = I2cBusArbiter(1, path=self.tmpdir)
+      delays = []
+      def sleep(delay):
+         delays.append(delay)
+         if len(delays) == 8:
+            owner.release()
+
+      owner.acquire(I2cPriority.TELEMETRY)
+      with patch('arista.core.arbiter.time.sleep', sleep):
+         self.arbiter.acquire(I2cPriority.DIAG)
+      self.arbiter.release()
+      self.assertEqual(delays[:3], [I2cBusArbiter.POLL_INTERVAL,
+                                    I2cBusArbiter.POLL_INTERVAL * 2,
+                                    I2cBusArbiter.POLL_INTERVAL * 4])
+      self.assertEqual(delays[-1], I2cBusArbiter.POLL_INTERVAL_MAX)
+
+@patch('arista.core.utils.inSimulation', mock_inSimulation)
+class I2cArbitratedDriverTest(unittest.TestCase):
+   def setUp(self):
+      self.tmpdir = tempfile.mkdtemp()
+      self.patchers = [
+         patch.object(Config(), 'i2c_arbitration', True),
+         patch.object(Config(), 'tmpfs_path', self.tmpdir),
+         patch.dict('arista.core.arbiter._arbiters', clear=True),
+      ]
+      for patcher in self.patchers:
+         patcher.start()
+      self.driver = I2cDevDriver(addr=I2cAddr(1, 0x50, block=False))
+      self.driver.bus_ = FakeI2cDevice()
+
+   def tearDown(self):
+      for patcher in reversed(self.patchers):
+         patcher.stop()
+      shutil.rmtree(self.tmpdir)
+
+   def testTransactions(self):
+      self.driver.read_block_data(0x10)
+      with i2cPriority(I2cPriority.DIAG):
+         with self.driver.transaction():
+            self.driver.read_i2c_block_data(0x10, 2)
+            self.driver.read_i2c_block_data(0x20, 2)
+      diag = self.driver.__diag__(None)['arbiter']
+      self.assertEqual(diag['telemetry']['transactions'], 1)
+      self.assertEqual(diag['diag']['transactions'], 1)
+
+   def testKernelDriverSysfs(self):
+      driver = I2cKernelDriver(addr=I2cAddr(1, 0x4c), name='lm73')
+      path = os.path.join(self.tmpdir, 'temp1_input')
+      with open(path, 'w') as f:
+         f.write('42000\n')
+      class Parent(object):
+         pass
+      parent = Parent()
+      parent.driver = driver
+      temp = SysfsEntryInt(parent, 'temp1_input', policy='temp',
+                           pathCallback=lambda name: path)
+      with i2cPriority(I2cPriority.COOLING):
+         self.assertEqual(temp.read(), 42000)
+      diag = self.driver.__diag__(None)['arbiter']
+      self.assertEqual(diag['cooling']['transactions'], 1)
+
+class FakeClock(object):
+   def __init__(self):
+      self.now = 100.
+
+   def __call__(self):
+      return self.now
+
+class CircuitBreakerTest(unittest.TestCase):
+   def setUp(self):
+      self.clock = FakeClock()
+      self.patcher = patch('arista.core.breaker.monotonicRaw', self.clock)
+      self.patcher.start()
+      self.breaker = CircuitBreaker('fake', threshold=2, backoff=1.,
+                                    backoffMax=3.)
+
+   def tearDown(self):
+      self.patcher.stop()
+
+   def timeout(self):
+      return IOError(errno.ETIMEDOUT, 'Connection timed out')
+
+   def testTrip(self):
+      self.breaker.record(self.timeout())
+      self.assertTrue(self.breaker.allow())
+      self.breaker.record(self.timeout())
+      self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+      self.assertFalse(self.breaker.allow())
+      self.assertEqual(self.breaker.trips, 1)
+
+   def testNackIsNotStall(self):
+      for _ in range(3):
+         self.breaker.record(IOError(errno.ENXIO, 'No such device'))
+      self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+   def testBackoff(self):
+      for _ in range(2):
+         self.breaker.record(self.timeout())
+      for cooldown in (2., 3., 3.):
+         self.clock.now += self.breaker.cooldown
+         self.assertTrue(self.breaker.allow())
+         self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+         # a single probe is let through
+         self.assertFalse(self.breaker.allow())
+         self.breaker.record(self.timeout())
+         self.assertEqual(self.breaker.cooldown, cooldown)
+      self.clock.now += self.breaker.cooldown
+      self.assertTrue(self.breaker.allow())
+      self.breaker.record()
+      self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+      self.assertEqual(self.breaker.cooldown, 1.)
+      self.assertEqual(self.breaker.trips, 1)
+
+class StalledI2cDevice(FakeI2cDevice):
+   def __init__(self):
+      super().__init__()
+      self.attempts = 0
+
+   def read_byte(self, addr):
+      self.attempts += 1
+      raise IOError(errno.ETIMEDOUT, 'Connection timed out')
+
+   def read_byte_data(self, addr, reg):
+      return self.read_byte(addr)
+
+class NackI2cDevice(StalledI2cDevice):
+   def read_byte(self, addr):
+      # the scd reports a NACK from an absent device as EIO
+      self.attempts += 1
+      raise IOError(errno.EIO, 'Input/output error')
+
+class ScdTimeoutI2cDevice(StalledI2cDevice):
+   def __init__(self, clock):
+      super().__init__()
+      self.clock = clock
+
+   def read_byte(self, addr):
+      # the scd reports a device timeout as EIO too, only after a while
+      self.attempts += 1
+      self.clock.now += 0.035
+      raise IOError(errno.EIO, 'Input/output error')
+
+class BrokenI2cDevice(StalledI2cDevice):
+   def read_byte(self, addr):
+      self.attempts += 1
+      raise ValueError('unexpected reply')
+
+@patch('arista.core.utils.inSimulation', mock_inSimulation)
+class I2cCircuitBreakerTest(unittest.TestCase):
+   def setUp(self):
+      self.patchers = [
+         patch.object(Config(), 'i2c_breaker_threshold', 2),
+         patch.dict('arista.core.breaker._breakers', clear=True),
+      ]
+      for patcher in self.patchers:
+         patcher.start()
+      self.device = StalledI2cDevice()
+      self.driver = I2cDevDriver(addr=I2cAddr(1, 0x58))
+      self.driver.bus_ = self.device
+
+   def tearDown(self):
+      for patcher in reversed(self.patchers):
+         patcher.stop()
+
+   def testShortCircuit(self):
+      for _ in range(2):
+         with self.assertRaises(IOError):
+            self.driver.read_byte_data(0x00)
+      with self.assertRaises(DeviceUnavailableError):
+         self.driver.read_byte_data(0x00)
+      self.assertEqual(self.device.attempts, 2)
+      self.assertEqual(self.driver.__diag__(None)['breaker']['state'],
+                       CircuitBreaker.OPEN)
+
+   def testSharedAcrossDrivers(self):
+      for _ in range(2):
+         with self.assertRaises(IOError):
+            self.driver.read_byte_data(0x00)
+      other = I2cDevDriver(addr=I2cAddr(1, 0x58))
+      other.bus_ = self.device
+      with self.assertRaises(DeviceUnavailableError):
+         other.read_byte_data(0x00)
+      self.assertEqual(self.device.attempts, 2)
+
+   def testPresenceProbeBackoff(self):
+      for _ in range(3):
+         self.assertFalse(self.driver.smbusPing())
+      # stalled probes back off on their own breaker
+      self.assertEqual(self.device.attempts, 2)
+      self.assertEqual(self.driver.probeBreaker.state, CircuitBreaker.OPEN)
+      self.assertEqual(self.driver.breaker.state, CircuitBreaker.CLOSED)
+      with self.assertRaises(IOError):
+         self.driver.read_byte_data(0x00)
+      self.assertEqual(self.device.attempts, 3)
+
+   def testPresenceProbeNack(self):
+      self.driver.bus_ = NackI2cDevice()
+      for _ in range(5):
+         self.assertFalse(self.driver.smbusPing())
+      self.assertEqual(self.driver.bus_.attempts, 5)
+      self.assertEqual(self.driver.probeBreaker.state, CircuitBreaker.CLOSED)
+
+   def testScdTimeout(self):
+      clock = FakeClock()
+      with patch('arista.core.breaker.monotonicRaw', clock), \
+           patch('arista.core.driver.user.i2c.monotonicRaw', clock):
+         self.driver.bus_ = ScdTimeoutI2cDevice(clock)
+         for _ in range(3):
+            self.assertFalse(self.driver.smbusPing())
+         self.assertEqual(self.driver.bus_.attempts, 2)
+         self.assertEqual(self.driver.probeBreaker.state, CircuitBreaker.OPEN)
+
+   def testUnexpectedErrorRecorded(self):
+      clock = FakeClock()
+      with patch('arista.core.breaker.monotonicRaw', clock):
+         for _ in range(2):
+            with self.assertRaises(IOError):
+               self.driver.read_byte_data(0x00)
+         clock.now += self.driver.breaker.cooldown
+         self.driver.bus_ = BrokenI2cDevice()
+         with self.assertRaises(ValueError):
+            self.driver.read_byte_data(0x00)
+         # the probe outcome left the half-open state
+         self.assertEqual(self.driver.breaker.state, CircuitBreaker.CLOSED)
+         self.assertTrue(self.driver.breaker.allow())
+
+   def testScdNack(self):
+      self.driver.bus_ = NackI2cDevice()
+      for _ in range(5):
+         with self.assertRaises(IOError):
+            self.driver.read_byte_data(0x00)
+      self.assertEqual(self.driver.bus_.attempts, 5)
+      self.assertEqual(self.driver.breaker.state, CircuitBreaker.CLOSED)
+
+   def testDisabled(self):
+      with patch.object(Config(), 'i2c_breaker_threshold', 0), \
+           patch.dict('arista.core.breaker._breakers', clear=True):
+         driver = I2cDevDriver(addr=I2cAddr(1, 0x58))
+         driver.bus_ = self.device
+         for _ in range(3):
+            with self.assertRaises(IOError):
+               driver.read_byte_data(0x00)
+         self.assertEqual(self.device.attempts, 3)
+
+class LatencyHistogramTest(unittest.TestCase):
+   def testBuckets(self):
+      for value in [0, 1, 15, 16, 17, 100, 1000, 123456]:
+         index = LatencyHistogram.bucketIndex(value)
+         low = LatencyHistogram.bucketValue(index)
+         self.assertLessEqual(low, value)
+         self.assertLessEqual(value - low, value // LatencyHistogram.SUB_COUNT)
+
+   def testPercentiles(self):
+      histogram = LatencyHistogram()
+      for value in range(1, 101):
+         histogram.record(value)
+      histogram.record(10000)
+      self.assertEqual(histogram.count, 101)
+      self.assertEqual(histogram.min, 1)
+      self.assertEqual(histogram.max, 10000)
+      self.assertAlmostEqual(histogram.percentile(50), 48, delta=48 // 8)
+      self.assertEqual(histogram.percentile(100), 9216)
+      diag = histogram.__diag__(None)
+      self.assertEqual(sum(diag['buckets'].values()), 101)
+
+@patch('arista.core.utils.inSimulation', mock_inSimulation)
+class I2cStatsTest(unittest.TestCase):
+   def setUp(self):
+      self.stats = I2cStats()
+      self.patcher = patch('arista.core.metrics._i2cStats', self.stats)
+      self.patcher.start()
+      self.device = FakeI2cDevice()
+      self.driver = I2cDevDriver(addr=I2cAddr(1, 0x50, block=False))
+      self.driver.bus_ = self.device
+      self.driver.msg_ = I2cMsg(self.driver.addr)
+
+   def tearDown(self):
+      self.patcher.stop()
+
+   def testDriverOps(self):
+      self.driver.read_i2c_block_data(0x10, 4)
+      self.driver.read_i2c_block_data(0x10, 4)
+      # nested accesses are accounted for once
+      self.driver.read_block_data(0x02)
+      ops = self.stats.get(bus=1, addr=0x50)
+      self.assertEqual(ops[(1, 0x50, 'read_i2c_block_data')].count, 2)
+      self.assertEqual(ops[(1, 0x50, 'read_i2c_block_data')].bytes, 8)
+      self.assertEqual(ops[(1, 0x50, 'read_block_data')].count, 1)
+      diag = self.driver.__diag__(None)['stats']
+      self.assertEqual(diag['1']['0x50']['read_block_data']['count'], 1)
+
+   def testErrors(self):
+      def failRead(*args):
+         raise IOError(errno.ENXIO, 'No such device or address')
+      with patch.object(self.device, 'read_i2c_block_data', failRead):
+         with self.assertRaises(IOError):
+            self.driver.read_i2c_block_data(0x10, 4)
+      ops = self.stats.get()
+      self.assertEqual(ops[(1, 0x50, 'read_i2c_block_data')].errors, 1)
+
+   def testMsgTransfers(self):
+      msg = self.driver.msg_
+      msg.device = tempfile.TemporaryFile()
+      with patch('arista.core.i2c_utils.ioctl', return_value=2):
+         self.driver.readMany([(0x10, 2), (0x20, 2)])
+         msg.read_bytes(0x51, [0x10], 4)
+      msg.close()
+      ops = self.stats.get()
+      self.assertEqual(ops[(1, 0x50, 'readMany')].count, 1)
+      self.assertNotIn((1, 0x50, 'i2c_rdwr_read'), ops)
+      self.assertEqual(ops[(1, 0x51, 'i2c_rdwr_read')].bytes, 5)
+
+if __name__ == '__main__':
+   unittest.main()
@@ -1,8 +1,9 @@
 
+import errno
 import os
 import shutil
 import tempfile
-from ...tests.testing import unittest
+from ...tests.testing import unittest, patch
 
 from ...drivers.pmbus import (
    PmbusRegister,
@@ -19,8 +20,8 @@ class PmbusTestBase(unittest.TestCase):
    def tearDown(self):
       shutil.rmtree(self.tempdir)
 
-   def _writeStatusFile(self, page, value):
-      path = os.path.join(self.tempdir, f'status{page}')
+   def _writeStatusFile(self, page, value, suffix=''):
+      path = os.path.join(self.tempdir, f'status{page}{suffix}')
       with open(path, 'w', encoding='utf-8') as f:
          f.write(value)
 
@@ -34,6 +35,27 @@ class TestPmbusRegister(PmbusTestBase):
       reg = PmbusRegister(self.manager, page=1)
       self.assertIsNone(reg.read())
 
+   def testReadReusesFd(self):
+      self._writeStatusFile(0, '0x42')
+      reg = PmbusRegister(self.manager, page=0)
+      with patch('os.open', wraps=os.open) as osOpen:
+         self.assertEqual(reg.read(), 0x42)
+         self._writeStatusFile(0, '0x43')
+         self.assertEqual(reg.read(), 0x43)
+         self.assertEqual(osOpen.call_count, 1)
+      reg.close()
+
+   def testReadRemovedFile(self):
+      self._writeStatusFile(0, '0x42')
+      reg = PmbusRegister(self.manager, page=0)
+      self.assertEqual(reg.read(), 0x42)
+      with patch('os.pread', side_effect=OSError(errno.ENODEV, 'removed')):
+         self.assertIsNone(reg.read())
+      self.assertIsNone(reg.fd_)
+      self._writeStatusFile(0, '0x44')
+      self.assertEqual(reg.read(), 0x44)
+      reg.close()
+
 class TestPmbusStatusRegister(PmbusTestBase):
    def testReadStatusWord(self):
       self._writeStatusFile(0, '0x0840')
@@ -75,6 +97,17 @@ class TestPmbusStatus(PmbusTestBase):
       status = PmbusStatus(self.manager, page=0)
       self.assertTrue(status.hasPowerLoss())
 
+   def testRefresh(self):
+      self._writeStatusFile(0, '0x0000')
+      self._writeStatusFile(0, '0x00', suffix='_cml')
+      status = PmbusStatus(self.manager, page=0)
+      self.assertTrue(status.refresh())
+      self.assertFalse(status.refresh())
+      self._writeStatusFile(0, '0x02', suffix='_cml')
+      self.assertTrue(status.refresh())
+      self.assertEqual((status.status, status.cml), (0, 0x02))
+      status.close()
+
 class MockDriver:
    def __init__(self, hwmonPath=None):
       self.hwmonPath = hwmonPath
@@ -120,6 +153,38 @@ class TestPmbusStatusManager(unittest.TestCase):
       manager.discover()
       self.assertFalse(manager.getStatus())
 
+   def testRefreshAll(self):
+      path = os.path.join(self.debugfsDir, 'status0')
+      with open(path, 'w', encoding='utf-8') as f:
+         f.write('0x0000')
+      driver = MockDriver(hwmonPath=self.hwmonDir)
+      manager = PmbusStatusManager(driver)
+      manager.DEBUGFS_BASE = os.path.join(self.tempdir, 'debugfs')
+      manager.discover()
+      self.assertEqual(list(manager.refreshAll()), [0])
+      self.assertEqual(manager.refreshAll(), {})
+      with open(path, 'w', encoding='utf-8') as f:
+         f.write('0x0840')
+      self.assertEqual(manager.refreshAll()[0].status, 0x0840)
+      self.assertFalse(manager.getStatus())
+      manager.close()
+
+   def testGetStatusRefreshesPages(self):
+      path = os.path.join(self.debugfsDir, 'status0')
+      with open(path, 'w', encoding='utf-8') as f:
+         f.write('0x0000')
+      driver = MockDriver(hwmonPath=self.hwmonDir)
+      manager = PmbusStatusManager(driver)
+      manager.DEBUGFS_BASE = os.path.join(self.tempdir, 'debugfs')
+      manager.discover()
+      self.assertTrue(manager.getStatus())
+      with open(path, 'w', encoding='utf-8') as f:
+         f.write('0x0840')
+      self.assertFalse(manager.getStatus())
+      self.assertEqual(manager.pages[0].status, 0x0840)
+      self.assertEqual(manager.refreshAll(), {})
+      manager.close()
+
    def testGetStatusNoHwmon(self):
       driver = MockDriver(hwmonPath=None)
       manager = PmbusStatusManager(driver)
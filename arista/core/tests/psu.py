@@ -1,4 +1,7 @@
 
+import shutil
+import tempfile
+
 from ...tests.testing import unittest, patch
 
 from ...descs.fan import FanDesc, FanPosition
@@ -7,9 +10,10 @@ from ...descs.rail import RailDesc, RailDirection
 from ...descs.sensor import Position, SensorDesc
 
 from ..component import Component, Priority
+from ..config import Config
 from ..cooling import Airflow
 from ..fixed import FixedSystem
-from ..psu import PsuSlot, PsuModel, PsuIdent
+from ..psu import PsuSlot, PsuModel, PsuIdent, getPsuManager
 from ..utils import incrange
 
 from .mockinv import (
@@ -78,7 +82,7 @@ class PsuModel3(MockPsuModel):
    ]
 
 class MockPmbusDetect(object):
-   def __init__(self, mockData):
+   def __init__(self, mockData, prepare=True): # pylint: disable=unused-argument
       if isinstance(mockData, int):
          mockData = { 'id': 'unknown', 'model': 'unknown' }
       self.mockData = mockData
@@ -89,6 +93,9 @@ class MockPmbusDetect(object):
    def model(self):
       return self.mockData['model']
 
+   def serial(self):
+      return self.mockData.get('serial', 'N/A')
+
    def getMetadata(self):
       return self.mockData
 
@@ -154,6 +161,86 @@ class TestPsu(unittest.TestCase):
       self._checkSystem(system)
       self._checkPsu(system, 0, PsuModel2)
 
+   def testPsuDetectedFromIndex(self):
+      def psuFunc(_):
+         return { 'id': 'DELTA', 'model': 'DPS-495CB A' }
+      system = MockFixedSystem([PsuModel1, PsuModel2], psuFunc=psuFunc)
+      model = system.slots[0].autodetectPsuModel()
+      self.assertEqual(model.__class__.__name__, 'DPS495CB')
+
+
+@patch('arista.core.psu.PsuPmbusDetect', MockPmbusDetect)
+@patch('arista.core.psu.inSimulation', lambda: False)
+class TestPsuSlotCache(unittest.TestCase):
+   def setUp(self):
+      self.tmpdir = tempfile.mkdtemp()
+      self.patchers = [
+         patch.object(Config(), 'tmpfs_path', self.tmpdir),
+         patch.dict(getPsuManager().classes, {
+            'PsuModel1': PsuModel1,
+            'PsuModel2': PsuModel2,
+         }),
+      ]
+      for patcher in self.patchers:
+         patcher.start()
+      self.psuData = {
+         'id': 'VENDOR1', 'model': 'MODEL2-0', 'serial': 'SERIAL1',
+      }
+
+   def tearDown(self):
+      for patcher in reversed(self.patchers):
+         patcher.stop()
+      shutil.rmtree(self.tmpdir)
+
+   def _createSlot(self):
+      system = MockFixedSystem([PsuModel1, PsuModel2], numPsus=1,
+                               psuFunc=lambda _: dict(self.psuData))
+      slot = system.slots[0]
+      slot.presentGpio.value = 1
+      return slot
+
+   def _setup(self, slot):
+      manager = getPsuManager()
+      with patch.object(manager, 'autodetectPmbusPsu',
+                        wraps=manager.autodetectPmbusPsu) as autodetect:
+         slot.setup()
+         return autodetect.call_count
+
+   def testCacheReused(self):
+      self.assertEqual(self._setup(self._createSlot()), 1)
+      slot = self._createSlot()
+      self.assertIsInstance(slot.model, PsuModel2)
+      self.assertEqual(self._setup(slot), 0)
+      self.assertIsInstance(slot.model, PsuModel2)
+      self.assertEqual(slot.getCache()['fingerprint'], {
+         'model': 'MODEL2-0', 'serial': 'SERIAL1',
+      })
+
+   def testCacheSwappedSameModel(self):
+      self._setup(self._createSlot())
+      self.psuData['serial'] = 'SERIAL2'
+      slot = self._createSlot()
+      self.assertEqual(self._setup(slot), 1)
+      self.assertEqual(slot.model.identifier.metadata['serial'], 'SERIAL2')
+      self.assertEqual(slot.getCache()['fingerprint']['serial'], 'SERIAL2')
+
+   def testCacheSwappedOtherModel(self):
+      self._setup(self._createSlot())
+      self.psuData.update({ 'model': 'MODEL1-1', 'serial': 'N/A' })
+      slot = self._createSlot()
+      self.assertEqual(self._setup(slot), 1)
+      self.assertIsInstance(slot.model, PsuModel1)
+      # without serial number the model is used as fingerprint
+      slot = self._createSlot()
+      self.assertEqual(self._setup(slot), 0)
+      self.assertIsInstance(slot.model, PsuModel1)
+
+   def testCacheRemoved(self):
+      slot = self._createSlot()
+      self._setup(slot)
+      slot.presentGpio.value = 0
+      slot.setup()
+      self.assertIsNone(slot.getCache())
 
 class TestPsuSlotPmbusStatus(unittest.TestCase):
    def _createSlot(self, psuStatusPolicy=None):
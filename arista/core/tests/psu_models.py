@@ -1,6 +1,6 @@
 
 from ..log import getLogger
-from ..psu import PsuIdent, getPsuManager
+from ..psu import PsuIdent, PsuManager, getPsuManager
 
 from ...descs.psu import PsuDesc
 
@@ -45,5 +45,22 @@ class PsuModelTest(unittest.TestCase):
       for model in models:
          self._testPsuModel(model)
 
+   def testPsuIndex(self):
+      from ...components.psu.index import PSU_INDEX
+      self.assertEqual(PSU_INDEX, PsuManager().generateIndex(),
+                       'outdated psu index, run scripts/psu-index')
+
+   def testPsuIndexLookup(self):
+      manager = PsuManager()
+      model = manager.lookupPmbusPsu('DELTA ', 'DPS-495CB A ')
+      self.assertEqual(model.__name__, 'DPS495CB')
+      self.assertIsNotNone(manager.psuForIdentifier('Art700', PsuIdent()))
+      self.assertIsNone(manager.lookupPmbusPsu('delta', 'unknown'))
+      # only the modules of the models looked up were imported
+      self.assertIsNone(manager.modules)
+      self.assertEqual(set(m.__module__ for m in manager.classes.values()),
+                       { 'arista.components.psu.artesyn',
+                         'arista.components.psu.delta' })
+
 if __name__ == '__main__':
    unittest.main()
@@ -1,7 +1,11 @@
 from __future__ import absolute_import, division, print_function
 
-from ...tests.testing import unittest
+import tempfile
 
+from ...tests.testing import unittest, patch
+
+from ..cache import ReadCacheStats
+from ..config import Config
 from ..diag import DiagContext
 from ..register import (
    ClearOnReadRegister,
@@ -265,5 +269,258 @@ class OverrideRegisterTest(unittest.TestCase):
       self.assertEqual(regs.bit0(), 1)
       self.assertEqual(regs.bit1(), 0)
 
+class FakeNamedRegisterMap(RegisterMap):
+   revision = Register(0x01, name='revision')
+   scratchpad = Register(0x05, name='scratchpad', ro=False)
+
+class FakeNamedChildRegisterMap(FakeNamedRegisterMap):
+   control = Register(0x02, RegBitField(0, 'writeOk', ro=False))
+
+class FakeParentRegisterMap(RegisterMap):
+   CONTROL = Register(0x02,
+      RegBitField(0, 'writeOk'),
+      RegBitField(1, 'powerCycleOnSeu', ro=False),
+   )
+
+class FakeDroppedFieldRegisterMap(FakeParentRegisterMap):
+   CONTROL = Register(0x02,
+      RegBitField(0, 'writeOk'),
+   )
+
+class CompiledRegisterMapTest(unittest.TestCase):
+   def testSharedDefinition(self):
+      first = FakeRegisterMap(FakeDriver())
+      second = FakeRegisterMap(FakeDriver())
+      self.assertIs(first.table_, second.table_)
+      self.assertIs(first.attributes_, second.attributes_)
+
+   def testLazyMaterialization(self):
+      regs = FakeRegisterMap(FakeDriver())
+      self.assertFalse(regs.materialized_)
+      self.assertEqual(regs.revision(), 42)
+      self.assertEqual(len(regs.materialized_), 1)
+      self.assertIn('revision', regs.__dict__)
+      self.assertEqual(len(regs.registers_), len(regs.table_.registers))
+
+   def testOffset(self):
+      driver = FakeDriver()
+      regs = FakeRegisterMap(driver, offset=0x50)
+      self.assertEqual(regs.revision(), 44)
+      self.assertEqual(FakeRegisterMap(driver).revision(), 42)
+
+   def testInstanceState(self):
+      driver = FakeDriver()
+      first = FakeRegisterMap(driver)
+      second = FakeRegisterMap(driver)
+      first.scratchpad(3)
+      self.assertIsNot(first.registers_[0], second.registers_[0])
+      self.assertEqual(second.scratchpad(), 3)
+
+   def testRegisterNamedAsAttribute(self):
+      driver = FakeDriver()
+      regs = FakeNamedRegisterMap(driver)
+      self.assertEqual(regs.revision(), 42)
+      child = FakeNamedChildRegisterMap(driver)
+      self.assertEqual(child.revision(), 42)
+      self.assertEqual(child.writeOk(), 0)
+      self.assertEqual(len(child.table_.registers), 3)
+
+   def testDroppedField(self):
+      driver = FakeDriver()
+      parent = FakeParentRegisterMap(driver)
+      self.assertTrue(hasattr(parent, 'powerCycleOnSeu'))
+      child = FakeDroppedFieldRegisterMap(driver)
+      self.assertFalse(hasattr(child, 'powerCycleOnSeu'))
+      self.assertEqual(child.writeOk(), 0)
+      self.assertEqual(parent.powerCycleOnSeu(), 0)
+
+class CachedFakeDriver(FakeDriver):
+   def __init__(self):
+      super().__init__()
+      self.readCacheStats = ReadCacheStats()
+      self.reads = 0
+
+   def read(self, reg):
+      self.reads += 1
+      return super().read(reg)
+
+class CachedRegisterTest(unittest.TestCase):
+   def setUp(self):
+      self.patcher = patch.object(Config(), 'read_cache_freshness',
+                                  {'register': '10s'})
+      self.patcher.start()
+      self.driver = CachedFakeDriver()
+      self.regs = FakeRegisterMap(self.driver)
+
+   def tearDown(self):
+      self.patcher.stop()
+
+   def testCachedRead(self):
+      self.assertEqual(self.regs.revision(), 42)
+      self.driver.regmap[0x01] = 43
+      self.assertEqual(self.regs.revision(), 42)
+      self.assertEqual(self.driver.reads, 1)
+      self.assertEqual(self.driver.readCacheStats.hits['register'], 1)
+
+   def testWriteInvalidates(self):
+      self.assertEqual(self.regs.scratchpad(), 0)
+      self.regs.bit3(1)
+      self.assertEqual(self.regs.scratchpad(), 1 << 3)
+      self.assertEqual(self.regs.bit3(), 1)
+
+   def testClearOnReadNotCached(self):
+      self.driver.regmap[0x06] = 0b01
+      self.assertEqual(self.regs.clear0(), 1)
+      self.assertEqual(self.regs.clear0(), 0)
+
+class CountingFakeDriver(FakeDriver):
+   def __init__(self):
+      super().__init__()
+      self.reads = []
+      self.writes = []
+
+   def read(self, reg):
+      self.reads.append(reg)
+      return super().read(reg)
+
+   def write(self, reg, value):
+      self.writes.append((reg, value))
+      return super().write(reg, value)
+
+class RegisterUpdateTest(unittest.TestCase):
+   def setUp(self):
+      self.driver = CountingFakeDriver()
+      self.regs = FakeRegisterMap(self.driver)
+
+   def testUpdateSingleWrite(self):
+      self.driver.regmap[0x09] = 0b10000000
+      reg = self.regs.range03.__self__.parent
+      reg.update(range03=0b1010, range56=0b01)
+      self.assertEqual(self.driver.reads, [0x09])
+      self.assertEqual(self.driver.writes, [(0x09, 0b11001010)])
+      self.assertEqual(self.regs.range03(), 0b1010)
+      self.assertEqual(self.regs.range56(), 0b01)
+
+   def testUpdateUnknownField(self):
+      reg = self.regs.range03.__self__.parent
+      with self.assertRaises(ValueError):
+         reg.update(bit3=1)
+
+   def testUpdateReadOnlyField(self):
+      reg = self.regs.writeOk.__self__.parent
+      with self.assertRaises(AssertionError):
+         reg.update(writeOk=1, failWrite=1)
+
+   def testTransaction(self):
+      with self.regs.transaction() as tx:
+         tx.writeOk(1)
+         tx.range03(0b11)
+         tx.range56(0b11)
+         self.assertEqual(self.driver.writes, [])
+      self.assertEqual(self.driver.reads, [0x02, 0x09])
+      self.assertEqual(self.driver.writes, [(0x02, 0b1), (0x09, 0b11)])
+
+   def testTransactionWholeRegister(self):
+      with self.regs.transaction() as tx:
+         tx.scratchpad(0xf0)
+         tx.bit3(1)
+      self.assertEqual(self.driver.reads, [])
+      self.assertEqual(self.driver.writes, [(0x05, 0xf8)])
+
+   def testTransactionSetClear(self):
+      self.regs.interrupt1(1)
+      self.driver.writes = []
+      with self.regs.transaction() as tx:
+         tx.interrupt0(1)
+         tx.interrupt1(0)
+      self.assertEqual(self.driver.writes, [(0x07, 0b01), (0x08, 0b10)])
+      self.assertEqual(self.regs.interrupt0(), 1)
+      self.assertEqual(self.regs.interrupt1(), 0)
+
+   def testTransactionAborted(self):
+      with self.assertRaises(RuntimeError):
+         with self.regs.transaction() as tx:
+            tx.writeOk(1)
+            raise RuntimeError()
+      self.assertEqual(self.driver.writes, [])
+
+   def testTransactionLock(self):
+      with tempfile.NamedTemporaryFile() as f:
+         with self.regs.transaction(lock=f.name) as tx:
+            tx.writeOk(1)
+      self.assertEqual(self.driver.writes, [(0x02, 0b1)])
+
+class RangeFakeDriver(FakeDriver):
+   REGISTER_STRIDE = 1
+   SUPPORTS_BLOCK_READ = True
+
+   def __init__(self):
+      super().__init__()
+      self.reads = 0
+      self.ranges = []
+
+   def read(self, reg):
+      self.reads += 1
+      return super().read(reg)
+
+   def readRange(self, reg, count):
+      self.ranges.append((reg, count))
+      return [self.regmap.get(reg + i, 0) for i in range(count)]
+
+def mock_inSimulation():
+   return False
+
+@patch('arista.core.utils.inSimulation', mock_inSimulation)
+class RegisterSnapshotTest(unittest.TestCase):
+   def setUp(self):
+      self.driver = RangeFakeDriver()
+      self.regs = FakeRegisterMap(self.driver)
+
+   def testGroupRanges(self):
+      with self.regs.snapshot():
+         pass
+      # 0x06 (clear on read) and the register array are not part of it
+      self.assertEqual(self.driver.ranges, [(0x01, 5), (0x07, 1), (0x09, 1)])
+
+   def testDecodeFromSnapshot(self):
+      with self.regs.snapshot():
+         self.assertEqual(self.regs.revision(), 42)
+         self.assertEqual(self.regs.shouldBeZero(), 0)
+         self.assertEqual(self.regs.shouldBeOne(), 1)
+         self.assertEqual(self.regs.invertOne(), 0)
+         self.driver.regmap[0x01] = 43
+         self.assertEqual(self.regs.revision(), 42)
+      self.assertEqual(self.driver.reads, 0)
+      self.assertEqual(self.regs.revision(), 43)
+
+   def testWriteWithinSnapshot(self):
+      with self.regs.snapshot():
+         self.regs.bit3(1)
+         self.assertEqual(self.regs.scratchpad(), 1 << 3)
+      self.assertEqual(self.regs.scratchpad(), 1 << 3)
+
+   def testRangeFailure(self):
+      def failRange(reg, count):
+         raise IOError(reg, count)
+      self.driver.readRange = failRange
+      with self.regs.snapshot():
+         self.assertEqual(self.regs.revision(), 42)
+      self.assertEqual(self.driver.reads, 1)
+
+   def testNestedSnapshot(self):
+      with self.regs.snapshot():
+         with self.regs.snapshot():
+            self.assertEqual(self.regs.revision(), 42)
+         self.assertEqual(self.regs.revision(), 42)
+      self.assertEqual(self.driver.ranges, [(0x01, 5), (0x07, 1), (0x09, 1)])
+      self.assertEqual(self.driver.reads, 0)
+
+   def testBlockReadNotSupported(self):
+      with patch.object(RangeFakeDriver, 'SUPPORTS_BLOCK_READ', False):
+         with self.regs.snapshot():
+            self.assertEqual(self.regs.revision(), 42)
+      self.assertEqual(self.driver.ranges, [])
+      self.assertEqual(self.driver.reads, 1)
+
 if __name__ == '__main__':
    unittest.main()
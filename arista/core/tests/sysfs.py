@@ -0,0 +1,232 @@
+import errno
+import os
+import shutil
+import tempfile
+
+from ...tests.testing import unittest, patch
+
+from ..config import Config
+from ..driver.kernel import KernelDriver
+from ..driver.kernel.sysfs import SysfsEntry, SysfsEntryInt
+
+def mock_inSimulation():
+   return False
+
+class FakeHwmonDriver(KernelDriver):
+   def __init__(self, path, **kwargs):
+      super().__init__(module='fake', **kwargs)
+      self.path = path
+      self.index = 0
+
+   def getSysfsPath(self):
+      return self.path
+
+   def getHwmonPath(self):
+      if self.hwmonPath is None:
+         self.hwmonPath = os.path.join(self.path, 'hwmon',
+                                       'hwmon%d' % self.index)
+      return self.hwmonPath
+
+class FakeSysfsParent(object):
+   def __init__(self, driver):
+      self.driver = driver
+
+class SysfsTestBase(unittest.TestCase):
+   def setUp(self):
+      self.tmpdir = tempfile.mkdtemp()
+      self.driver = FakeHwmonDriver(self.tmpdir, PASSIVE=True)
+      self.parent = FakeSysfsParent(self.driver)
+      self.createHwmon(0, {'temp1_input': '42000', 'pwm1': '128'})
+
+   def tearDown(self):
+      self.driver.clean()
+      shutil.rmtree(self.tmpdir)
+
+   def createHwmon(self, index, entries):
+      path = os.path.join(self.tmpdir, 'hwmon', 'hwmon%d' % index)
+      os.makedirs(path, exist_ok=True)
+      for name, value in entries.items():
+         self.writeEntry(os.path.join(path, name), value)
+      return path
+
+   def writeEntry(self, path, value):
+      with open(path, 'w') as f:
+         f.write(value)
+
+@patch('arista.core.utils.inSimulation', mock_inSimulation)
+class SysfsEntryTest(SysfsTestBase):
+   def testReadDefault(self):
+      entry = SysfsEntryInt(self.parent, 'temp1_input', persistent=False)
+      self.assertEqual(entry.read(), 42000)
+      self.assertIsNone(entry.fd_)
+
+   def testReadPersistent(self):
+      entry = SysfsEntryInt(self.parent, 'temp1_input', persistent=True)
+      self.assertEqual(entry.read(), 42000)
+      fd = entry.fd_
+      self.assertIsNotNone(fd)
+      self.writeEntry(entry.entryPath, '43000')
+      self.assertEqual(entry.read(), 43000)
+      self.assertEqual(entry.fd_, fd)
+
+   def testWritePersistent(self):
+      entry = SysfsEntryInt(self.parent, 'pwm1', persistent=True)
+      self.assertTrue(entry.write(255))
+      self.assertEqual(entry.read(), 255)
+      self.assertIn(entry, self.driver.sysfsEntries)
+
+   def testReopenAfterRenumbering(self):
+      entry = SysfsEntryInt(self.parent, 'temp1_input', persistent=True)
+      self.assertEqual(entry.read(), 42000)
+      self.driver.index = 1
+      self.createHwmon(1, {'temp1_input': '50000'})
+      shutil.rmtree(os.path.join(self.tmpdir, 'hwmon', 'hwmon0'))
+
+      stale = [False, True]
+      def staleRead(fd, size, offset):
+         if stale.pop():
+            raise OSError(errno.ENODEV, 'No such device')
+         return origPread(fd, size, offset)
+
+      origPread = os.pread
+      with patch('os.pread', staleRead):
+         self.assertEqual(entry.read(), 50000)
+      self.assertIn('hwmon1', entry.entryPath)
+
+   def testCleanClosesDescriptors(self):
+      entries = [
+         SysfsEntry(self.parent, 'temp1_input', persistent=True),
+         SysfsEntry(self.parent, 'pwm1', persistent=True),
+      ]
+      for entry in entries:
+         entry.read()
+      self.driver.clean()
+      for entry in entries:
+         self.assertIsNone(entry.fd_)
+      self.assertFalse(self.driver.sysfsEntries)
+
+@patch('arista.core.utils.inSimulation', mock_inSimulation)
+class HwmonSnapshotTest(SysfsTestBase):
+   def testSnapshotTyped(self):
+      self.writeEntry(os.path.join(self.driver.getHwmonPath(), 'name'), 'fake')
+      snapshot = self.driver.snapshot()
+      self.assertEqual(snapshot['temp1_input'], 42000)
+      self.assertEqual(snapshot['pwm1'], 128)
+      self.assertEqual(snapshot['name'], 'fake')
+      self.assertIsNone(self.driver.snapshot_)
+
+   def testSnapshotServesReads(self):
+      temp = SysfsEntryInt(self.parent, 'temp1_input')
+      missing = SysfsEntryInt(self.parent, 'temp2_input')
+      with self.driver.snapshot():
+         self.writeEntry(temp.entryPath, '50000')
+         self.assertEqual(temp.read(), 42000)
+         self.assertTrue(temp.exists())
+         self.assertFalse(missing.exists())
+      self.assertIsNone(self.driver.snapshot_)
+      self.assertEqual(temp.read(), 50000)
+
+   def testSnapshotWriteInvalidates(self):
+      pwm = SysfsEntryInt(self.parent, 'pwm1')
+      with self.driver.snapshot():
+         self.assertTrue(pwm.write(255))
+         self.assertEqual(pwm.read(), 255)
+
+@patch('arista.core.utils.inSimulation', mock_inSimulation)
+class SysfsReadCacheTest(SysfsTestBase):
+   def setUp(self):
+      super().setUp()
+      self.patcher = patch.object(Config(), 'read_cache_freshness',
+                                  {'temp': '10s', 'default': 0})
+      self.patcher.start()
+
+   def tearDown(self):
+      self.patcher.stop()
+      super().tearDown()
+
+   def testCachedRead(self):
+      temp = SysfsEntryInt(self.parent, 'temp1_input', policy='temp')
+      self.assertEqual(temp.read(), 42000)
+      self.writeEntry(temp.entryPath, '50000')
+      self.assertEqual(temp.read(), 42000)
+      stats = self.driver.readCacheStats
+      self.assertEqual(stats.hits['temp'], 1)
+      self.assertEqual(stats.misses['temp'], 1)
+
+   def testUncachedPolicy(self):
+      pwm = SysfsEntryInt(self.parent, 'pwm1', policy='fan_pwm')
+      self.assertEqual(pwm.read(), 128)
+      self.writeEntry(pwm.entryPath, '255')
+      self.assertEqual(pwm.read(), 255)
+
+   def testWriteInvalidates(self):
+      pwm = SysfsEntryInt(self.parent, 'pwm1', policy='temp')
+      self.assertEqual(pwm.read(), 128)
+      self.assertTrue(pwm.write(255))
+      self.assertEqual(pwm.read(), 255)
+      self.assertEqual(self.driver.readCacheStats.invalidations['temp'], 1)
+
+   def testSamePathShared(self):
+      temp = SysfsEntryInt(self.parent, 'temp1_input', policy='temp')
+      other = SysfsEntryInt(self.parent, 'temp1_input', policy='temp')
+      self.assertEqual(temp.read(), 42000)
+      self.assertEqual(other.read(), 42000)
+      self.assertEqual(self.driver.readCacheStats.misses['temp'], 1)
+      self.assertTrue(other.write(50000))
+      self.assertEqual(temp.read(), 50000)
+
+@patch('arista.core.utils.inSimulation', mock_inSimulation)
+class SysfsWriteShadowTest(SysfsTestBase):
+   def setUp(self):
+      super().setUp()
+      self.patcher = patch.object(Config(), 'write_shadow_refresh', 10.)
+      self.patcher.start()
+
+   def tearDown(self):
+      self.patcher.stop()
+      super().tearDown()
+
+   def testIdenticalWriteSuppressed(self):
+      pwm = SysfsEntryInt(self.parent, 'pwm1', shadow='fan_pwm')
+      self.assertTrue(pwm.write(255))
+      with patch.object(pwm, '_write') as write:
+         self.assertTrue(pwm.write(255))
+         write.assert_not_called()
+      self.assertTrue(pwm.write(128))
+      self.assertEqual(pwm.read(), 128)
+      stats = self.driver.writeShadowStats
+      self.assertEqual(stats.writes['fan_pwm'], 2)
+      self.assertEqual(stats.suppressed['fan_pwm'], 1)
+
+   def testSuppressedWriteNoIo(self):
+      pwm = SysfsEntryInt(self.parent, 'pwm1', shadow='fan_pwm')
+      self.assertTrue(pwm.write(255))
+      with patch('builtins.open') as fopen:
+         self.assertTrue(pwm.write(255))
+         fopen.assert_not_called()
+
+      # an external write is only restored once the refresh interval elapses
+      self.writeEntry(pwm.entryPath, '0')
+      self.assertTrue(pwm.write(255))
+      self.assertEqual(pwm.read(), 0)
+      stats = self.driver.writeShadowStats
+      self.assertEqual(stats.writes['fan_pwm'], 1)
+      self.assertEqual(stats.suppressed['fan_pwm'], 2)
+
+   def testForcedRefresh(self):
+      pwm = SysfsEntryInt(self.parent, 'pwm1', shadow='fan_pwm')
+      self.assertTrue(pwm.write(255))
+      self.writeEntry(pwm.entryPath, '0')
+      with patch.object(pwm.shadow, 'refresh', 0.):
+         self.assertTrue(pwm.write(255))
+      self.assertEqual(pwm.read(), 255)
+
+   def testFailedWriteNotShadowed(self):
+      pwm = SysfsEntryInt(self.parent, 'pwm1', shadow='fan_pwm')
+      with patch.object(pwm, '_write', return_value=False):
+         self.assertFalse(pwm.write(255))
+      self.assertTrue(pwm.write(255))
+      self.assertEqual(pwm.read(), 255)
+
+if __name__ == '__main__':
+   unittest.main()
@@ -0,0 +1,236 @@
+import shutil
+import tempfile
+
+from contextlib import contextmanager
+
+from ...tests.testing import unittest, patch
+
+from ..config import Config
+from ..telemetry import (
+   PowerSampler,
+   PowerTelemetry,
+   TelemetryRail,
+   TelemetrySeries,
+   getTelemetryRails,
+)
+
+class FakeRail(object):
+   def __init__(self, name, driver, voltage):
+      self.name = name
+      self.driver = driver
+      self.voltage = voltage
+      self.reads = 0
+
+   def getName(self):
+      return self.name
+
+   def getVoltage(self):
+      self.reads += 1
+      return self.voltage
+
+   def getCurrent(self):
+      self.reads += 1
+      return 2.
+
+   def getPower(self):
+      self.reads += 1
+      return self.voltage * 2.
+
+class FakeTemp(object):
+   def getName(self):
+      return 'temp1'
+
+   def getTemperature(self):
+      return 42.
+
+class FakeDriver(object):
+   def __init__(self, addr):
+      self.addr = addr
+      self.snapshots = 0
+
+   @contextmanager
+   def snapshot(self):
+      self.snapshots += 1
+      yield
+
+class FakeInventory(object):
+   def __init__(self, rails=None, temps=None, slots=None):
+      self.rails = rails or []
+      self.temps = temps or []
+      self.slots = slots or []
+
+   def getRails(self):
+      return self.rails
+
+   def getTemps(self):
+      return self.temps
+
+   def getFans(self):
+      return []
+
+   def getPsuSlots(self):
+      return self.slots
+
+class FakePsuComponent(object):
+   def __init__(self, driver, inventory):
+      self.driver = driver
+      self.inventory = inventory
+
+   def getInventory(self):
+      return self.inventory
+
+class FakePsu(object):
+   def __init__(self, psu):
+      self.psu = psu
+
+class FakePsuSlot(object):
+   def __init__(self, name, psu):
+      self.name = name
+      self.psu = psu
+
+   def getName(self):
+      return self.name
+
+   def getPsu(self):
+      return self.psu
+
+class FakePlatform(object):
+   def __init__(self, inventory):
+      self.inventory = inventory
+
+   def getInventory(self):
+      return self.inventory
+
+class TelemetrySeriesTest(unittest.TestCase):
+   def testRing(self):
+      series = TelemetrySeries(3)
+      self.assertIsNone(series.summary())
+      for value in (1., 5., 3.):
+         series.append(value)
+      self.assertEqual(list(series.samples()), [1., 5., 3.])
+      series.append(2.)
+      self.assertEqual(len(series), 3)
+      self.assertEqual(list(series.samples()), [5., 3., 2.])
+      self.assertEqual(series.summary(), {
+         'last': 2., 'min': 2., 'max': 5., 'avg': 10. / 3,
+      })
+
+class PowerSamplerTest(unittest.TestCase):
+   def setUp(self):
+      self.tmpdir = tempfile.mkdtemp()
+      self.patchers = [
+         patch.object(Config(), 'tmpfs_path', self.tmpdir),
+         patch.object(Config(), 'power_telemetry_interval', 10.),
+         patch('arista.core.telemetry._telemetry', None),
+      ]
+      for patcher in self.patchers:
+         patcher.start()
+
+      self.psuDriver = FakeDriver('5-0058')
+      self.psuRails = [FakeRail('in', self.psuDriver, 230.),
+                       FakeRail('out', self.psuDriver, 12.)]
+      psu = FakePsuComponent(self.psuDriver,
+                             FakeInventory(rails=self.psuRails,
+                                           temps=[FakeTemp()]))
+      self.vrmDriver = FakeDriver('9-0040')
+      self.vrmRails = [FakeRail('vdd', self.vrmDriver, 0.8),
+                       FakeRail('vddq', self.vrmDriver, 1.2)]
+      self.platform = FakePlatform(FakeInventory(
+         rails=self.vrmRails,
+         slots=[FakePsuSlot('psu1', FakePsu(psu)),
+                FakePsuSlot('psu2', None)],
+      ))
+
+   def tearDown(self):
+      for patcher in reversed(self.patchers):
+         patcher.stop()
+      shutil.rmtree(self.tmpdir)
+
+   def testSample(self):
+      sampler = PowerSampler(self.platform, size=4)
+      self.assertEqual([s.name for s in sampler.sources()], ['psu1', '9-0040'])
+      sampler.sample()
+      self.psuRails[1].voltage = 11.
+      sampler.sample()
+      self.assertEqual(self.psuDriver.snapshots, 2)
+      self.assertEqual(self.vrmDriver.snapshots, 2)
+      summary = sampler.summary()
+      self.assertEqual(summary['psu1']['out']['voltage'], {
+         'last': 11., 'min': 11., 'max': 12., 'avg': 11.5,
+      })
+      self.assertEqual(summary['psu1']['temp1']['temperature']['last'], 42.)
+      self.assertEqual(summary['9-0040']['vddq']['power']['last'], 2.4)
+
+   def testServeRails(self):
+      PowerSampler(self.platform).run()
+      telemetry = PowerTelemetry.load()
+      self.assertEqual(telemetry.get('psu1', 'in', 'voltage'), 230.)
+
+      rails = getTelemetryRails('psu1', self.psuRails)
+      self.assertTrue(all(isinstance(r, TelemetryRail) for r in rails))
+      reads = self.psuRails[0].reads
+      self.assertEqual(rails[0].getVoltage(), 230.)
+      self.assertEqual(rails[0].getPower(), 460.)
+      self.assertEqual(self.psuRails[0].reads, reads)
+      self.assertIs(rails[0].driver, self.psuDriver)
+
+      # unknown rails are read from the hardware
+      rail = getTelemetryRails('psu2', self.psuRails)[0]
+      self.assertEqual(rail.getVoltage(), 230.)
+      self.assertEqual(self.psuRails[0].reads, reads + 1)
+
+   def testStale(self):
+      sampler = PowerSampler(self.platform)
+      sampler.run()
+      with patch('arista.core.telemetry.monotonicRaw',
+                 return_value=sampler.timestamp + 31.):
+         self.assertIsNone(PowerTelemetry.load())
+
+   def testStaleSource(self):
+      sampler = PowerSampler(self.platform)
+      sampler.run()
+      telemetry = PowerTelemetry.load()
+      with patch('arista.core.telemetry.monotonicRaw',
+                 return_value=sampler.timestamps['psu1'] + 31.):
+         self.assertIsNone(telemetry.get('psu1', 'in', 'voltage'))
+         rail = TelemetryRail(telemetry, 'psu1', self.psuRails[0])
+         reads = self.psuRails[0].reads
+         self.assertEqual(rail.getVoltage(), 230.)
+         self.assertEqual(self.psuRails[0].reads, reads + 1)
+
+   def testPsuRemoved(self):
+      sampler = PowerSampler(self.platform, size=4)
+      sampler.sample()
+      self.assertIn('psu1', sampler.summary())
+      self.platform.inventory.slots[0].psu = None
+      sampler.sample()
+      self.assertEqual([s.name for s in sampler.sources()], ['9-0040'])
+      self.assertNotIn('psu1', sampler.summary())
+      self.assertNotIn('psu1', sampler.timestamps)
+
+   def testPsuInserted(self):
+      psu = self.platform.inventory.slots[0].psu
+      self.platform.inventory.slots[0].psu = None
+      sampler = PowerSampler(self.platform, size=4)
+      sampler.sample()
+      self.assertNotIn('psu1', sampler.summary())
+      self.platform.inventory.slots[0].psu = psu
+      sampler.sample()
+      self.assertEqual(sampler.summary()['psu1']['in']['voltage']['last'], 230.)
+
+   def testFailedSourceDropped(self):
+      sampler = PowerSampler(self.platform, size=4)
+      sampler.sample()
+      self.assertIn('9-0040', sampler.summary())
+      with patch.object(FakeRail, 'getVoltage', side_effect=IOError()):
+         sampler.sample()
+      self.assertEqual(sampler.summary(), {})
+      self.assertEqual(sampler.timestamps, {})
+
+   def testDisabled(self):
+      PowerSampler(self.platform).run()
+      with patch.object(Config(), 'power_telemetry_interval', None):
+         self.assertIs(getTelemetryRails('psu1', self.psuRails), self.psuRails)
+
+if __name__ == '__main__':
+   unittest.main()
@@ -10,9 +10,20 @@ try:
 except ImportError:
    import mock
 
-from ...tests.testing import unittest
-
-from ..utils import FileResource, MmapResource, ResourceAccessor, StoredData
+from ...tests.testing import unittest, patch
+
+from ..driver.kernel.pci import PciKernelDriver
+from ..driver.user.i2c import I2cDevDriver
+from ..types import I2cAddr
+from ..utils import (
+   FileResource,
+   MmapPool,
+   MmapResource,
+   PooledMmapResource,
+   ResourceAccessor,
+   SMBusPool,
+   StoredData,
+)
 
 class ResourceTestBase(object):
    class TestClass(unittest.TestCase):
@@ -122,9 +133,153 @@ class FileResourceTest(ResourceTestBase.TestClass):
          res.write32(0x7, 125)
          self.assertEqual(offset, res.file_.tell())
 
+   def testReadBlock(self):
+      with self.CLASS_TO_TEST(self.tempFile.name) as res:
+         self.assertEqual(res.readBlock(2, 5), self.TEST_DATA[2:7])
+         self.assertEqual(res.read32Range(0, 2),
+                          list(unpack('<2L', self.TEST_DATA[:8])))
+
+   def testReadMany(self):
+      regions = [(8, 2), (0, 4), (4, 2), (12, 2)]
+      with self.CLASS_TO_TEST(self.tempFile.name) as res:
+         self.assertEqual(res.readMany(regions),
+                          [self.TEST_DATA[a:a + s] for a, s in regions])
+
+   def testReadManyWithoutPreadv(self):
+      regions = [(0, 4), (4, 4)]
+      with patch.object(os, 'preadv', None):
+         with self.CLASS_TO_TEST(self.tempFile.name) as res:
+            self.assertEqual(res.readMany(regions),
+                             [self.TEST_DATA[0:4], self.TEST_DATA[4:8]])
+
+   def testReadManyShortRead(self):
+      with self.CLASS_TO_TEST(self.tempFile.name) as res:
+         with self.assertRaises(IOError):
+            res.readMany([(len(self.TEST_DATA) - 2, 4)])
+
 class MmapResourceTest(ResourceTestBase.TestClass):
    CLASS_TO_TEST = MmapResource
 
+class PooledMmapResourceTest(ResourceTestBase.TestClass):
+   CLASS_TO_TEST = PooledMmapResource
+
+   def testMappingKept(self):
+      res = self.CLASS_TO_TEST(self.tempFile.name)
+      with res:
+         mapping = res.mmap_
+      with res:
+         self.assertIs(res.mmap_, mapping)
+      res.unmap()
+      self.assertIsNone(res.mmap_)
+
+class MmapPoolTest(unittest.TestCase):
+   def setUp(self):
+      self.tempFile = tempfile.NamedTemporaryFile()
+      self.tempFile.write(b'ABCDEFG1234567')
+      self.tempFile.flush()
+      self.pool = MmapPool()
+
+   def testSharedByPath(self):
+      path = self.tempFile.name
+      res = self.pool.acquire(path)
+      self.assertIs(self.pool.acquire(path), res)
+      self.assertEqual(self.pool.refcount(path), 2)
+      with res as mm:
+         self.assertEqual(mm.read8(0), ord('A'))
+
+      self.pool.release(path)
+      self.assertIsNotNone(res.mmap_)
+      self.pool.release(path)
+      self.assertIsNone(res.mmap_)
+      self.assertEqual(self.pool.refcount(path), 0)
+      self.assertIsNot(self.pool.acquire(path), res)
+
+   def _driverMmap(self, pooled):
+      addr = mock.Mock()
+      addr.getSysfsPath.return_value = os.path.dirname(self.tempFile.name)
+      driver = PciKernelDriver(addr=addr, pooledMmap=pooled)
+      with patch.object(os.path, 'join', return_value=self.tempFile.name), \
+           patch('arista.core.driver.kernel.pci.getMmapPool',
+                 return_value=self.pool):
+         mmap = driver.mmap
+         self.assertEqual(mmap.read8(0), ord('A'))
+         self.assertEqual(self.pool.refcount(self.tempFile.name),
+                          1 if pooled else 0)
+         driver.clean()
+      self.assertIsNone(mmap.mmap_)
+
+   def testPooledDriver(self):
+      self._driverMmap(True)
+
+   def testUnpooledDriver(self):
+      self._driverMmap(False)
+
+class FakeSMBus(object):
+   instances = []
+
+   def __init__(self, bus):
+      self.bus = bus
+      self.closed = False
+      FakeSMBus.instances.append(self)
+
+   def read_byte(self, addr):
+      return addr
+
+   def close(self):
+      self.closed = True
+
+@patch('arista.core.utils.SMBus', FakeSMBus)
+class SMBusPoolTest(unittest.TestCase):
+   def setUp(self):
+      FakeSMBus.instances = []
+      self.pool = SMBusPool()
+
+   def testSharedByBus(self):
+      handle = self.pool.acquire(3)
+      self.assertIs(self.pool.acquire(3), handle)
+      self.assertIsNot(self.pool.acquire(4), handle)
+      self.assertEqual(self.pool.refcount(3), 2)
+      self.assertEqual(handle.read_byte(0x50), 0x50)
+      handle.close()
+      self.assertEqual(handle.read_byte(0x51), 0x51)
+      self.assertEqual(len(FakeSMBus.instances), 1)
+
+      self.pool.release(3)
+      self.assertFalse(FakeSMBus.instances[0].closed)
+      self.pool.release(3)
+      self.assertTrue(FakeSMBus.instances[0].closed)
+      self.assertEqual(self.pool.refcount(3), 0)
+      self.assertIsNot(self.pool.acquire(3), handle)
+
+   def testHandleContext(self):
+      with self.pool.handle(3) as handle:
+         self.assertEqual(handle.read_byte(0x50), 0x50)
+         with self.pool.handle(3) as other:
+            self.assertIs(other, handle)
+      self.assertEqual(self.pool.refcount(3), 0)
+      self.assertTrue(FakeSMBus.instances[0].closed)
+
+   def testCloseAll(self):
+      for bus in (1, 2):
+         self.pool.acquire(bus).read_byte(0x50)
+      self.pool.closeAll()
+      self.assertTrue(all(bus.closed for bus in FakeSMBus.instances))
+      self.assertEqual(self.pool.refcount(1), 0)
+
+   def testSharedRdwrDevice(self):
+      drivers = [I2cDevDriver(addr=I2cAddr(3, addr)) for addr in (0x50, 0x58)]
+      with patch('arista.core.utils._smbusPool', self.pool), \
+           patch('builtins.open') as fopen:
+         devices = [driver.msg.device for driver in drivers]
+         self.assertIs(devices[0], devices[1])
+         fopen.assert_called_once_with('/dev/i2c-3', 'r+b', buffering=0)
+
+         drivers[0].close()
+         devices[0].close.assert_not_called()
+         drivers[1].close()
+         devices[0].close.assert_called_once_with()
+      self.assertEqual(self.pool.refcount(3), 0)
+
 class StoredDataTest(unittest.TestCase):
    def setUp(self):
       self.tempDir = tempfile.mkdtemp(prefix='unittest-arista-storeddata-')
@@ -4,9 +4,11 @@ import json
 import mmap
 import os
 import re
+import threading
 import time
 import tempfile
 
+from contextlib import contextmanager
 from datetime import datetime
 from functools import wraps
 from struct import pack, unpack
@@ -75,6 +77,18 @@ class ResourceAccessor():
    def write8(self, addr, value):
       self._doWrite(addr, 1, value, 'B')
 
+   def readBlock(self, addr, size):
+      data = self.readResource(addr, size)
+      logging.io('%s.readBlock(%#x, %d)', self, addr, size)
+      return data
+
+   def readMany(self, regions):
+      '''Read a list of (addr, size) regions, returns the data of each'''
+      return [self.readBlock(addr, size) for addr, size in regions]
+
+   def read32Range(self, addr, count):
+      return list(unpack('<%dL' % count, self.readBlock(addr, count * 4)))
+
 class MmapResource(ResourceAccessor):
    """Resource implementation for a directly-mapped memory region."""
    def __init__(self, *args, **kwargs):
@@ -128,6 +142,163 @@ class MmapResource(ResourceAccessor):
    def writeResource(self, addr, size, value):
       self.mmap_[addr: addr + size] = value
 
+class PooledMmapResource(MmapResource):
+   """Long lived mapping, only unmapped when released from the MmapPool."""
+   def __init__(self, *args, **kwargs):
+      super().__init__(*args, **kwargs)
+      self.lock_ = threading.Lock()
+
+   def openResource(self):
+      with self.lock_:
+         if self.mmap_:
+            return True
+         return self.map()
+
+   def closeResource(self):
+      # the mapping is kept around until the pool releases it
+      pass
+
+   def unmap(self):
+      with self.lock_:
+         super().closeResource()
+
+class MmapPool():
+   """Process-wide pool of memory mappings shared by path and refcounted."""
+   def __init__(self):
+      self.lock_ = threading.Lock()
+      self.resources_ = {}
+      self.refcounts_ = {}
+
+   def acquire(self, path):
+      with self.lock_:
+         resource = self.resources_.get(path)
+         if resource is None:
+            resource = PooledMmapResource(path)
+            self.resources_[path] = resource
+            self.refcounts_[path] = 0
+         self.refcounts_[path] += 1
+         return resource
+
+   def release(self, path):
+      with self.lock_:
+         count = self.refcounts_.get(path, 0)
+         if count > 1:
+            self.refcounts_[path] = count - 1
+            return
+         resource = self.resources_.pop(path, None)
+         self.refcounts_.pop(path, None)
+      if resource is not None:
+         logging.debug('unmapping %s', resource)
+         resource.unmap()
+
+   def refcount(self, path):
+      return self.refcounts_.get(path, 0)
+
+_mmapPool = MmapPool()
+def getMmapPool():
+   return _mmapPool
+
+class PooledSMBus():
+   """SMBus handle shared by all the users of a bus.
+
+   Every call is serialized since the slave address is configured on the
+   file descriptor before each transfer. The I2C_RDWR transfers carry their
+   slave address and share another device file of the bus.
+   """
+   def __init__(self, bus):
+      self.bus = bus
+      self.lock_ = threading.RLock()
+      self.smbus_ = None
+      self.device_ = None
+
+   def __str__(self):
+      return '%s(%d)' % (self.__class__.__name__, self.bus)
+
+   def _handle(self):
+      if self.smbus_ is None:
+         self.smbus_ = SMBus(self.bus)
+      return self.smbus_
+
+   def __getattr__(self, name):
+      if name.startswith('_'):
+         raise AttributeError(name)
+      def locked(*args, **kwargs):
+         with self.lock_:
+            return getattr(self._handle(), name)(*args, **kwargs)
+      return locked
+
+   def rdwrDevice(self):
+      with self.lock_:
+         if self.device_ is None:
+            # pylint: disable=consider-using-with
+            self.device_ = open('/dev/i2c-%d' % self.bus, 'r+b', buffering=0)
+         return self.device_
+
+   def close(self):
+      # the handle is owned by the pool, see SMBusPool.release
+      pass
+
+   def shutdown(self):
+      with self.lock_:
+         if self.smbus_ is not None:
+            self.smbus_.close()
+            self.smbus_ = None
+         if self.device_ is not None:
+            self.device_.close()
+            self.device_ = None
+
+class SMBusPool():
+   """Process-wide pool of SMBus handles shared by bus and refcounted."""
+   def __init__(self):
+      self.lock_ = threading.Lock()
+      self.handles_ = {}
+      self.refcounts_ = {}
+
+   def acquire(self, bus):
+      with self.lock_:
+         handle = self.handles_.get(bus)
+         if handle is None:
+            handle = PooledSMBus(bus)
+            self.handles_[bus] = handle
+            self.refcounts_[bus] = 0
+         self.refcounts_[bus] += 1
+         return handle
+
+   def release(self, bus):
+      with self.lock_:
+         count = self.refcounts_.get(bus, 0)
+         if count > 1:
+            self.refcounts_[bus] = count - 1
+            return
+         handle = self.handles_.pop(bus, None)
+         self.refcounts_.pop(bus, None)
+      if handle is not None:
+         logging.debug('closing %s', handle)
+         handle.shutdown()
+
+   @contextmanager
+   def handle(self, bus):
+      handle = self.acquire(bus)
+      try:
+         yield handle
+      finally:
+         self.release(bus)
+
+   def refcount(self, bus):
+      return self.refcounts_.get(bus, 0)
+
+   def closeAll(self):
+      with self.lock_:
+         handles = list(self.handles_.values())
+         self.handles_.clear()
+         self.refcounts_.clear()
+      for handle in handles:
+         handle.shutdown()
+
+_smbusPool = SMBusPool()
+def getSMBusPool():
+   return _smbusPool
+
 class FileResource(ResourceAccessor):
    ''' Resource implementation for a file base memory region. '''
    def __init__(self, *args, **kwargs):
@@ -137,7 +308,8 @@ class FileResource(ResourceAccessor):
    def openResource(self):
       assert not self.file_, 'Resource already opened'
       try:
-         self.file_ = open(self.path_, mode='rb+')
+         # unbuffered, all accesses are positional via pread/pwrite
+         self.file_ = open(self.path_, mode='rb+', buffering=0)
       except IOError:
          logging.error("failed to open file %s", self.path_)
          return False
@@ -149,19 +321,47 @@ class FileResource(ResourceAccessor):
          self.file_ = None
 
    def readResource(self, addr, size):
-      # In python3 there's os.pread()
-      p = self.file_.tell()
-      self.file_.seek(addr, os.SEEK_SET)
-      v = self.file_.read(size)
-      self.file_.seek(p, os.SEEK_SET)
-      return v
+      return os.pread(self.file_.fileno(), size, addr)
 
    def writeResource(self, addr, size, value):
-      # In python3 there's os.pwrite()
-      p = self.file_.tell()
-      self.file_.seek(addr, os.SEEK_SET)
-      self.file_.write(value)
-      self.file_.seek(p, os.SEEK_SET)
+      os.pwrite(self.file_.fileno(), value, addr)
+
+   def _readVector(self, addr, buffers):
+      fd = self.file_.fileno()
+      size = sum(len(b) for b in buffers)
+      preadv = getattr(os, 'preadv', None)
+      if preadv is not None:
+         count = preadv(fd, buffers, addr)
+      else:
+         data = os.pread(fd, size, addr)
+         count = len(data)
+         offset = 0
+         for buf in buffers:
+            buf[:] = data[offset:offset + len(buf)].ljust(len(buf), b'\0')
+            offset += len(buf)
+      if count != size:
+         raise IOError('short read on %s at %#x: %d/%d' % (self, addr, count, size))
+
+   def readMany(self, regions):
+      # adjacent regions are read with a single vectored read
+      runs = []
+      for idx in sorted(range(len(regions)), key=lambda i: regions[i][0]):
+         addr, size = regions[idx]
+         if runs and runs[-1][0] + runs[-1][1] == addr:
+            runs[-1][1] += size
+            runs[-1][2].append(idx)
+         else:
+            runs.append([addr, size, [idx]])
+
+      res = [None] * len(regions)
+      for addr, _, indexes in runs:
+         buffers = [bytearray(regions[i][1]) for i in indexes]
+         self._readVector(addr, buffers)
+         logging.io('%s.readMany(%#x, [%s])', self, addr,
+                    ', '.join(str(len(b)) for b in buffers))
+         for i, buf in zip(indexes, buffers):
+            res[i] = bytes(buf)
+      return res
 
 def sysfsFmtHex(x):
    return "0x%08x" % x
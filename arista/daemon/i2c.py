@@ -0,0 +1,29 @@
+
+from ..core.daemon import registerDaemonFeature, PollDaemonFeature
+from ..core.log import getLogger
+from ..core.metrics import getI2cStats
+from ..core.utils import JsonStoredData
+
+logging = getLogger(__name__)
+
+@registerDaemonFeature()
+class I2cStatsFeature(PollDaemonFeature):
+
+   NAME = 'i2cstats'
+   INTERVAL = 5 * 60
+   DELAY = 60
+   STATS_FILE = 'i2c_stats.json'
+   SLOWEST = 5
+
+   @classmethod
+   def runnable(cls, daemon):
+      return getI2cStats().enabled
+
+   def callback(self, elapsed):
+      stats = getI2cStats()
+      JsonStoredData(self.STATS_FILE).write(stats.__diag__(None), mode='w+')
+      for (bus, addr, op), opStats in stats.slowest(self.SLOWEST):
+         logging.debug('%s: bus %d addr %#04x %s: count=%d errors=%d '
+                       'p99=%sus max=%sus', self, bus, addr, op, opStats.count,
+                       opStats.errors, opStats.latency.percentile(99),
+                       opStats.latency.max)
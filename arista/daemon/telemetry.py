@@ -0,0 +1,27 @@
+
+from ..core.config import Config
+from ..core.daemon import registerDaemonFeature, PollDaemonFeature
+from ..core.log import getLogger
+from ..core.telemetry import PowerSampler
+
+logging = getLogger(__name__)
+
+@registerDaemonFeature()
+class PowerTelemetryFeature(PollDaemonFeature):
+
+   NAME = 'telemetry'
+
+   @classmethod
+   def runnable(cls, daemon):
+      return bool(Config().power_telemetry_interval)
+
+   def init(self):
+      # pylint: disable=attribute-defined-outside-init
+      self.INTERVAL = Config().power_telemetry_interval
+      self.sampler = PowerSampler(self.daemon.platform, interval=self.INTERVAL)
+      logging.info('%s: sampling %d power sources every %ss', self,
+                   len(self.sampler.sources()), self.INTERVAL)
+      super().init()
+
+   def callback(self, elapsed):
+      self.sampler.run()
@@ -2,4 +2,4 @@
 from ..core.driver.user.i2c import I2cDevDriver
 
 class SysCpldI2cDriver(I2cDevDriver):
-   pass
+   SUPPORTS_BLOCK_READ = True
@@ -1,4 +1,5 @@
 
+from array import array
 import datetime
 import struct
 
@@ -12,6 +13,11 @@ from .pmbus import PmbusUserDriver
 
 logging = getLogger(__name__)
 
+BLACKBOX_RECORD_SIZE = 64
+# uid, empty, action, rule, vhx, current, last, vp_ov, vp_uv, gpio_in,
+# gpio_out, pdio_in, pdio_out, powerup, timestamp, crc
+BLACKBOX_RECORD = struct.Struct('<HBBBBHHHHHHHHH8s31xB')
+
 def cyclicRange(start, size):
    if start > size:
       return
@@ -99,6 +105,25 @@ class Adm1266Fault(object):
    def summary(self):
       return ' '.join('%s=%s' % (k, v) for k, v in self.data().items() if v)
 
+def gpioPinTables(mapping):
+   '''Lookup tables remapping each byte of a gpio bitfield to pin numbers'''
+   tables = []
+   for shift in (0, 8):
+      table = array('H', [0] * 256)
+      for value in range(256):
+         for bit in bitOffsets(value):
+            pin = mapping[bit + shift]
+            if pin is not None:
+               table[value] |= 1 << (pin - 1)
+      tables.append(table)
+   return tables
+
+GPIO_PIN_TABLES = gpioPinTables(Adm1266Fault.GPIO_MAP)
+
+def gpioPins(bits):
+   '''Gpio bitfield as a mask of pins, with bit n - 1 set for pin n'''
+   return GPIO_PIN_TABLES[0][bits & 0xff] | GPIO_PIN_TABLES[1][bits >> 8]
+
 class Adm1266UserDriver(PmbusUserDriver):
 
    def getBlackboxInfo(self):
@@ -130,26 +155,41 @@ class Adm1266UserDriver(PmbusUserDriver):
       fw = self.getUserDataStr()
       return "%s %s %s %s %s" % (model, version, date, serial, fw)
 
-   def getBlackboxFault(self, index):
-      data = self.read_bytes([self.registers.READ_BLACKBOX, 1, index], 65)[1:]
-      logging.debug('%s: fault %d: %s', self, index,
-                    ' '.join('%02x' % s for s in data))
+   def readBlackboxRecord(self, index):
+      return self.readBlackboxRecords([index])[0]
+
+   def readBlackboxRecords(self, indexes):
+      '''Read the blackbox records in as few I2C transfers as possible'''
+      indexes = list(indexes)
+      reg = self.registers.READ_BLACKBOX
+      records = self.readBytesMany(
+         ([reg, 1, index], BLACKBOX_RECORD_SIZE + 1) for index in indexes)
+      records = [data[1:] for data in records]
+      for index, data in zip(indexes, records):
+         logging.debug('%s: fault %d: %s', self, index,
+                       ' '.join('%02x' % s for s in data))
+      return records
+
+   @staticmethod
+   def parseBlackboxRecords(records):
+      '''Decode the records from a single buffer of the whole dump'''
+      view = memoryview(b''.join(bytes(data) for data in records))
+      return [Adm1266Fault(data, *fields) for data, fields
+              in zip(records, BLACKBOX_RECORD.iter_unpack(view))]
+
+   @staticmethod
+   def parseBlackboxRecord(data):
+      return Adm1266UserDriver.parseBlackboxRecords([data])[0]
 
-      fmt = '<HBBBBHHHHHHHHH'
-      attrs = struct.unpack(fmt, bytearray(data[:24]))
-      timestamp = data[24:32]
-      crc = data[-1]
-      return Adm1266Fault(data, *tuple(list(attrs) + [timestamp, crc]))
+   def getBlackboxFault(self, index):
+      return self.parseBlackboxRecord(self.readBlackboxRecord(index))
 
    def getBlackboxFaults(self):
       _, index, count = self.getBlackboxInfo()
       logging.debug('%s: fault info: index=%d count=%d', self, index, count)
-      faults = []
-      for i in reversed(list(cyclicRange(index + 1, count))):
-         fault = self.getBlackboxFault(i)
-         if fault.isValid():
-            faults.append(fault)
-      return faults
+      slots = list(reversed(list(cyclicRange(index + 1, count))))
+      records = self.readBlackboxRecords(slots)
+      return [f for f in self.parseBlackboxRecords(records) if f.isValid()]
 
    def getRealTimeClock(self):
       data = self.read_block_data(self.registers.REAL_TIME_CLOCK)
@@ -1,5 +1,3 @@
-from contextlib import closing
-
 from ..core import utils
 from ..core.log import getLogger
 
@@ -15,7 +13,7 @@ class Ds460KernelDriver(PmbusKernelDriver):
       addr = self.addr.address
 
       logging.debug('%s: initializing registers', self.name)
-      with closing(utils.SMBus(self.addr.bus)) as bus:
+      with utils.getSMBusPool().handle(self.addr.bus) as bus:
          for _ in utils.Retrying(interval=10.0, delay=0.5):
             try:
                bus.read_byte_data(addr, 0x00)
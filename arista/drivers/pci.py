@@ -61,6 +61,10 @@ class AerCapability(RegisterMap):
    )
 
 class PciConfig(object):
+
+   REGISTER_STRIDE = 4
+   SUPPORTS_BLOCK_READ = True
+
    def __init__(self, addr=None):
       self.addr = addr
       self.hdrRegs = PciHeader(self)
@@ -104,6 +108,9 @@ class PciConfig(object):
    def read(self, addr):
       return self.config.read32(addr)
 
+   def readRange(self, addr, count):
+      return self.config.read32Range(addr, count)
+
    def findCapabilityHeader(self, capId):
       '''
       Walk the capability list to search for the capability capId.
@@ -281,7 +281,7 @@ class PlxPex8700I2cDevDriver(PlxPexI2cDevDriver):
 
    def smbusPing(self):
       try:
-         with self:
+         with self, self.presenceProbe():
             v = self.read16(0x0)
             assert v == 0x10b5, \
                "%s: vendor id %#x is not PLX" % (self, v)
@@ -294,8 +294,9 @@ class PlxPex8700I2cDevDriver(PlxPexI2cDevDriver):
       # on transparent downstream ports. If anything, 0x7c would be
       # only (upstream) port 0.
       # (Until then, it does not hurt, writes to 0+0x7c won't latch)
-      self.regs.hotPlugSurprise(True)
-      self.regs.hotPlugCapable(True)
+      with self.regs.transaction() as tx:
+         tx.hotPlugSurprise(True)
+         tx.hotPlugCapable(True)
 
    def disablePort(self, port):
       self.regs.portDisable(self.regs.portDisable() | (1 << port))
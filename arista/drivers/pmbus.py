@@ -2,6 +2,7 @@
 import os
 from enum import IntEnum
 
+from ..core.arbiter import I2cPriority
 from ..core.driver.kernel.i2c import I2cKernelDriver
 from ..core.driver.user.gpio import GpioFuncImpl
 from ..core.driver.user.i2c import I2cDevDriver
@@ -12,11 +13,13 @@ logging = getLogger(__name__)
 class PmbusRegister:
    REGISTER_PREFIX = 'status'
    REGISTER_SUFFIX = ''
+   READ_SIZE = 32
 
    def __init__(self, manager, page=0):
       self.page = page
       self.manager = manager
       self._debugfsPath = None
+      self.fd_ = None
       self.cachedValue = None
 
    def __diag__(self, ctx):
@@ -36,23 +39,35 @@ class PmbusRegister:
             self._debugfsPath = path
       return self._debugfsPath
 
+   def open(self):
+      if self.fd_ is None and self.debugfsPath is not None:
+         self.fd_ = os.open(self.debugfsPath, os.O_RDONLY)
+      return self.fd_
+
+   def close(self):
+      if self.fd_ is not None:
+         try:
+            os.close(self.fd_)
+         except OSError:
+            pass
+         self.fd_ = None
+
    def read(self):
+      # debugfs queries the device again on every read from offset 0
       try:
-         if self.debugfsPath is None:
+         fd = self.open()
+         if fd is None:
             return None
-
-         if os.path.exists(self.debugfsPath):
-            with open(self.debugfsPath, 'r') as f:
-               valueStr = f.read().strip()
-               if valueStr is not None:
-                  self.cachedValue = int(valueStr, 16)
-                  logging.io('%s.read(%s) -> %#x',
-                             self, self.debugfsPath, self.cachedValue)
-                  return self.cachedValue
-         return None
-      except (IOError, OSError) as e:
+         self.cachedValue = int(os.pread(fd, self.READ_SIZE, 0).strip(), 16)
+         logging.io('%s.read(%s) -> %#x',
+                    self, self.debugfsPath, self.cachedValue)
+         return self.cachedValue
+      except (IOError, OSError, ValueError) as e:
          logging.io('%s.read(%s) -> ERROR: %s',
                     self, self.debugfsPath, e)
+         # the entry goes away with the device, look it up again next time
+         self.close()
+         self._debugfsPath = None
          return None
 
    def __eq__(self, other):
@@ -105,6 +120,8 @@ class PmbusStatus:
       self.manager = manager
       self._statusReg = None
       self._cmlReg = None
+      self.status = None
+      self.cml = None
 
    @property
    def statusReg(self):
@@ -118,11 +135,26 @@ class PmbusStatus:
          self._cmlReg = PmbusCmlRegister(self.manager, self.page)
       return self._cmlReg
 
-   def hasPowerLoss(self):
+   def refresh(self):
+      '''Read the status and CML registers, return whether they changed'''
+      if self.statusReg is None:
+         return False
+      previous = (self.status, self.cml)
+      self.status = self.statusReg.read()
+      self.cml = self.cmlReg.read()
+      return (self.status, self.cml) != previous
+
+   def close(self):
+      for reg in (self._statusReg, self._cmlReg):
+         if reg is not None:
+            reg.close()
+
+   def hasPowerLoss(self, refresh=True):
+      '''Check the power loss bits, refresh=False uses the last read value'''
       if self.statusReg is None:
          return None
       mask = self.POWER_LOSS_MASK
-      value = self.statusReg.read()
+      value = self.statusReg.read() if refresh else self.status
       return None if value is None else ((value & mask) != 0)
 
    def __diag__(self, ctx):
@@ -146,6 +178,7 @@ class PmbusStatusManager:
       self.discover()
 
    def discover(self):
+      self.close()
       self.pages.clear()
       self.debugfsDir = None
       try:
@@ -172,14 +205,29 @@ class PmbusStatusManager:
       if not self.pages:
          return None
 
+      for page, pmbusStatus in self.refreshAll().items():
+         logging.debug('%s: page %d status changed to %s, cml %s', self, page,
+                       pmbusStatus.status, pmbusStatus.cml)
+
       for pmbusStatus in self.pages.values():
-         powerLoss = pmbusStatus.hasPowerLoss()
+         powerLoss = pmbusStatus.hasPowerLoss(refresh=False)
          if powerLoss is None:
             return None
          if powerLoss:
             return False
       return True
 
+   def refreshAll(self):
+      '''Read the status of every page, return the pages that changed'''
+      return {
+         page: pmbusStatus for page, pmbusStatus in self.pages.items()
+         if pmbusStatus.refresh()
+      }
+
+   def close(self):
+      for pmbusStatus in self.pages.values():
+         pmbusStatus.close()
+
    def __str__(self):
       return f'{self.__class__.__name__}(pages={len(self.pages)})'
 
@@ -191,6 +239,8 @@ class PmbusStatusManager:
 
 class PsuPmbusDetect(I2cDevDriver):
 
+   I2C_PRIORITY = I2cPriority.PRESENCE
+
    MFR_ID = 0x99
    MFR_MODEL = 0x9a
    MFR_REVISION = 0x9b
@@ -208,7 +258,7 @@ class PsuPmbusDetect(I2cDevDriver):
       for key in ['id', 'model', 'revision', 'location', 'date', 'serial']
    }
 
-   def __init__(self, addr):
+   def __init__(self, addr, prepare=True):
       super(PsuPmbusDetect, self).__init__(name='pmbus-detect', addr=addr)
       self.addr = addr
       self.exists_ = None
@@ -219,7 +269,8 @@ class PsuPmbusDetect(I2cDevDriver):
       self.date_ = None
       self.serial_ = None
 
-      self._prepare()
+      if prepare:
+         self._prepare()
 
    def _prepare(self):
       if not self.exists():
@@ -237,7 +288,8 @@ class PsuPmbusDetect(I2cDevDriver):
 
    def checkId(self):
       try:
-         self.id()
+         with self.presenceProbe():
+            self.id()
          return True
       except IOError:
          return False
@@ -278,7 +330,35 @@ class PsuPmbusDetect(I2cDevDriver):
          self.serial_ = self._tryReadBlockStr(self.MFR_SERIAL)
       return self.serial_
 
+   def _readMfrBlocks(self):
+      '''Read the MFR strings not read yet in a single transfer
+
+      Strings that fail to decode are left alone for the individual accessors
+      to read them with a regular block read.
+      '''
+      fields = [
+         ('id_', self.MFR_ID),
+         ('model_', self.MFR_MODEL),
+         ('revision_', self.MFR_REVISION),
+         ('location_', self.MFR_LOCATION),
+         ('date_', self.MFR_DATE),
+         ('serial_', self.MFR_SERIAL),
+      ]
+      fields = [(attr, reg) for attr, reg in fields
+                if getattr(self, attr) is None]
+      if len(fields) < 2:
+         return
+      try:
+         blocks = self.readMany((reg, self.I2C_BLOCK_MAX + 1)
+                                for _, reg in fields)
+      except IOError:
+         return
+      for (attr, _), data in zip(fields, blocks):
+         if data and data[0] < len(data):
+            setattr(self, attr, ''.join(chr(c) for c in data[1:data[0] + 1]))
+
    def getMfrMetadata(self):
+      self._readMfrBlocks()
       return {
          'id': self.id(),
          'model': self.model(),
@@ -311,6 +391,8 @@ class PmbusKernelDriver(I2cKernelDriver):
       self._statusManager = None
 
    def clean(self):
+      if self._statusManager is not None:
+         self._statusManager.close()
       self._statusManager = None
       super().clean()
 
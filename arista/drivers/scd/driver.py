@@ -214,7 +214,7 @@ class ScdI2cDevDriver(I2cDevDriver):
    @property
    def msgBus(self):
       if not self.msgBus_:
-         self.msgBus_ = I2cMsg(self.addr)
+         self.msgBus_ = I2cMsg(self.addr, pooled=self.bus)
          self.msgBus_.open()
       return self.msgBus_
 
@@ -35,6 +35,10 @@ class ScdStatusChangedRegister(Register):
          field.name = '%sChanged' % field.name
       self.changedRegister = ClearOnReadRegister(addr + 1, fields, **kwargs)
 
+   def attributeNames(self):
+      return super(ScdStatusChangedRegister, self).attributeNames() + \
+             self.changedRegister.attributeNames()
+
    def generateAttributes(self, parent=None):
       attrs = super(ScdStatusChangedRegister, self).generateAttributes(parent)
       attrs.update(self.changedRegister.generateAttributes(parent))
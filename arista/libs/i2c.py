@@ -2,27 +2,112 @@
 import os
 from collections import OrderedDict
 
-_i2cBuses = OrderedDict()
-def getKernelI2cBuses(force=False):
-   if _i2cBuses and not force:
-      return _i2cBuses
-   _i2cBuses.clear()
-   buses = {}
-   root = '/sys/bus/i2c/devices'
-   sysfsBuses = [x for x in os.listdir(root) if x.startswith('i2c-')]
-   for busName in sorted(sysfsBuses, key=lambda x: int(x[4:])):
-      busId = int(busName.replace('i2c-', ''))
-      with open(os.path.join(root, busName, 'name')) as f:
-         buses[busId] = f.read().rstrip()
-   return buses
+from ..core.log import getLogger
+from ..core.utils import JsonStoredData
 
-def i2cBusFromName(name, idx=0, force=False):
-   buses = getKernelI2cBuses(force=force)
-   for busId, busName in buses.items():
-      if name == busName:
-         if idx > 0:
-            idx -= 1
+logging = getLogger(__name__)
+
+class I2cBusIndex(object):
+   '''Map the kernel I2C adapter names to their bus numbers
+
+   Adapters coming and going are detected by listing the i2c-N entries of
+   sysfs along with their inode, which changes when the kernel recreates an
+   entry even under the same bus number since kernfs allocates inode numbers
+   cyclically. Only the name of new entries is read
+   and the index is shared through tmpfs with the other processes.
+   '''
+
+   ROOT = '/sys/bus/i2c/devices'
+   NAME = 'i2c_bus_index.json'
+
+   def __init__(self, root=None, name=None):
+      self.root = root or self.ROOT
+      self.name = name or self.NAME
+      self.store_ = None
+      self.entries = None
+      self.buses = OrderedDict()
+      self.names = {}
+
+   @property
+   def store(self):
+      if self.store_ is None:
+         self.store_ = JsonStoredData(self.name)
+      return self.store_
+
+   def _scan(self):
+      with os.scandir(self.root) as it:
+         return {e.name: e.inode() for e in it if e.name.startswith('i2c-')}
+
+   def _readName(self, entry):
+      with open(os.path.join(self.root, entry, 'name')) as f:
+         return f.read().rstrip()
+
+   def _load(self):
+      try:
+         self.entries = self.store.readOrClear() or {}
+      except Exception as e: # pylint: disable=broad-except
+         logging.debug('failed to load i2c bus index: %s', e)
+         self.entries = {}
+
+   def _save(self):
+      try:
+         self.store.write(self.entries, mode='w+')
+      except Exception as e: # pylint: disable=broad-except
+         logging.debug('failed to save i2c bus index: %s', e)
+
+   def _build(self):
+      self.buses.clear()
+      self.names = {}
+      for entry in sorted(self.entries, key=lambda x: int(x[4:])):
+         busId = int(entry[4:])
+         busName = self.entries[entry][1]
+         self.buses[busId] = busName
+         self.names.setdefault(busName, []).append(busId)
+
+   def refresh(self):
+      '''Bring the index up to date with the adapters currently registered'''
+      if self.entries is None:
+         self._load()
+         self._build()
+
+      current = self._scan()
+      if current == {entry: v[0] for entry, v in self.entries.items()}:
+         return False
+
+      entries = {}
+      for entry, inode in current.items():
+         known = self.entries.get(entry)
+         if known is not None and known[0] == inode:
+            entries[entry] = known
          else:
-            return busId
-   return None
+            entries[entry] = [inode, self._readName(entry)]
+      logging.debug('i2c bus index updated, %d adapters', len(entries))
+      self.entries = entries
+      self._build()
+      self._save()
+      return True
+
+   def getBuses(self, validate=False):
+      if self.entries is None or validate:
+         self.refresh()
+      return self.buses
 
+   def lookup(self, name, idx=0, validate=False):
+      if self.entries is None or validate:
+         self.refresh()
+      buses = self.names.get(name)
+      if buses is None and not validate and self.refresh():
+         buses = self.names.get(name)
+      if buses is None or idx >= len(buses):
+         return None
+      return buses[idx]
+
+_i2cBusIndex = I2cBusIndex()
+def getI2cBusIndex():
+   return _i2cBusIndex
+
+def getKernelI2cBuses(force=False):
+   return getI2cBusIndex().getBuses(validate=force)
+
+def i2cBusFromName(name, idx=0, force=False):
+   return getI2cBusIndex().lookup(name, idx=idx, validate=force)
@@ -0,0 +1,73 @@
+import os
+import shutil
+import tempfile
+
+from ...core.config import Config
+from ...tests.testing import unittest, patch
+from ..i2c import I2cBusIndex
+
+class I2cBusIndexTest(unittest.TestCase):
+   def setUp(self):
+      self.tmpdir = tempfile.mkdtemp()
+      self.root = os.path.join(self.tmpdir, 'devices')
+      self.cachePath = os.path.join(self.tmpdir, 'cache')
+      os.makedirs(self.root)
+      os.makedirs(self.cachePath)
+      self.patcher = patch.object(Config(), 'tmpfs_path', self.cachePath)
+      self.patcher.start()
+      for busId, name in [(0, 'SMBus I801'), (2, 'SCD master 0'),
+                          (10, 'SCD master 0')]:
+         self.addAdapter(busId, name)
+
+   def tearDown(self):
+      self.patcher.stop()
+      shutil.rmtree(self.tmpdir)
+
+   def addAdapter(self, busId, name):
+      path = os.path.join(self.root, 'i2c-%d' % busId)
+      os.makedirs(path)
+      with open(os.path.join(path, 'name'), 'w') as f:
+         f.write(name + '\n')
+
+   def removeAdapter(self, busId):
+      shutil.rmtree(os.path.join(self.root, 'i2c-%d' % busId))
+
+   def testLookup(self):
+      index = I2cBusIndex(root=self.root)
+      self.assertEqual(index.lookup('SCD master 0'), 2)
+      self.assertEqual(index.lookup('SCD master 0', idx=1), 10)
+      self.assertIsNone(index.lookup('SCD master 0', idx=2))
+      self.assertIsNone(index.lookup('unknown'))
+      self.assertEqual(list(index.getBuses().items()), [
+         (0, 'SMBus I801'), (2, 'SCD master 0'), (10, 'SCD master 0'),
+      ])
+
+   def testShared(self):
+      index = I2cBusIndex(root=self.root)
+      self.assertEqual(index.lookup('SMBus I801'), 0)
+      other = I2cBusIndex(root=self.root)
+      with patch.object(I2cBusIndex, '_readName') as readName:
+         self.assertEqual(other.lookup('SCD master 0'), 2)
+         readName.assert_not_called()
+
+   def testIncrementalRefresh(self):
+      index = I2cBusIndex(root=self.root)
+      index.refresh()
+      self.assertFalse(index.refresh())
+      self.removeAdapter(2)
+      self.addAdapter(20, 'linecard master')
+      origReadName = index._readName
+      with patch.object(index, '_readName', side_effect=origReadName) as readName:
+         self.assertEqual(index.lookup('linecard master', validate=True), 20)
+         readName.assert_called_once_with('i2c-20')
+      self.assertEqual(index.lookup('SCD master 0'), 10)
+      self.assertNotIn(2, index.getBuses())
+
+   def testMissRefreshes(self):
+      index = I2cBusIndex(root=self.root)
+      index.refresh()
+      self.addAdapter(30, 'hotplug')
+      self.assertEqual(index.lookup('hotplug'), 30)
+
+if __name__ == '__main__':
+   unittest.main()
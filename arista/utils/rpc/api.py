@@ -202,7 +202,8 @@ class RpcSupervisorApi(RpcApi):
 
    @registerLinecardToSupMethod
    async def getLinecardRebootCause(self, lc):
-      return getLinecardReloadCauseManager(lc, read=True).toDict(latestOnly=True)
+      return getLinecardReloadCauseManager(lc, read=True, count=1).toDict(
+         latestOnly=True)
 
    # pylint: disable=unused-argument
    @registerLinecardToSupMethod
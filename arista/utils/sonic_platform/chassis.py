@@ -195,7 +195,7 @@ class Chassis(ChassisBase):
       return super(Chassis, self).get_sfp(index - 1)
 
    def get_reboot_cause(self):
-      rcm = getReloadCauseManager(self._platform)
+      rcm = getReloadCauseManager(self._platform, count=1)
       report = rcm.lastReport()
       if report is None:
          return (ChassisBase.REBOOT_CAUSE_NON_HARDWARE, None)
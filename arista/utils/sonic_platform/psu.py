@@ -41,14 +41,14 @@ class Psu(PsuBase):
    def rail(self):
       if self.psu is None:
          return None
-      rails = self.psu.psu.getInventory().getRails()
+      rails = self.psu.getRails()
       return rails[1] if rails else None
 
    @property
    def input_rail(self):
       if self.psu is None:
          return None
-      rails = self.psu.psu.getInventory().getRails()
+      rails = self.psu.getRails()
       return rails[0] if rails else None
 
    def get_id(self):
@@ -5,6 +5,7 @@ try:
       import ThermalPolicyInfoBase
    from sonic_platform_base.sonic_thermal_control.thermal_json_object \
       import thermal_json_object
+   from arista.core.arbiter import I2cPriority, i2cPriority
    from arista.core.cooling import CoolingAlgorithm
    from .thermal_helper import CoolingEntityManager
 except ImportError as e:
@@ -25,8 +26,9 @@ class FanInfo(ThermalPolicyInfo):
 
    def collect(self, chassis):
       self.fans = CoolingEntityManager.get(chassis).get_all_fans()
-      for fan in self.fans.values():
-         fan.update()
+      with i2cPriority(I2cPriority.COOLING):
+         for fan in self.fans.values():
+            fan.update()
 
 @thermal_json_object("thermal_info")
 class ThermalInfo(ThermalPolicyInfo):
@@ -36,8 +38,9 @@ class ThermalInfo(ThermalPolicyInfo):
 
    def collect(self, chassis):
       self.thermals = CoolingEntityManager.get(chassis).get_all_thermals()
-      for thermal in self.thermals.values():
-         thermal.update()
+      with i2cPriority(I2cPriority.COOLING):
+         for thermal in self.thermals.values():
+            thermal.update()
 
 @thermal_json_object("psu_info")
 class PsuInfo(ThermalPolicyInfo):
@@ -47,8 +50,9 @@ class PsuInfo(ThermalPolicyInfo):
 
    def collect(self, chassis):
       self.psus = CoolingEntityManager.get(chassis).get_all_psus()
-      for psu in self.psus.values():
-         psu.update()
+      with i2cPriority(I2cPriority.COOLING):
+         for psu in self.psus.values():
+            psu.update()
 
 @thermal_json_object("pwm_info")
 class PwmInfo(ThermalPolicyInfo):
@@ -58,8 +62,9 @@ class PwmInfo(ThermalPolicyInfo):
 
    def collect(self, chassis):
       self.pwms = CoolingEntityManager.get(chassis).get_all_pwms()
-      for pwm in self.pwms.values():
-         pwm.update()
+      with i2cPriority(I2cPriority.COOLING):
+         for pwm in self.pwms.values():
+            pwm.update()
 
 @thermal_json_object("control_info")
 class ControlInfo(ThermalPolicyInfo):